@@ -18,6 +18,7 @@ var lastSentText = "";
 var isIntegrationEnabled = false;
 var updateEvent = null;
 var lastSendTime = 0;
+var sessionId = "";
 
 // Initialize the integration handler
 function initialize() {
@@ -54,6 +55,8 @@ function initialize() {
     
     isIntegrationEnabled = true;
     lastSendTime = Date.now();
+    // Identifies this Lens session so the backend only analyzes newly transcribed text
+    sessionId = "lens_" + Date.now() + "_" + Math.floor(Math.random() * 1000000);
     
     if (script.debug) {
         print("Integration Handler: Initialized with " + script.sendInterval + " second interval");
@@ -136,7 +139,8 @@ function sendToIntegrationAPI(text) {
         var requestData = {
             "text": text,
             "timestamp": Date.now(),
-            "source": "snapchat_lens"
+            "source": "snapchat_lens",
+            "session_id": sessionId
         };
         
         var requestBody = JSON.stringify(requestData);
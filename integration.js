@@ -1,10 +1,12 @@
 // Spectacles Lens Script
 var BACKEND_BASE_URL = "https://mhacks25-225120046451.us-east1.run.app/";
+// Identifies this device, so that it only receives its own feedback
+var DEVICE_ID = "lens-" + Math.random().toString(36).slice(2, 12);
 
 // Upload Text for Analysis
 function uploadTextForAnalysis(text) {
     var url = BACKEND_BASE_URL + "/upload/text";
-    var body = JSON.stringify({ text: text });
+    var body = JSON.stringify({ text: text, device_id: DEVICE_ID });
 
     fetch(url, {
         method: "POST",
@@ -21,26 +23,36 @@ function uploadTextForAnalysis(text) {
     });
 }
 
-// Poll latest feedback report
+// Last report shown, so that the long-poll only returns newer ones
+var lastUpdated = 0;
+var lastMessage = "";
+
+// Wait for the next feedback report (long-poll: the server answers as soon as one is stored)
 function pollAnalysisReport() {
-    var url = BACKEND_BASE_URL + "/feedback/report";
+    var url = BACKEND_BASE_URL + "/feedback/report?device_id=" + DEVICE_ID +
+        "&since=" + lastUpdated + "&wait=25";
 
     fetch(url)
         .then(function(response) { return response.json(); })
         .then(function(json) {
-            if (json.message && json.message.length > 0) {
+            var isNew = json.last_updated > lastUpdated ||
+                (json.last_updated == lastUpdated && json.message != lastMessage);
+            if (json.message && json.message.length > 0 && isNew) {
+                lastUpdated = json.last_updated;
+                lastMessage = json.message;
                 print("Analysis Summary:", json.message);
                 showAROverlay(json.message);
             } else {
-                print("No feedback yet, retrying...");
-                // Retry after 2 seconds if processing is async
-                script.createEvent("DelayedCallbackEvent").bind(function() {
-                    pollAnalysisReport();
-                }).reset(2);
+                print("No feedback yet, waiting...");
+                pollAnalysisReport();
             }
         })
         .catch(function(error) {
             print("Error fetching report:", error);
+            // Back off before retrying a failing backend
+            script.createEvent("DelayedCallbackEvent").bind(function() {
+                pollAnalysisReport();
+            }).reset(2);
         });
 }
 
@@ -1,9 +1,14 @@
 import asyncio
 import json
-from typing import List, Literal, Dict
-from pydantic import BaseModel, Field, ValidationError
+import re
+import time
+from functools import lru_cache
+from typing import AsyncIterator, List, Literal, Dict, Optional, Tuple, Type
+from pydantic import BaseModel, Field, ValidationError, create_model
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import HumanMessage, SystemMessage
+from ratelimit import governed
+from hedging import EmptyOutput, resilient_call
 from dotenv import load_dotenv
 import os
 
@@ -15,11 +20,39 @@ load_dotenv(".env")
 api_key = os.getenv("GEMINI_API_KEY")
 
 # --- LLM Config ---
+# Retries on 429/503 are left to the rate limiter (max_retries=1 means a single attempt),
+# which backs off for every caller of the model instead of each request on its own
 MODEL_NAME = "gemini-2.5-flash-lite"
-llm = ChatGoogleGenerativeAI(model=MODEL_NAME, api_key=api_key)
+llm = governed(ChatGoogleGenerativeAI(model=MODEL_NAME, api_key=api_key, max_retries=1), MODEL_NAME, "LLM")
 
 MODEL_NAME_ROUTER = "gemini-2.5-flash"
-llm_high = ChatGoogleGenerativeAI(model=MODEL_NAME_ROUTER, api_key=api_key)
+llm_high = governed(ChatGoogleGenerativeAI(model=MODEL_NAME_ROUTER, api_key=api_key, max_retries=1), MODEL_NAME_ROUTER, "LLM_HIGH")
+
+# --- Router Config ---
+# "llm" asks Gemini for the workflow, "local" builds it deterministically without a model call
+ROUTER_MODE = os.getenv("ROUTER_MODE", "llm")
+ROUTER_MODES = ("llm", "local")
+
+# --- Analysis Engine Config ---
+# "multi_agent" runs the router, one sub-agent per category and the synthesizer,
+# "fused" asks for every category and the summary in one structured call
+ANALYSIS_ENGINE = os.getenv("ANALYSIS_ENGINE", "multi_agent")
+ANALYSIS_ENGINES = ("multi_agent", "fused")
+
+# --- Deadline Config ---
+# End-to-end budget of one analysis; a late answer is worthless on the glasses (0 disables it)
+WORKFLOW_DEADLINE_SECONDS = float(os.getenv("WORKFLOW_DEADLINE_SECONDS", "20"))
+# With less time left than this the synthesizer is skipped in favor of a local summary
+SYNTHESIZER_MIN_SECONDS = float(os.getenv("SYNTHESIZER_MIN_SECONDS", "2"))
+
+# --- Result Cache ---
+from cache import workflow_cache
+
+# --- Local Metrics ---
+import lexical_metrics as lexical_metrics_module
+from lexical_metrics import LEXICAL_METRICS, lexical_metrics, metrics_prompt, raw_scores
+import timing_metrics
+from timing_metrics import TimingMetrics, timing_prompt
 
 # --- Prompts (functions that accept `text`) ---
 from prompts.fluency_agent_prompt import fluency_agent_prompt
@@ -27,6 +60,7 @@ from prompts.prosody_agent_prompt import prosody_agent_prompt
 from prompts.consideration_agent_prompt import consideration_agent_prompt
 from prompts.pragmatics_agent_prompt import pragmatics_agent_prompt
 from prompts.turn_taking_agent_prompt import turn_taking_agent_prompt
+from prompts.fused_agent_prompt import fused_agent_prompt
 
 prompts = {
     "FLUENCY": fluency_agent_prompt,
@@ -52,6 +86,12 @@ class SubAgentOutput(BaseModel):
     how_to_improve: str = Field(..., description="Improvement guidance")
     prompt: str = Field(..., description="Prompt used for this sub-agent")
 
+REPORT_OK = "ok"
+REPORT_FAILED = "failed"
+REPORT_TIMEOUT = "skipped (timeout)"
+# Summary of a result whose synthesizer failed
+SYNTHESIS_FAILED = "Failed to synthesize final answer."
+
 class SubAgentReport(BaseModel):
     category: str
     score: float
@@ -59,6 +99,7 @@ class SubAgentReport(BaseModel):
     what_went_right: str
     what_went_wrong: str
     how_to_improve: str
+    status: Literal["ok", "failed", "skipped (timeout)"] = REPORT_OK
 
 class SynthesizerOutput(BaseModel):
     summary: str
@@ -423,20 +464,40 @@ Input text:
 {input_text}
 """
 
+
+# --- Deadline ---
+class Deadline:
+    """Absolute point in time by which a workflow must have produced its answer"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_seconds(cls, seconds: float = None) -> Optional["Deadline"]:
+        seconds = WORKFLOW_DEADLINE_SECONDS if seconds is None else seconds
+        return cls(seconds) if seconds > 0 else None
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+def time_left(deadline: Optional[Deadline]) -> Optional[float]:
+    """Seconds left for `asyncio.wait_for`, None without a deadline"""
+    return deadline.remaining() if deadline is not None else None
+
 # --- 1. Router Agent ---
-async def main_agent(input_text: str) -> RouterContext:
-    system_prompt = (
-        "You are a router agent. Genenerate a workflow calling all of the 5 categories, where each category is given priority based on what you see as the most prevalance. For example, if I see a lot of ums and uhs, I would give priority to FLUENCY first in the workflow but I would also add the other agents to my workflow. \n"
-        "Categories:\n"
-        "FLUENCY, PROSODY, PRAGMATICS, CONSIDERATION, TIME_BALANCE\n\n"
-        "Each of the categories encompasses this: FLUENCY: counts um/like, detects run-ons, WPM. PROSODY: pace, pauses, volume variance. PRAGMATICS: did you answer the question? did you ramble? CONSIDERATION: hedging, acknowledgment, interruptions. TIME_BALANCE: interruption ratio, speaking share."
-        "Return JSON matching the RouterContext schema with 'subagents_to_call', each having 'category' and 'text_to_analyze'."
-    )
+ROUTER_SYSTEM_PROMPT = (
+    "You are a router agent. Genenerate a workflow calling all of the 5 categories, where each category is given priority based on what you see as the most prevalance. For example, if I see a lot of ums and uhs, I would give priority to FLUENCY first in the workflow but I would also add the other agents to my workflow. \n"
+    "Categories:\n"
+    "FLUENCY, PROSODY, PRAGMATICS, CONSIDERATION, TIME_BALANCE\n\n"
+    "Each of the categories encompasses this: FLUENCY: counts um/like, detects run-ons, WPM. PROSODY: pace, pauses, volume variance. PRAGMATICS: did you answer the question? did you ramble? CONSIDERATION: hedging, acknowledgment, interruptions. TIME_BALANCE: interruption ratio, speaking share."
+    "Return JSON matching the RouterContext schema with 'subagents_to_call', each having 'category' and 'text_to_analyze'."
+)
 
+async def main_agent(input_text: str) -> RouterContext:
     human_prompt = router_agent_prompt(input_text)
 
     structured_llm = llm.with_structured_output(RouterContext)
-    messages = [SystemMessage(content=system_prompt), HumanMessage(content=human_prompt)]
+    messages = [SystemMessage(content=ROUTER_SYSTEM_PROMPT), HumanMessage(content=human_prompt)]
 
     try:
         router_context: RouterContext = await structured_llm.ainvoke(messages)
@@ -448,8 +509,119 @@ async def main_agent(input_text: str) -> RouterContext:
         print("RouterContext parsing error:", e)
         return RouterContext(subagents_to_call=[])
 
+# --- 1b. Local Router ---
+SPEAKER_LINE = re.compile(r"^Speaker (\d+):", re.MULTILINE)
+PLACEHOLDER_TEXTS = ("transcribing", "no transcript available", "error parsing transcript")
+
+def count_speakers(input_text: str) -> int:
+    """Number of distinct speakers in a `parse_speaker_transcript` style transcript (1 for plain text)"""
+    return max(len(set(SPEAKER_LINE.findall(input_text))), 1)
+
+def local_router(input_text: str) -> RouterContext:
+    """
+    Deterministic replacement for `main_agent`.
+
+    Every sub-agent analyzes the full input anyway, so the only decision left is
+    which categories apply: nothing for placeholder text, and TIME_BALANCE only
+    when more than one speaker is present.
+    """
+    text = input_text.strip()
+    if not text or text.lower().startswith(PLACEHOLDER_TEXTS):
+        return RouterContext(subagents_to_call=[])
+
+    categories = ["FLUENCY", "PROSODY", "PRAGMATICS", "CONSIDERATION"]
+    if count_speakers(text) > 1:
+        categories.append("TIME_BALANCE")
+    return RouterContext(subagents_to_call=[
+        SubAgentTask(category=category, text_to_analyze=input_text) for category in categories
+    ])
+
+async def route(input_text: str, router_mode: str = None, deadline: Deadline = None) -> RouterContext:
+    """
+    Build the workflow with the requested router, falling back to ROUTER_MODE.
+    The LLM router may use at most a quarter of the time left, then the local router takes over.
+    """
+    if (router_mode or ROUTER_MODE) == "local":
+        return local_router(input_text)
+    timeout = time_left(deadline)
+    try:
+        return await asyncio.wait_for(main_agent(input_text), timeout / 4 if timeout is not None else None)
+    except asyncio.TimeoutError:
+        print("Router timed out, using the local router")
+        return local_router(input_text)
+
 # --- 2. Sub-Agent Runner ---
-async def run_sub_agent(task: SubAgentTask) -> SubAgentReport:
+async def structured_call(key: str, structured_llm, messages) -> BaseModel:
+    """One structured model call, hedged and retried per `key` (category, "SYNTHESIZER", ...)"""
+    async def attempt():
+        output = await structured_llm.ainvoke(messages)
+        if output is None:
+            raise EmptyOutput("Model returned no structured output")
+        return output
+
+    return await resilient_call(key, attempt)
+
+def build_report(category: str, output: BaseModel) -> SubAgentReport:
+    """Turn a category output model into a report with its weighted score"""
+    weights = RUBRIC_WEIGHTS.get(category, {})
+    weighted_score = sum(output.rubric_scores.get(k, 0.0) * w for k, w in weights.items())
+    weighted_score = min(max(weighted_score, 0.0), 1.0)
+
+    return SubAgentReport(
+        category=category,  # 👈 force category from router, not Gemini
+        rubric_scores=output.rubric_scores,
+        score=weighted_score,
+        what_went_right=output.what_went_right,
+        what_went_wrong=output.what_went_wrong,
+        how_to_improve=output.how_to_improve
+    )
+
+def failed_report(category: str, error: Exception) -> SubAgentReport:
+    return SubAgentReport(
+        category=category,
+        rubric_scores={},
+        score=0.0,
+        what_went_right="",
+        what_went_wrong=f"Failed: {error}",
+        how_to_improve="Retry or adjust prompt/input",
+        status=REPORT_FAILED
+    )
+
+def timeout_report(category: str) -> SubAgentReport:
+    return SubAgentReport(
+        category=category,
+        rubric_scores={},
+        score=0.0,
+        what_went_right="",
+        what_went_wrong="Skipped: no result before the deadline",
+        how_to_improve="",
+        status=REPORT_TIMEOUT
+    )
+
+def apply_local_metrics(category: str, output: BaseModel, text: str, timing: TimingMetrics = None) -> BaseModel:
+    """Replace the rubric numbers that can be counted from the text or measured from audio timestamps"""
+    measured = {}
+    if LEXICAL_METRICS:
+        measured.update(raw_scores(category, lexical_metrics(text)))
+    if timing is not None:
+        measured.update(timing_metrics.raw_scores(category, timing))
+    return output.model_copy(update=measured) if measured else output
+
+def sub_agent_prompt(task: SubAgentTask, timing: TimingMetrics = None) -> str:
+    if not LEXICAL_METRICS:
+        prompt_text = prompts[task.category](task.text_to_analyze)
+    else:
+        metrics = lexical_metrics(task.text_to_analyze)
+        if task.category == "PROSODY":
+            prompt_text = prompts[task.category](task.text_to_analyze, speed=metrics.speed)
+        else:
+            prompt_text = prompts[task.category](task.text_to_analyze)
+        prompt_text += metrics_prompt(task.category, metrics)
+    if timing is not None:
+        prompt_text += timing_prompt(task.category, timing)
+    return prompt_text
+
+async def run_sub_agent(task: SubAgentTask, timing: TimingMetrics = None) -> SubAgentReport:
     if task.category not in prompts or task.category not in CATEGORY_MODELS:
         return SubAgentReport(
             category=task.category,
@@ -457,47 +629,36 @@ async def run_sub_agent(task: SubAgentTask) -> SubAgentReport:
             score=0.0,
             what_went_right="",
             what_went_wrong="No prompt/model defined",
-            how_to_improve="Add a prompt and schema for this category"
+            how_to_improve="Add a prompt and schema for this category",
+            status=REPORT_FAILED
         )
 
-    prompt_text = prompts[task.category](task.text_to_analyze)
+    prompt_text = sub_agent_prompt(task, timing)
 
     model = CATEGORY_MODELS[task.category]
     structured_llm = llm.with_structured_output(model)
+    messages = [
+        SystemMessage(content=prompt_text),
+        HumanMessage(content=task.text_to_analyze)
+    ]
 
     try:
-        output = await structured_llm.ainvoke([
-            SystemMessage(content=prompt_text),
-            HumanMessage(content=task.text_to_analyze)
-        ])
-
-        # calculate weighted score
-        weights = RUBRIC_WEIGHTS.get(task.category, {})
-        weighted_score = sum(output.rubric_scores.get(k, 0.0) * w for k, w in weights.items())
-        weighted_score = min(max(weighted_score, 0.0), 1.0)
-
-        return SubAgentReport(
-            category=task.category,  # 👈 force category from router, not Gemini
-            rubric_scores=output.rubric_scores,
-            score=weighted_score,
-            what_went_right=output.what_went_right,
-            what_went_wrong=output.what_went_wrong,
-            how_to_improve=output.how_to_improve
-        )
+        output = await structured_call(task.category, structured_llm, messages)
+        output = apply_local_metrics(task.category, output, task.text_to_analyze, timing)
+        return build_report(task.category, output)
 
     except Exception as e:
-        return SubAgentReport(
-            category=task.category,
-            rubric_scores={},
-            score=0.0,
-            what_went_right="",
-            what_went_wrong=f"Failed: {e}",
-            how_to_improve="Retry or adjust prompt/input"
-        )
+        return failed_report(task.category, e)
 
+async def run_sub_agent_until(task: SubAgentTask, timing: TimingMetrics = None, deadline: Deadline = None) -> SubAgentReport:
+    """`run_sub_agent`, cancelled and reported as skipped when the deadline passes"""
+    try:
+        return await asyncio.wait_for(run_sub_agent(task, timing), time_left(deadline))
+    except asyncio.TimeoutError:
+        return timeout_report(task.category)
 
-def final_synthesizer_prompt(input_text: str, reports: List[SubAgentReport]) -> str:
-    return f"""
+
+SYNTHESIZER_PROMPT_TEMPLATE = """
 You are a speaker coach. Combine all sub-agent reports into one coherent feedback on the speaker's speaking style.
 
 You should use the sub-agent reports to give the speaker feedback on their speaking style.
@@ -517,46 +678,263 @@ return "No analysis", and only no analysis, and return 0.0 for the total score.
 otherwise, return the total score, and perform a brief analysis of the input text and the sub-agent reports.
 """
 
+def final_synthesizer_prompt(input_text: str, reports: List[SubAgentReport]) -> str:
+    return SYNTHESIZER_PROMPT_TEMPLATE.format(input_text=input_text, reports=reports)
+
 # --- 3. Final Synthesizer ---
-async def final_synthesizer(input_text: str, reports: List[SubAgentReport]) -> SynthesizerOutput:
+def average_score(reports: List[SubAgentReport]) -> float:
+    """Mean score of the categories that completed; failed and skipped ones don't count as 0"""
+    completed = [r for r in reports if r.status == REPORT_OK]
+    if not completed:
+        return 0.0
+    return round(sum(r.score for r in completed) / len(completed), 2)
+
+def quick_summary(reports: List[SubAgentReport]) -> SynthesizerOutput:
+    """Summary assembled from the reports without a model call, for when time has run out"""
+    completed = sorted((r for r in reports if r.status == REPORT_OK), key=lambda r: r.score, reverse=True)
+    skipped = [r.category for r in reports if r.status == REPORT_TIMEOUT]
+    if not completed:
+        summary = "No feedback is available yet, the analysis ran out of time."
+    else:
+        best, worst = completed[0], completed[-1]
+        summary = f"Strongest: {best.category.lower()}. {best.what_went_right}".strip()
+        if worst is not best:
+            summary += f" Work on {worst.category.lower()}: {worst.how_to_improve}".rstrip()
+    if skipped:
+        summary += f" (Not analyzed in time: {', '.join(c.lower() for c in skipped)}.)"
+    return SynthesizerOutput(summary=summary, total_score=average_score(reports))
+
+# System prompt only for summarization
+SYNTHESIZER_SYSTEM_PROMPT = (
+    "You are a speaker coach. Combine all sub-agent reports into one coherent summary highlighting insights."
+)
+
+async def final_synthesizer(input_text: str, reports: List[SubAgentReport], deadline: Deadline = None) -> SynthesizerOutput:
+    timeout = time_left(deadline)
+    if timeout is not None and timeout < SYNTHESIZER_MIN_SECONDS:
+        return quick_summary(reports)
     # Prepare JSON for LLM context
     reports_json = json.dumps([r.dict() for r in reports], indent=2)
-    # System prompt only for summarization
-    system_prompt = (
-        "You are a speaker coach. Combine all sub-agent reports into one coherent summary highlighting insights."
-    )
     structured_llm = llm.with_structured_output(SynthesizerOutput)
     messages = [
-        SystemMessage(content=system_prompt),
+        SystemMessage(content=SYNTHESIZER_SYSTEM_PROMPT),
         HumanMessage(content=final_synthesizer_prompt(input_text, reports))
     ]
     try:
         # Let Gemini create the summary ONLY
-        output: SynthesizerOutput = await structured_llm.ainvoke(messages)
-        # Compute average score locally
-        if reports:
-            total_score = sum(r.score for r in reports) / len(reports)
-        else:
-            total_score = 0.0
-        # Assign the local total_score
-        output.total_score = round(total_score,2)
+        output: SynthesizerOutput = await asyncio.wait_for(
+            structured_call("SYNTHESIZER", structured_llm, messages), timeout
+        )
+        # Assign the locally computed total_score
+        output.total_score = average_score(reports)
         return output
-    except ValidationError as e:
+    except asyncio.TimeoutError:
+        print("Synthesizer timed out, using the quick summary")
+        return quick_summary(reports)
+    except (ValidationError, EmptyOutput) as e:
         print("Synthesizer parsing error:", e)
-        return SynthesizerOutput(summary="Failed to synthesize final answer.", total_score=0.0)
+        return SynthesizerOutput(summary=SYNTHESIS_FAILED, total_score=0.0)
     
+# Inline prompts are part of the cache key, like the templates in prompts/
+workflow_cache.register_prompts(
+    router=ROUTER_SYSTEM_PROMPT + router_agent_prompt(""),
+    synthesizer=SYNTHESIZER_SYSTEM_PROMPT + SYNTHESIZER_PROMPT_TEMPLATE,
+)
+# So are the measured metrics appended to the sub-agent prompts
+workflow_cache.register_prompt_files(lexical_metrics_module.__file__, timing_metrics.__file__)
+
 # --- 4. Workflow ---
-async def run_workflow(input_text: str):
-    router_context = await main_agent(input_text)
-    sub_agent_tasks = [run_sub_agent(task) for task in router_context.subagents_to_call]
+NO_ANALYSIS = {"sub_agent_reports": [], "final_answer": "No analysis", "total_score": 0.0}
+
+async def run_workflow_uncached(
+    input_text: str,
+    router_mode: str = None,
+    timing: TimingMetrics = None,
+    deadline: Deadline = None,
+):
+    router_context = await route(input_text, router_mode, deadline)
+    if not router_context.subagents_to_call:
+        # Nothing to analyze (e.g. "transcribing..."), no need to ask the synthesizer
+        return dict(NO_ANALYSIS)
+    sub_agent_tasks = [run_sub_agent_until(task, timing, deadline) for task in router_context.subagents_to_call]
     reports = await asyncio.gather(*sub_agent_tasks)
-    final_summary = await final_synthesizer(input_text, reports)
+    final_summary = await final_synthesizer(input_text, reports, deadline)
     return {
         "sub_agent_reports": [r.dict() for r in reports],
         "final_answer": final_summary.summary,
         "total_score": final_summary.total_score
     }
 
+# --- 4b. Fused Engine ---
+FUSED_FIELDS = {
+    "FLUENCY": "fluency",
+    "PROSODY": "prosody",
+    "PRAGMATICS": "pragmatics",
+    "CONSIDERATION": "consideration",
+    "TIME_BALANCE": "time_balance",
+}
+
+@lru_cache(maxsize=None)
+def fused_output_model(categories: Tuple[str, ...]) -> Type[BaseModel]:
+    """Structured output holding the category models for `categories` plus the summary"""
+    fields = {FUSED_FIELDS[category]: (CATEGORY_MODELS[category], ...) for category in categories}
+    return create_model(
+        "FusedAnalysisOutput",
+        summary=(str, Field(..., description="Combined second-person feedback for the speaker")),
+        **fields
+    )
+
+async def fused_analysis(
+    input_text: str, timing: TimingMetrics = None, deadline: Deadline = None
+) -> Tuple[List[SubAgentReport], str]:
+    """
+    Analyze all applicable categories and write the summary in a single model call.
+    Categories are picked by the local router so no extra round trip is needed.
+    """
+    categories = tuple(task.category for task in local_router(input_text).subagents_to_call)
+    if not categories:
+        return [], "No analysis"
+
+    prompt_text = fused_agent_prompt(input_text, categories)
+    if LEXICAL_METRICS:
+        metrics = lexical_metrics(input_text)
+        prompt_text += "".join(metrics_prompt(category, metrics) for category in categories)
+    if timing is not None:
+        prompt_text += "".join(timing_prompt(category, timing) for category in categories)
+
+    structured_llm = llm.with_structured_output(fused_output_model(categories))
+    messages = [
+        SystemMessage(content="You are a speaker coach. Return JSON matching the FusedAnalysisOutput schema."),
+        HumanMessage(content=prompt_text)
+    ]
+    try:
+        output = await asyncio.wait_for(structured_call("FUSED", structured_llm, messages), time_left(deadline))
+        reports = [
+            build_report(category, apply_local_metrics(category, getattr(output, FUSED_FIELDS[category]), input_text, timing))
+            for category in categories
+        ]
+        return reports, output.summary
+    except asyncio.TimeoutError:
+        reports = [timeout_report(category) for category in categories]
+        return reports, quick_summary(reports).summary
+    except Exception as e:
+        print("Fused analysis error:", e)
+        return [failed_report(category, e) for category in categories], SYNTHESIS_FAILED
+
+async def run_fused_workflow(input_text: str, timing: TimingMetrics = None, deadline: Deadline = None):
+    reports, summary = await fused_analysis(input_text, timing, deadline)
+    return {
+        "sub_agent_reports": [r.dict() for r in reports],
+        "final_answer": summary,
+        "total_score": average_score(reports)
+    }
+
+def is_cacheable(result: dict) -> bool:
+    """
+    Only complete results are cached, so that a retry can succeed: no reports means
+    the router failed, and a failed synthesizer or failed or skipped sub-agents
+    would otherwise be served for the whole TTL.
+    """
+    reports = result["sub_agent_reports"]
+    return bool(reports) and result["final_answer"] != SYNTHESIS_FAILED and all(
+        report.get("status", REPORT_OK) == REPORT_OK and report["rubric_scores"] for report in reports
+    )
+
+async def run_workflow(
+    input_text: str,
+    use_cache: bool = True,
+    router_mode: str = None,
+    engine: str = None,
+    timing: TimingMetrics = None,
+    deadline_seconds: float = None,
+):
+    """
+    Analyze `input_text` and return the sub-agent reports, the summary and the total score.
+    `timing` holds metrics measured from audio timestamps when the text is a transcript.
+
+    The whole analysis has `deadline_seconds` (default WORKFLOW_DEADLINE_SECONDS): sub-agents
+    still running then are reported as skipped, and the synthesizer is replaced by a quick
+    local summary when too little time is left.
+    """
+    router_mode = router_mode or ROUTER_MODE
+    engine = engine or ANALYSIS_ENGINE
+    deadline = Deadline.from_seconds(deadline_seconds)
+
+    def compute():
+        if engine == "fused":
+            return run_fused_workflow(input_text, timing, deadline)
+        return run_workflow_uncached(input_text, router_mode, timing, deadline)
+
+    if not use_cache:
+        return await compute()
+    cache_key = workflow_cache_key(input_text, router_mode, engine, timing)
+    return await workflow_cache.get_or_compute(cache_key, compute, is_cacheable)
+
+def workflow_cache_key(input_text: str, router_mode: str, engine: str, timing: TimingMetrics = None) -> str:
+    timing_json = timing.model_dump_json() if timing is not None else None
+    return workflow_cache.key(input_text, MODEL_NAME, MODEL_NAME_ROUTER, router_mode, engine, timing_json)
+
+# --- 4c. Streaming Workflow ---
+async def stream_workflow(
+    input_text: str, router_mode: str = None, engine: str = None, deadline_seconds: float = None
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of `run_workflow`.
+
+    Yields {"event": "report", "data": <SubAgentReport dict>} for each sub-agent as soon
+    as it finishes, followed by {"event": "summary", "data": <run_workflow result>}.
+    """
+    router_mode = router_mode or ROUTER_MODE
+    engine = engine or ANALYSIS_ENGINE
+
+    if engine == "fused":
+        # A single call produces everything at once, there is nothing to stream early
+        result = await run_workflow(
+            input_text, router_mode=router_mode, engine=engine, deadline_seconds=deadline_seconds
+        )
+        for report in result["sub_agent_reports"]:
+            yield {"event": "report", "data": report}
+        yield {"event": "summary", "data": result}
+        return
+
+    cache_key = workflow_cache_key(input_text, router_mode, engine)
+    cached = await workflow_cache.get(cache_key) if workflow_cache.enabled else None
+    if cached is not None:
+        for report in cached["sub_agent_reports"]:
+            yield {"event": "report", "data": report}
+        yield {"event": "summary", "data": cached}
+        return
+
+    deadline = Deadline.from_seconds(deadline_seconds)
+    router_context = await route(input_text, router_mode, deadline)
+    if not router_context.subagents_to_call:
+        yield {"event": "summary", "data": dict(NO_ANALYSIS)}
+        return
+    tasks = [
+        asyncio.create_task(run_sub_agent_until(task, deadline=deadline))
+        for task in router_context.subagents_to_call
+    ]
+    try:
+        for next_report in asyncio.as_completed(tasks):
+            report = await next_report
+            yield {"event": "report", "data": report.dict()}
+    finally:
+        # The client may disconnect mid-stream, don't leave sub-agents running
+        for task in tasks:
+            task.cancel()
+
+    # Keep the router order in the final result, independent of completion order
+    reports = [task.result() for task in tasks]
+    final_summary = await final_synthesizer(input_text, reports, deadline)
+    result = {
+        "sub_agent_reports": [r.dict() for r in reports],
+        "final_answer": final_summary.summary,
+        "total_score": final_summary.total_score
+    }
+    if workflow_cache.enabled and is_cacheable(result):
+        await workflow_cache.set(cache_key, result)
+    yield {"event": "summary", "data": result}
+
 # --- 5. EX Usage ---
 async def main():
     #input_text = "ummm I like I am so nervous, I will interrupt you. Other person: I like to eat, Me: Shut up!"
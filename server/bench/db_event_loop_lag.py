@@ -0,0 +1,110 @@
+"""
+Event-loop lag caused by database calls, before and after the async DB layer.
+
+Runs the same mix of `add_entry` / `get_most_recent_entry` calls from concurrent
+coroutines twice: calling the blocking functions directly on the event loop (how
+the processors and `/feedback/report` used to do it) and through the awaitable
+wrappers that run them on the DB thread pool. A probe task sleeps 10 ms in a loop
+and records how late it wakes up, which is the delay every other request on the
+loop would see.
+
+    python bench/db_event_loop_lag.py --db-latency 0.02 --calls 400 --concurrency 16
+
+Without DATABASE_URL a temporary SQLite database is used; --db-latency adds a
+simulated network round trip to every statement.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROBE_INTERVAL = 0.01
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+async def probe(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(loop.time() - expected, 0.0))
+
+
+async def run(mode, calls, concurrency):
+    import database
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            if mode == "blocking":
+                if i % 2:
+                    database.add_entry("feedback", "[]", 1, "transcript")
+                else:
+                    database.get_most_recent_entry()
+            else:
+                if i % 2:
+                    await database.aadd_entry("feedback", "[]", 1, "transcript")
+                else:
+                    await database.aget_most_recent_entry()
+
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return {
+        "mode": mode,
+        "calls": calls,
+        "seconds": round(elapsed, 3),
+        "calls_per_second": round(calls / elapsed, 1),
+        "loop_lag_p50_ms": round(percentile(lags, 0.50) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(lags, 0.99) * 1000, 2),
+        "loop_lag_max_ms": round(max(lags, default=0.0) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure event-loop lag from database calls")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--db-latency", type=float, default=0.01, help="Simulated seconds per statement")
+    args = parser.parse_args()
+
+    tmp = None
+    if not os.getenv("DATABASE_URL"):
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}/bench.db"
+
+    import database
+    from sqlalchemy import event
+
+    if args.db_latency > 0:
+        @event.listens_for(database.engine, "before_cursor_execute")
+        def simulate_round_trip(*_):
+            time.sleep(args.db_latency)
+
+    database.init_database()
+    results = [asyncio.run(run(mode, args.calls, args.concurrency)) for mode in ("blocking", "async")]
+    database.shutdown_executor()
+    print(json.dumps({"db_latency": args.db_latency, "db_threads": database.DB_THREADS, "results": results}, indent=2))
+    if tmp is not None:
+        database.engine.dispose()
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Offline end-to-end benchmark of the analysis pipeline and the API.
+
+Gemini and Deepgram are replaced by the fakes in bench/fakes.py (configurable
+latency distribution and failure rate), everything else is the real service: the
+router, sub-agents and synthesizer with their rate limiters and hedging, the
+processors, the job queue, the write-behind buffer and the database. Each scenario
+sends --requests requests, --concurrency at a time, after --warmup unmeasured ones:
+
+- `run_workflow`: `backend.run_workflow` on distinct texts (no cache hits)
+- `process_text`: `processors.process_text`, including storing the feedback
+- `process_voice`: `processors.process_voice` with --audio-kb of base64 audio
+- `upload_text`: `POST /upload/text`, timed until `/jobs/{id}` reports it finished
+- `feedback_report`: `GET /feedback/report`
+- `feedback_history`: `GET /feedback/history`
+
+    python bench/e2e.py
+    python bench/e2e.py --scenarios process_text,upload_text --requests 500 --concurrency 50 \\
+        --llm-latency lognormal:0.8:0.4 --llm-failure-rate 0.02 --output bench.json
+
+The result is JSON (stdout, or --output): per scenario the p50/p95/p99 latency,
+throughput, error count, event-loop lag and peak RSS so far, plus the commit and
+configuration, so runs can be compared between commits. Without DATABASE_URL a
+temporary SQLite database is used.
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fakes import SAMPLE_TEXT, FakeDeepgram, FakeLLM, LatencyModel, install_fake_deepgram, install_fake_llm
+
+SCENARIOS = ("run_workflow", "process_text", "process_voice", "upload_text", "feedback_report", "feedback_history")
+PROBE_INTERVAL = 0.01
+JOB_POLL_SECONDS = 0.01
+SECRET_KEY = "bench"
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def probe(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(loop.time() - expected, 0.0))
+
+
+def text_for(i: int) -> str:
+    # Distinct texts, so that the workflow cache does not answer
+    return f"{SAMPLE_TEXT}\nSpeaker 0: This is request number {i}."
+
+
+def make_request(name: str, args, client):
+    """The coroutine function running request `i` of a scenario"""
+    import backend
+    import processors
+
+    audio = base64.b64encode(os.urandom(args.audio_kb * 1024)).decode()
+
+    async def run_workflow(i):
+        await backend.run_workflow(text_for(i), router_mode=args.router, engine=args.engine)
+
+    async def process_text(i):
+        await processors.process_text(text_for(i), int(time.time()), router_mode=args.router, engine=args.engine)
+
+    async def process_voice(i):
+        await processors.process_voice(audio, int(time.time()), router_mode=args.router, engine=args.engine)
+
+    async def upload_text(i):
+        response = await client.post("/upload/text", json={
+            "text": text_for(i), "secret_key": SECRET_KEY, "timestamp": int(time.time()),
+            "router": args.router, "engine": args.engine,
+        })
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        while True:
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["status"] == "succeeded":
+                return
+            if job["status"] == "failed":
+                raise RuntimeError(job["error"])
+            await asyncio.sleep(JOB_POLL_SECONDS)
+
+    async def feedback_report(i):
+        (await client.get("/feedback/report")).raise_for_status()
+
+    async def feedback_history(i):
+        (await client.get("/feedback/history", params={"limit": 20})).raise_for_status()
+
+    return {
+        "run_workflow": run_workflow,
+        "process_text": process_text,
+        "process_voice": process_voice,
+        "upload_text": upload_text,
+        "feedback_report": feedback_report,
+        "feedback_history": feedback_history,
+    }[name]
+
+
+async def run_scenario(name: str, args, client) -> dict:
+    request = make_request(name, args, client)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i, measured):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await request(i)
+            except Exception:
+                if measured:
+                    errors += 1
+                return
+            if measured:
+                latencies.append(time.perf_counter() - started)
+
+    offset = int(time.time() * 1000)
+    await asyncio.gather(*(one(offset + i, False) for i in range(args.warmup)))
+
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(offset + args.warmup + i, True) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return {
+        "name": name,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "max": round(max(latencies, default=0.0) * 1000, 2),
+        },
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 0.50) * 1000, 2),
+            "p99": round(percentile(lags, 0.99) * 1000, 2),
+            "max": round(max(lags, default=0.0) * 1000, 2),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def run(args, llm: FakeLLM, deepgram: FakeDeepgram) -> list:
+    import httpx
+    import main
+
+    main.SECRET_KEY = SECRET_KEY
+    install_fake_llm(llm)
+    install_fake_deepgram(deepgram)
+    results = []
+    # The whole service runs as it does under uvicorn: job queue, write-behind buffer, broadcaster
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            for name in args.scenarios:
+                print(f"Running {name}...", file=sys.stderr)
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    results.append(await run_scenario(name, args, client))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline and API against fake Gemini and Deepgram backends")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each scenario")
+    parser.add_argument("--llm-latency", default="lognormal:0.05:0.5", help="Latency model of each model call")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--deepgram-latency", default="lognormal:0.1:0.3", help="Latency model of each transcription")
+    parser.add_argument("--deepgram-failure-rate", type=float, default=0.0)
+    parser.add_argument("--audio-kb", type=int, default=64, help="Audio size of process_voice requests")
+    parser.add_argument("--router", choices=("llm", "local"), default=None, help="Router (default ROUTER_MODE)")
+    parser.add_argument("--engine", choices=("multi_agent", "fused"), default=None, help="Engine (default ANALYSIS_ENGINE)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON result to this file instead of stdout")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    tmp = None
+    if not os.getenv("DATABASE_URL"):
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}/bench.db"
+    os.environ.setdefault("GEMINI_API_KEY", "fake")
+    os.environ.setdefault("DEEPGRAM_API_KEY", "fake")
+    # Keeps the temporary database's latest report out of /dev/shm
+    os.environ.setdefault("REPORT_CACHE_BACKEND", "local")
+
+    llm = FakeLLM(LatencyModel.parse(args.llm_latency, args.seed), args.llm_failure_rate, args.seed)
+    deepgram = FakeDeepgram(LatencyModel.parse(args.deepgram_latency, args.seed), args.deepgram_failure_rate, args.seed)
+    results = asyncio.run(run(args, llm, deepgram))
+
+    report = {
+        "commit": current_commit(),
+        "python": sys.version.split()[0],
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "router": args.router,
+            "engine": args.engine,
+            "audio_kb": args.audio_kb,
+            "seed": args.seed,
+        },
+        "fakes": {"llm": llm.stats(), "deepgram": deepgram.stats()},
+        "scenarios": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
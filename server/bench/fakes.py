@@ -0,0 +1,161 @@
+"""
+Fake Gemini and Deepgram backends for offline benchmarks.
+
+Both answer with well-formed responses after a delay drawn from a latency model and
+fail at a configurable rate, without any network access or quota:
+
+- `FakeLLM` stands in for `ChatGoogleGenerativeAI`. `install_fake_llm` wraps it in the
+  same rate limiter as the real models and swaps it into `backend`, so everything
+  from the router to the synthesizer runs unchanged.
+- `fake_deepgram_transport` is an httpx transport answering `POST /v1/listen` like
+  `deepgram_stub.py`. `install_fake_deepgram` plugs it into the shared transcriber.
+
+Latency models are given as `kind:params` (seconds):
+
+    fixed:0.5            always 0.5
+    uniform:0.2:0.8      uniform between 0.2 and 0.8
+    normal:0.5:0.1       mean 0.5, standard deviation 0.1 (clamped at 0)
+    lognormal:0.5:0.4    median 0.5, sigma 0.4 (long right tail, like real model calls)
+    exp:0.5              exponential with mean 0.5
+"""
+import asyncio
+import math
+import random
+from typing import Optional
+
+import httpx
+from pydantic import BaseModel
+
+SAMPLE_TEXT = "Speaker 0: So um I think we should ship it today.\nSpeaker 1: Yeah, like, right after the review."
+
+
+class FakeBackendError(Exception):
+    """Injected failure of a fake backend"""
+
+
+class LatencyModel:
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+
+    def __init__(self, kind: str, *params: float, seed: Optional[int] = None):
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"Unknown latency model {kind}:{':'.join(map(str, params))}")
+        self.kind = kind
+        self.params = params
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec: str, seed: Optional[int] = None) -> "LatencyModel":
+        kind, *params = spec.split(":")
+        return cls(kind, *(float(p) for p in params), seed=seed)
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = self.rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = self.rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            value = self.rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        else:
+            value = self.rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(value, 0.0)
+
+    def __str__(self) -> str:
+        return ":".join([self.kind, *(f"{p:g}" for p in self.params)])
+
+
+def fake_output(schema, rng: random.Random) -> BaseModel:
+    """An instance of a structured-output schema with random scores in [0, 1]"""
+    import backend
+
+    if schema is backend.RouterContext:
+        return backend.local_router(SAMPLE_TEXT)
+    values = {}
+    for name, field in schema.model_fields.items():
+        annotation = field.annotation
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            values[name] = fake_output(annotation, rng)
+        elif annotation in (float, int):
+            values[name] = annotation(round(rng.random(), 3))
+        else:
+            values[name] = "Benchmark feedback."
+    return schema(**values)
+
+
+class FakeStructuredLLM:
+    def __init__(self, llm: "FakeLLM", schema):
+        self.llm = llm
+        self.schema = schema
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return await self.llm.respond(self.schema)
+
+
+class FakeLLM:
+    def __init__(self, latency: LatencyModel, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def with_structured_output(self, schema, **kwargs) -> FakeStructuredLLM:
+        return FakeStructuredLLM(self, schema)
+
+    async def respond(self, schema) -> BaseModel:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        if self.rng.random() < self.failure_rate:
+            self.failures += 1
+            raise FakeBackendError("Injected model failure")
+        return fake_output(schema, self.rng)
+
+    def stats(self) -> dict:
+        return {"latency": str(self.latency), "failure_rate": self.failure_rate, "calls": self.calls, "failures": self.failures}
+
+
+def install_fake_llm(llm: FakeLLM) -> None:
+    """Route every model call of `backend` to `llm`, through the real rate limiters"""
+    import backend
+    from ratelimit import governed
+
+    backend.llm = governed(llm, backend.MODEL_NAME, "LLM")
+    backend.llm_high = governed(llm, backend.MODEL_NAME_ROUTER, "LLM_HIGH")
+
+
+class FakeDeepgram:
+    def __init__(self, latency: LatencyModel, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        from deepgram_stub import fake_response
+
+        self.calls += 1
+        audio = await request.aread()
+        await asyncio.sleep(self.latency.sample())
+        if self.rng.random() < self.failure_rate:
+            self.failures += 1
+            return httpx.Response(503, json={"detail": "Injected failure"})
+        return httpx.Response(200, json=fake_response(len(audio)))
+
+    def stats(self) -> dict:
+        return {"latency": str(self.latency), "failure_rate": self.failure_rate, "calls": self.calls, "failures": self.failures}
+
+
+def fake_deepgram_transport(deepgram: FakeDeepgram) -> httpx.AsyncBaseTransport:
+    return httpx.MockTransport(deepgram.handle)
+
+
+def install_fake_deepgram(deepgram: FakeDeepgram) -> None:
+    """Send every transcription of the shared transcriber to `deepgram`"""
+    from transcribe_deepgram import transcriber
+
+    transcriber.api_key = transcriber.api_key or "fake"
+    transcriber.transport = fake_deepgram_transport(deepgram)
+    # The next request builds a client with the fake transport
+    transcriber._client = None
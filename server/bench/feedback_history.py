@@ -0,0 +1,141 @@
+"""
+Feedback read paths on a large table, before and after the (timestamp, id) index.
+
+Fills the feedback table with synthetic rows (a transcript and intermediate JSON
+of realistic size each), then times:
+
+- `latest`: the `/feedback/report` query, newest entry by timestamp
+- `offset_page`: `SELECT * ... ORDER BY timestamp DESC LIMIT 100 OFFSET depth`,
+  how a naive history endpoint pages
+- `keyset_page`: the same page through `get_feedback_page` with a cursor and the
+  default fields of `/feedback/history`
+- `keyset_page_all_fields`: the keyset page with every column, to show what the
+  field projection saves
+
+each without the index and again after migration 3 created it.
+
+    python bench/feedback_history.py --rows 2000000 --depth 500000
+
+Without DATABASE_URL a temporary SQLite database is used. DATABASE_URL must point
+at a scratch database: its feedback table is filled and its index dropped.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEED_BATCH = 10000
+PAGE_SIZE = 100
+
+
+def median_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(sorted(timings)[len(timings) // 2] * 1000, 3)
+
+
+def seed(database, rows, text_bytes):
+    from sqlalchemy import insert
+
+    words = ["um", "so", "the", "project", "really", "like", "meeting", "deadline", "okay", "we"]
+    transcript = " ".join(random.choice(words) for _ in range(text_bytes // 5))[:text_bytes]
+    reports = json.dumps([{"category": "fluency", "feedback": transcript[: text_bytes // 2]}])
+    start = int(time.time()) - rows
+    with database.engine.begin() as connection:
+        for offset in range(0, rows, SEED_BATCH):
+            connection.execute(insert(database.Feedback), [
+                {
+                    "feedback": "Clear structure, fewer filler words would help.",
+                    "intermediate_feedbacks": reports,
+                    # A few entries per second share a timestamp
+                    "timestamp": start + (offset + i) // 3,
+                    "time_taken": 4000,
+                    "transcript": transcript,
+                }
+                for i in range(min(SEED_BATCH, rows - offset))
+            ])
+
+
+def measure(database, depth, repeats):
+    from sqlalchemy import text
+
+    with database.engine.connect() as connection:
+        before = tuple(connection.execute(text(
+            "SELECT timestamp, id FROM feedback ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET :depth"
+        ), {"depth": depth - 1}).one())
+
+        def offset_page():
+            connection.execute(text(
+                "SELECT * FROM feedback ORDER BY timestamp DESC, id DESC LIMIT :limit OFFSET :depth"
+            ), {"limit": PAGE_SIZE, "depth": depth}).all()
+
+        offset_ms = median_ms(offset_page, repeats)
+
+    default_fields = ("id", "timestamp", "time_taken", "feedback")
+    return {
+        "latest": median_ms(database.get_most_recent_entry, repeats),
+        "offset_page": offset_ms,
+        "keyset_page": median_ms(lambda: database.get_feedback_page(default_fields, PAGE_SIZE, before), repeats),
+        "keyset_page_all_fields": median_ms(
+            lambda: database.get_feedback_page(database.FEEDBACK_FIELDS, PAGE_SIZE, before), repeats
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time feedback history queries on a large table")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--depth", type=int, default=200000, help="Entries skipped before the timed page")
+    parser.add_argument("--text-bytes", type=int, default=1500, help="Size of each transcript")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = None
+    if not os.getenv("DATABASE_URL"):
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}/bench.db"
+
+    import database
+    import migrations
+    from sqlalchemy import text
+
+    database.Base.metadata.create_all(database.engine)
+    with database.engine.begin() as connection:
+        if migrations.has_index(connection, "feedback", "ix_feedback_timestamp_id"):
+            connection.execute(text("DROP INDEX ix_feedback_timestamp_id ON feedback")
+                               if connection.dialect.name == "mysql" else text("DROP INDEX ix_feedback_timestamp_id"))
+
+    started = time.perf_counter()
+    seed(database, args.rows, args.text_bytes)
+    seed_seconds = time.perf_counter() - started
+
+    without_index = measure(database, args.depth, args.repeats)
+    started = time.perf_counter()
+    with database.engine.begin() as connection:
+        migrations.index_feedback_timestamp(connection)
+    index_seconds = time.perf_counter() - started
+    with_index = measure(database, args.depth, args.repeats)
+
+    print(json.dumps({
+        "dialect": database.engine.dialect.name,
+        "rows": args.rows,
+        "depth": args.depth,
+        "seed_seconds": round(seed_seconds, 1),
+        "create_index_seconds": round(index_seconds, 1),
+        "median_ms": {"without_index": without_index, "with_index": with_index},
+    }, indent=2))
+    if tmp is not None:
+        database.engine.dispose()
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
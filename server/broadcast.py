@@ -0,0 +1,166 @@
+"""
+Push delivery of finished analyses.
+
+Every stored result is published to the `broadcaster` (from `save_feedback`) and
+fanned out to its subscribers: `/feedback/stream` SSE connections and
+`/feedback/report?since=&wait=` long-polls, optionally of a single device.
+Each subscriber has its own bounded queue; a subscriber that falls
+BROADCAST_QUEUE_SIZE reports behind loses the oldest ones (the newest report is
+what clients show), so a slow connection can never hold memory or delay the
+others.
+
+Results stored by other processes (worker.py, other API replicas) do not pass
+through this process's broadcaster. While anyone is subscribed, a watcher reads the
+latest entry every BROADCAST_POLL_SECONDS (normally a latest-report cache hit) and,
+when it is past the last entry the watcher saw, publishes the entries stored since.
+Positions are (timestamp, id), as timestamps are whole seconds. Entries this process
+published itself are recognized by their position and skipped. Without subscribers
+the watcher forgets its position, so the next subscriber only hears of later entries.
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Optional, Set, Tuple
+
+import database
+
+BROADCAST_QUEUE_SIZE = int(os.getenv("BROADCAST_QUEUE_SIZE", "16"))
+BROADCAST_MAX_SUBSCRIBERS = int(os.getenv("BROADCAST_MAX_SUBSCRIBERS", "1000"))
+BROADCAST_POLL_SECONDS = float(os.getenv("BROADCAST_POLL_SECONDS", "1.0"))
+# Entries from other processes published per watcher round
+WATCH_BATCH = 100
+# Positions of delivered reports remembered to skip their second copy
+SEEN_REPORTS = 1024
+
+
+class TooManySubscribers(Exception):
+    """Raised when BROADCAST_MAX_SUBSCRIBERS connections are already subscribed"""
+
+
+def report_event(feedback: str, last_updated: int, details: Optional[str], device_id: str = None) -> dict:
+    """A published report, shaped like the `/feedback/report` response plus its device"""
+    return {"message": feedback, "last_updated": int(last_updated), "details": details or "", "device_id": device_id}
+
+
+class Subscription:
+    def __init__(self, maxsize: int, device_id: str = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        # Only reports of this device are delivered; None receives all of them
+        self.device_id = device_id
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, event: dict) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Optional[dict]:
+        """The next report, or None once the broadcaster shut down"""
+        if self.closed and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.closed = True
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int = BROADCAST_QUEUE_SIZE, max_subscribers: int = BROADCAST_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers: Set[Subscription] = set()
+        self.last_updated: Optional[int] = None
+        # (timestamp, id) of the last entry the watcher saw in the database
+        self.watched: Optional[Tuple[int, int]] = None
+        # (timestamp, id) of recently delivered reports, whichever of `publish` and the watcher came first
+        self.seen: OrderedDict = OrderedDict()
+        self._watcher: Optional[asyncio.Task] = None
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        for subscription in list(self.subscribers):
+            subscription.close()
+
+    def subscribe(self, queue_size: int = None, device_id: str = None) -> Subscription:
+        if len(self.subscribers) >= self.max_subscribers:
+            raise TooManySubscribers(f"{self.max_subscribers} subscribers already connected")
+        subscription = Subscription(queue_size or self.queue_size, device_id)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self.subscribers:
+            self.subscribers.discard(subscription)
+            self.dropped += subscription.dropped
+
+    def publish(self, event: dict, position: Tuple[int, int]) -> None:
+        """Deliver a report stored by this process at `position`, (timestamp, id)"""
+        if self.remember(position):
+            self.deliver(event)
+
+    def remember(self, position: Tuple[int, int]) -> bool:
+        """Record a delivered position; False if it was delivered already"""
+        if position in self.seen:
+            return False
+        self.seen[position] = None
+        if len(self.seen) > SEEN_REPORTS:
+            self.seen.popitem(last=False)
+        return True
+
+    def deliver(self, event: dict) -> None:
+        self.published += 1
+        self.last_updated = max(self.last_updated or 0, event["last_updated"])
+        for subscription in self.subscribers:
+            if subscription.device_id is None or subscription.device_id == event["device_id"]:
+                subscription.push(event)
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(BROADCAST_POLL_SECONDS)
+            if not self.subscribers:
+                # Entries stored meanwhile are history to the next subscriber, not news
+                self.watched = None
+                continue
+            try:
+                latest = await database.aget_most_recent_report()
+                if latest is None:
+                    continue
+                position = (int(latest["timestamp"]), latest["id"])
+                if self.watched is None:
+                    # First look: only later entries are news
+                    self.watched = position
+                elif position > self.watched:
+                    for report in await database.aget_feedback_since(self.watched, WATCH_BATCH):
+                        self.watched = (int(report["timestamp"]), report["id"])
+                        if not self.remember(self.watched):
+                            # Already delivered by `publish`
+                            continue
+                        self.deliver(report_event(
+                            report["feedback"], report["timestamp"], report["intermediate_feedbacks"], report["device_id"]
+                        ))
+            except Exception as e:
+                print(f"Error checking for new feedback: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": self.dropped + sum(s.dropped for s in self.subscribers),
+            "last_updated": self.last_updated or 0,
+        }
+
+
+broadcaster = Broadcaster()
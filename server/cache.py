@@ -0,0 +1,258 @@
+"""
+Content-addressed result cache for `backend.run_workflow`.
+
+Keys are a hash of the normalized transcript, the model names and a fingerprint
+of the prompt templates in `prompts/` plus the prompts registered by `backend`
+(the inline router and synthesizer prompts, and the modules writing the measured
+metrics into sub-agent prompts), so editing any prompt invalidates every cached
+result automatically. Results live in an in-process LRU tier with a TTL
+and, optionally, in a persistent tier in the `feedback` database.
+"""
+import asyncio
+import copy
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+# --- Config ---
+CACHE_ENABLED = os.getenv("WORKFLOW_CACHE_ENABLED", "1") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("WORKFLOW_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = int(os.getenv("WORKFLOW_CACHE_TTL_SECONDS", "86400"))
+CACHE_PERSIST = os.getenv("WORKFLOW_CACHE_PERSIST", "0") == "1"
+CACHE_PERSIST_MAX_ENTRIES = int(os.getenv("WORKFLOW_CACHE_PERSIST_MAX_ENTRIES", "100000"))
+# The persistent tier is pruned at most this often instead of on every write
+CACHE_PRUNE_INTERVAL_SECONDS = int(os.getenv("WORKFLOW_CACHE_PRUNE_INTERVAL_SECONDS", "300"))
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so re-sent transcripts that only differ in spacing share a key"""
+    return " ".join(text.split())
+
+
+class PromptFingerprint:
+    """
+    Hash of all prompt templates. The templates are imported modules, so what is sent
+    only changes with a restart: the hash is computed once, and again after `register`
+    or `refresh`.
+    """
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR):
+        self.prompts_dir = prompts_dir
+        # Prompts defined in code rather than in prompts/, by name
+        self.inline: Dict[str, str] = {}
+        # Source files outside prompts/ that write prompt text, by path
+        self.files: Set[str] = set()
+        self._digest: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def register(self, **prompts: str) -> None:
+        with self._lock:
+            self.inline.update(prompts)
+            self._digest = None
+
+    def register_files(self, *paths: str) -> None:
+        with self._lock:
+            self.files.update(os.path.abspath(path) for path in paths)
+            self._digest = None
+
+    def refresh(self) -> None:
+        """Hash the templates again on the next `value`, e.g. after reloading them"""
+        with self._lock:
+            self._digest = None
+
+    def value(self) -> str:
+        with self._lock:
+            if self._digest is None:
+                digest = hashlib.sha256()
+                paths = sorted(glob.glob(os.path.join(self.prompts_dir, "*.py"))) + sorted(self.files)
+                for path in paths:
+                    digest.update(os.path.basename(path).encode())
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+                for name in sorted(self.inline):
+                    digest.update(name.encode())
+                    digest.update(self.inline[name].encode())
+                self._digest = digest.hexdigest()[:16]
+            return self._digest
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry TTL"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (stored_at or time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class WorkflowCache:
+    """In-process LRU tier in front of an optional persistent database tier"""
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl_seconds: int = CACHE_TTL_SECONDS,
+        persist: bool = CACHE_PERSIST,
+        enabled: bool = CACHE_ENABLED,
+        prompts_dir: str = PROMPTS_DIR,
+    ):
+        self.enabled = enabled
+        self.persist = persist
+        self.memory = LRUCache(max_entries, ttl_seconds)
+        self.fingerprint = PromptFingerprint(prompts_dir)
+        self._last_fingerprint = None
+        self._last_prune = 0.0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.persistent_hits = 0
+        self.persistent_misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def register_prompts(self, **prompts: str) -> None:
+        """Include prompts defined in code in the fingerprint"""
+        self.fingerprint.register(**prompts)
+
+    def register_prompt_files(self, *paths: str) -> None:
+        """Include source files that write prompt text (e.g. measured metrics) in the fingerprint"""
+        self.fingerprint.register_files(*paths)
+
+    def key(self, input_text: str, *parts: Any) -> str:
+        fingerprint = self.fingerprint.value()
+        if fingerprint != self._last_fingerprint:
+            # A prompt changed: entries keyed on the old fingerprint can never hit again
+            if self._last_fingerprint is not None:
+                self.memory.clear()
+                self.invalidations += 1
+            self._last_fingerprint = fingerprint
+        material = json.dumps([normalize_text(input_text), fingerprint, *parts], default=str)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[dict]:
+        value = self.memory.get(key)
+        if value is None and self.persist:
+            import database
+            stored = await database.aget_cached_result(key, self.memory.ttl_seconds)
+            if stored is None:
+                self.persistent_misses += 1
+            else:
+                self.persistent_hits += 1
+                value = json.loads(stored)
+                self.memory.set(key, value)
+        return copy.deepcopy(value) if value is not None else None
+
+    async def set(self, key: str, value: dict) -> None:
+        self.memory.set(key, copy.deepcopy(value))
+        if self.persist:
+            import database
+            await database.aput_cached_result(key, json.dumps(value))
+            now = time.time()
+            if now - self._last_prune >= CACHE_PRUNE_INTERVAL_SECONDS:
+                self._last_prune = now
+                await database.aprune_cached_results(CACHE_PERSIST_MAX_ENTRIES, self.memory.ttl_seconds)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[dict]],
+        cacheable: Callable[[dict], bool] = lambda result: True,
+    ) -> dict:
+        """
+        Return the cached result for `key` or compute and store it.
+        Concurrent calls for the same key share a single computation.
+        """
+        if not self.enabled:
+            return await compute()
+
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return copy.deepcopy(await asyncio.shield(inflight))
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+            if cacheable(result):
+                await self.set(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting on it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.memory.hits + self.memory.misses
+        return {
+            "enabled": self.enabled,
+            "persist": self.persist,
+            "entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "ttl_seconds": self.memory.ttl_seconds,
+            "hits": self.memory.hits,
+            "misses": self.memory.misses,
+            "hit_rate": round(self.memory.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.memory.evictions,
+            "expirations": self.memory.expirations,
+            "persistent_hits": self.persistent_hits,
+            "persistent_misses": self.persistent_misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "prompt_fingerprint": self._last_fingerprint,
+        }
+
+
+workflow_cache = WorkflowCache()
@@ -0,0 +1,224 @@
+"""
+Record/replay of Gemini and Deepgram responses, for fast deterministic tests.
+
+A `Cassette` is a JSON file of recorded responses, keyed by a hash of the request:
+
+- model calls by model name, structured-output schema and messages
+- Deepgram requests by method, path, query parameters and audio bytes
+
+`install(cassette)` wraps `backend.llm` / `backend.llm_high` and plugs a recording
+transport into the shared Deepgram transcriber. What happens on each request depends
+on the mode (CASSETTE_MODE by default):
+
+- `replay`: answer from the cassette; on a miss, call the real service and record it
+- `record`: always call the real service and (re-)record the response
+- `strict`: answer from the cassette only; a miss raises `CassetteMiss`, so tests
+  fail instead of silently reaching the network
+
+Recording needs GEMINI_API_KEY / DEEPGRAM_API_KEY once; afterwards a replay takes
+milliseconds and works offline. A prompt, schema or model change is a miss, so
+re-record (CASSETTE_MODE=record) after changing them.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+import httpx
+from pydantic import BaseModel
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "replay")
+CASSETTE_MODES = ("replay", "record", "strict")
+CASSETTE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes")
+# Deepgram key used while replaying without DEEPGRAM_API_KEY
+REPLAY_API_KEY = "replay"
+
+
+class CassetteMiss(Exception):
+    """No recorded response for a request in strict mode"""
+
+
+def request_key(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def message_payload(messages) -> Any:
+    """Messages as plain data: (type, content) pairs for LangChain messages"""
+    if isinstance(messages, (list, tuple)):
+        return [[getattr(m, "type", type(m).__name__), getattr(m, "content", m)] for m in messages]
+    return messages
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = CASSETTE_MODE):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode {mode}, expected one of {', '.join(CASSETTE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    @classmethod
+    def named(cls, name: str, mode: str = CASSETTE_MODE) -> "Cassette":
+        """The cassette `name` in CASSETTE_DIR"""
+        return cls(os.path.join(CASSETTE_DIR, f"{name}.json"), mode)
+
+    def lookup(self, key: str, description: str) -> Optional[dict]:
+        """The recorded entry for `key`, None when the real service has to be called"""
+        if self.mode != "record" and key in self.entries:
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        if self.mode == "strict":
+            raise CassetteMiss(f"No recorded response for {description} in {self.path}")
+        return None
+
+    def record(self, key: str, entry: dict) -> None:
+        self.entries[key] = entry
+        self.recorded += 1
+        self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp, self.path)
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "entries": len(self.entries), "hits": self.hits,
+                "misses": self.misses, "recorded": self.recorded}
+
+
+# --- Gemini ---
+class CassetteRunnable:
+    """A structured-output runnable answering from the cassette"""
+
+    def __init__(self, llm, cassette: Cassette, model_name: str, schema, kwargs: dict):
+        self.llm = llm
+        self.cassette = cassette
+        self.model_name = model_name
+        self.schema = schema
+        self.kwargs = kwargs
+        self._runnable = None
+
+    def schema_payload(self) -> Any:
+        if isinstance(self.schema, type) and issubclass(self.schema, BaseModel):
+            return self.schema.model_json_schema()
+        return self.schema
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        key = request_key({"model": self.model_name, "schema": self.schema_payload(), "messages": message_payload(messages)})
+        entry = self.cassette.lookup(key, f"{self.model_name} call ({getattr(self.schema, '__name__', 'schema')})")
+        if entry is not None:
+            return self.load(entry["output"])
+        if self._runnable is None:
+            # Created on the first miss only, so replays never touch the real client
+            self._runnable = self.llm.with_structured_output(self.schema, **self.kwargs)
+        output = await self._runnable.ainvoke(messages, *args, **kwargs)
+        self.cassette.record(key, {
+            "model": self.model_name,
+            "schema": getattr(self.schema, "__name__", None),
+            "output": output.model_dump(mode="json") if isinstance(output, BaseModel) else output,
+        })
+        return output
+
+    def load(self, output):
+        if output is not None and isinstance(self.schema, type) and issubclass(self.schema, BaseModel):
+            return self.schema.model_validate(output)
+        return output
+
+
+class CassetteLLM:
+    """Chat model wrapper whose structured-output runnables record and replay"""
+
+    def __init__(self, llm, cassette: Cassette, model_name: str):
+        self.llm = llm
+        self.cassette = cassette
+        self.model_name = model_name
+
+    def with_structured_output(self, schema, **kwargs) -> CassetteRunnable:
+        return CassetteRunnable(self.llm, self.cassette, self.model_name, schema, kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+# --- Deepgram ---
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """httpx transport answering from the cassette, forwarding misses to `transport`"""
+
+    def __init__(self, cassette: Cassette, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.transport = transport
+        self._live = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        # The Authorization header is left out, so recordings neither hold nor depend on the key
+        key = request_key({
+            "method": request.method,
+            "path": request.url.path,
+            "params": sorted(request.url.params.multi_items()),
+            "body": hashlib.sha256(body).hexdigest(),
+        })
+        entry = self.cassette.lookup(key, f"{request.method} {request.url.path}")
+        if entry is not None:
+            return httpx.Response(entry["status_code"], json=entry["json"], request=request)
+        if self._live is None:
+            self._live = httpx.AsyncHTTPTransport()
+        response = await self._live.handle_async_request(request)
+        content = await response.aread()
+        await response.aclose()
+        if response.is_success:
+            # Errors (a missing key, an outage) are not worth replaying
+            self.cassette.record(key, {"method": request.method, "path": request.url.path,
+                                       "status_code": response.status_code, "json": json.loads(content)})
+        # The body is already decoded, so Content-Encoding must not be passed on
+        headers = {"Content-Type": response.headers.get("Content-Type", "application/json")}
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        if self._live is not None:
+            await self._live.aclose()
+
+
+def install(cassette: Cassette) -> None:
+    """Send every Gemini call of `backend` and every transcription through `cassette`"""
+    import backend
+    from transcribe_deepgram import transcriber
+
+    # Outside the rate limiters: replays do not count against the quota
+    if not isinstance(backend.llm, CassetteLLM):
+        backend.llm = CassetteLLM(backend.llm, cassette, backend.MODEL_NAME)
+        backend.llm_high = CassetteLLM(backend.llm_high, cassette, backend.MODEL_NAME_ROUTER)
+    else:
+        backend.llm.cassette = backend.llm_high.cassette = cassette
+    if isinstance(transcriber.transport, CassetteTransport):
+        transcriber.transport.cassette = cassette
+    else:
+        transcriber.transport = CassetteTransport(cassette, transcriber.transport)
+    # Replays need no key, and misses without one are not recorded
+    transcriber.api_key = transcriber.api_key or REPLAY_API_KEY
+    # The next request builds a client with the cassette transport
+    transcriber._client = None
+
+
+def uninstall() -> None:
+    import backend
+    from transcribe_deepgram import transcriber
+
+    if isinstance(backend.llm, CassetteLLM):
+        backend.llm = backend.llm.llm
+        backend.llm_high = backend.llm_high.llm
+    if isinstance(transcriber.transport, CassetteTransport):
+        transcriber.transport = transcriber.transport.transport
+        transcriber._client = None
+    if transcriber.api_key == REPLAY_API_KEY:
+        transcriber.api_key = None
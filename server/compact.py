@@ -0,0 +1,82 @@
+"""
+Compact storage of the large feedback columns.
+
+Sub-agent reports and transcripts live in the `feedback_details` side table, so the
+`feedback` rows that the latest-report and history queries scan stay small:
+
+- Sub-agent reports are stored as minified JSON in a native JSON column instead of
+  the indented text the workflow used to produce.
+- Transcripts of TRANSCRIPT_COMPRESS_MIN_BYTES or more are compressed, with zstd when
+  the `zstandard` package is installed and zlib otherwise (TRANSCRIPT_COMPRESSION
+  picks one, or `off`). The codec is stored with the data, so rows written with
+  either stay readable.
+"""
+import json
+import os
+import zlib
+from typing import Any, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TRANSCRIPT_COMPRESSION = os.getenv("TRANSCRIPT_COMPRESSION", "auto")
+TRANSCRIPT_COMPRESS_MIN_BYTES = int(os.getenv("TRANSCRIPT_COMPRESS_MIN_BYTES", "1024"))
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def dumps(value: Any) -> str:
+    """Minified JSON, also used by the engine to serialize JSON columns"""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def pack_reports(reports: Optional[str]) -> Any:
+    """The value stored in the JSON column for serialized sub-agent reports"""
+    if reports is None:
+        return None
+    try:
+        return json.loads(reports)
+    except ValueError:
+        # Not JSON (hand-written entries): kept as a JSON string
+        return reports
+
+
+def unpack_reports(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return dumps(value)
+
+
+def transcript_codec(name: str = TRANSCRIPT_COMPRESSION) -> Optional[str]:
+    if name == "off":
+        return None
+    if name == "zstd" or (name == "auto" and zstandard is not None):
+        return "zstd"
+    return "zlib"
+
+
+def pack_transcript(transcript: Optional[str], codec: Optional[str] = None, min_bytes: int = TRANSCRIPT_COMPRESS_MIN_BYTES) -> Tuple[Optional[bytes], Optional[str]]:
+    """(stored bytes, codec) for a transcript; the codec is None when stored uncompressed"""
+    if transcript is None:
+        return None, None
+    data = transcript.encode("utf-8")
+    codec = codec or transcript_codec()
+    if codec is None or len(data) < min_bytes:
+        return data, None
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), codec
+    return zlib.compress(data, ZLIB_LEVEL), codec
+
+
+def unpack_transcript(data: Optional[bytes], codec: Optional[str]) -> Optional[str]:
+    if data is None:
+        return None
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Transcript is zstd-compressed but the zstandard package is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "zlib":
+        data = zlib.decompress(data)
+    return data.decode("utf-8")
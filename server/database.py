@@ -1,11 +1,24 @@
+import asyncio
+import base64
+import binascii
+import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 import urllib
-from sqlalchemy import create_engine, Column, Integer, String, Text, MetaData, Table
+import uuid
+from sqlalchemy import create_engine, Column, Float, Index, Integer, JSON, String, Text, LargeBinary, MetaData, Table, and_, case, func, insert, or_, tuple_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.dialects.mysql import LONGBLOB, LONGTEXT
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import compact
+import rollups
+from migrations import run_migrations
+from report_cache import MISS, report_cache
 
 # Database configuration
 DB_HOST = os.getenv("DB_HOST", "")
@@ -14,26 +27,42 @@ DB_NAME = os.getenv("DB_NAME", "feedback_db")
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 
+# Threads that run blocking database calls for the event loop. Sized for the job workers plus
+# API handlers; the connection pool matches it so that a thread never waits for a connection.
+DB_THREADS = int(os.getenv("DB_THREADS", str(int(os.getenv("JOB_WORKERS", "8")) + 4)))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(DB_THREADS)))
+
 encoded_password = urllib.parse.quote_plus(DB_PASSWORD)
 
-# Create database URL
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-# Create SQLAlchemy engine with connection timeout settings
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    pool_timeout=20,
-    pool_size=5,
-    max_overflow=10,
-    connect_args={
-        "connect_timeout": 10,
-        "read_timeout": 10,
-        "write_timeout": 10,
-    },
-    echo=False
-)
+# Create database URL (DATABASE_URL overrides it, e.g. "sqlite:///feedback.db" for local runs)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+if DATABASE_URL.startswith("sqlite"):
+    # Shared by the API, its worker threads and worker processes on one machine
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": 30},
+        json_serializer=compact.dumps,
+        echo=False
+    )
+else:
+    # Create SQLAlchemy engine with connection timeout settings
+    engine = create_engine(
+        DATABASE_URL,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        pool_timeout=20,
+        pool_size=DB_POOL_SIZE,
+        # Headroom for synchronous callers outside the DB thread pool (startup, worker CLI)
+        max_overflow=4,
+        connect_args={
+            "connect_timeout": 10,
+            "read_timeout": 10,
+            "write_timeout": 10,
+        },
+        json_serializer=compact.dumps,
+        echo=False
+    )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -46,17 +75,115 @@ class Feedback(Base):
     __tablename__ = "feedback"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    # Written by older versions only, moved to feedback_details in the background
     intermediate_feedbacks = Column(Text, nullable=True)
     feedback = Column(Text, nullable=False)
     timestamp = Column(Integer, nullable=False)
     time_taken = Column(Integer, nullable=True)
+    total_score = Column(Float, nullable=True)
+    # Written by older versions only, moved to feedback_details in the background
     transcript = Column(Text, nullable=True)
+    # Row of feedback_details holding the sub-agent reports and transcript
+    details_id = Column(String(32), nullable=True, index=True)
+    # Job that produced the entry, used to replay write-behind rows lost in a crash
+    job_id = Column(String(32), nullable=True, index=True)
+    # Device the entry belongs to, so that each client only sees its own feedback
+    device_id = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        # Newest-first reads: the latest report and keyset pages of the history
+        Index("ix_feedback_timestamp_id", "timestamp", "id"),
+        # The same reads for one device
+        Index("ix_feedback_device_timestamp", "device_id", "timestamp", "id"),
+    )
+
+# Job payloads can carry base64 audio, which does not fit MySQL's 64 KB TEXT/BLOB
+LongText = Text().with_variant(LONGTEXT(), "mysql")
+LongBinary = LargeBinary().with_variant(LONGBLOB(), "mysql")
+
+class FeedbackDetails(Base):
+    """Large per-entry payloads, kept out of the feedback rows and only read when requested"""
+    __tablename__ = "feedback_details"
+
+    id = Column(String(32), primary_key=True)
+    # Sub-agent reports, minified (see compact.py)
+    intermediate_feedbacks = Column(JSON(none_as_null=True), nullable=True)
+    # UTF-8 transcript, compressed with `transcript_codec` unless that is NULL
+    transcript = Column(LongBinary, nullable=True)
+    transcript_codec = Column(String(8), nullable=True)
+
+class CategoryScore(Base):
+    """
+    Scores of the sub-agent reports, one row per category of an entry (rubric_key NULL)
+    plus one per rubric item, so that analytics aggregate in the database
+    """
+    __tablename__ = "category_scores"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    feedback_id = Column(Integer, nullable=False, index=True)
+    category = Column(String(32), nullable=False)
+    score = Column(Float, nullable=False)
+    rubric_key = Column(String(64), nullable=True)
+    value = Column(Float, nullable=True)
+    # The entry's timestamp, so that time windows need no join
+    timestamp = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_category_scores_category_timestamp", "category", "timestamp"),
+    )
+
+class FeedbackRollup(Base):
+    """Count, sum and sum of squares of a metric over the entries of an hour or a day (see rollups.py)"""
+    __tablename__ = "feedback_rollups"
+
+    granularity = Column(String(8), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    metric = Column(String(48), primary_key=True)
+    count = Column(Integer, nullable=False)
+    value_sum = Column(Float, nullable=False)
+    value_sum_sq = Column(Float, nullable=False)
+
+class WorkflowCacheEntry(Base):
+    """Persistent tier of the run_workflow result cache"""
+    __tablename__ = "workflow_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    result = Column(Text, nullable=False)
+    created_at = Column(Integer, nullable=False, index=True)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+class Job(Base):
+    """Analysis job table model"""
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(16), nullable=False)
+    status = Column(String(16), nullable=False, index=True)
+    payload = Column(LongText, nullable=False)
+    audio = Column(LongBinary, nullable=True)
+    result = Column(LongText, nullable=True)
+    error = Column(Text, nullable=True)
+    feedback_id = Column(Integer, nullable=True)
+    # Feedback row (JSON) waiting in the write-behind buffer, replayed on startup if it never got written
+    feedback_row = Column(LongText, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Set while a worker process holds the job; an expired lease means the worker died
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires_at = Column(Integer, nullable=True, index=True)
+    created_at = Column(Integer, nullable=False)
+    started_at = Column(Integer, nullable=True)
+    finished_at = Column(Integer, nullable=True)
 
 def init_database():
     """Initialize the database and create the feedback table if it doesn't exist"""
     try:
         # Create all tables
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
         print(f"Database initialized successfully at {DB_HOST}")
         return True
     except SQLAlchemyError as e:
@@ -80,37 +207,899 @@ def get_db_connection():
     finally:
         session.close()
 
-def add_entry(feedback_text: str, intermediate_feedbacks: str = None, time_taken: int = None, transcript: str = None) -> int:
-    """Add a new entry to the database"""
+def details_row(intermediate_feedbacks: Optional[str], transcript: Optional[str]) -> Optional[dict]:
+    """feedback_details columns for an entry's sub-agent reports and transcript (None without either)"""
+    if intermediate_feedbacks is None and transcript is None:
+        return None
+    data, codec = compact.pack_transcript(transcript)
+    return {
+        "id": uuid.uuid4().hex,
+        "intermediate_feedbacks": compact.pack_reports(intermediate_feedbacks),
+        "transcript": data,
+        "transcript_codec": codec,
+    }
+
+def category_rows(feedback_id: Optional[int], timestamp: int, intermediate_feedbacks: Optional[str]) -> List[dict]:
+    """category_scores rows for an entry's serialized sub-agent reports"""
+    try:
+        reports = json.loads(intermediate_feedbacks) if intermediate_feedbacks else []
+    except ValueError:
+        return []
+    rows = []
+    for report in reports if isinstance(reports, list) else []:
+        # Failed and timed-out agents report a placeholder score, not a measurement
+        if not isinstance(report, dict) or report.get("status", "ok") != "ok" or "category" not in report:
+            continue
+        base = {"feedback_id": feedback_id, "category": report["category"], "score": float(report["score"]), "timestamp": timestamp}
+        rows.append({**base, "rubric_key": None, "value": None})
+        rows.extend({**base, "rubric_key": key, "value": float(value)} for key, value in (report.get("rubric_scores") or {}).items())
+    return rows
+
+def category_means(scores: List[dict]) -> Dict[str, float]:
+    """Category score of each category_scores row set of one entry"""
+    return {row["category"]: row["score"] for row in scores if row["rubric_key"] is None}
+
+def update_rollups(session, totals: rollups.Totals) -> None:
+    """Add accumulated totals to the feedback_rollups rows, creating missing ones"""
+    rows = rollups.rollup_rows(totals)
+    if not rows:
+        return
+    dialect = session.bind.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        statement = mysql.insert(FeedbackRollup)
+        new = statement.inserted
+        statement = statement.on_duplicate_key_update(
+            count=FeedbackRollup.count + new.count,
+            value_sum=FeedbackRollup.value_sum + new.value_sum,
+            value_sum_sq=FeedbackRollup.value_sum_sq + new.value_sum_sq,
+        )
+    else:
+        statement = (postgresql if dialect == "postgresql" else sqlite).insert(FeedbackRollup)
+        new = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[FeedbackRollup.granularity, FeedbackRollup.bucket, FeedbackRollup.metric],
+            set_={
+                "count": FeedbackRollup.count + new.count,
+                "value_sum": FeedbackRollup.value_sum + new.value_sum,
+                "value_sum_sq": FeedbackRollup.value_sum_sq + new.value_sum_sq,
+            },
+        )
+    session.execute(statement, rows)
+
+def add_entry(feedback_text: str, intermediate_feedbacks: str = None, time_taken: int = None, transcript: str = None, job_id: str = None, device_id: str = None, total_score: float = None, timestamp: int = None) -> int:
+    """Add a new entry to the database (stored now unless `timestamp` is given)"""
     try:
         with get_db_connection() as session:
+            details = details_row(intermediate_feedbacks, transcript)
+            details_entry = FeedbackDetails(**details) if details is not None else None
             feedback_entry = Feedback(
                 feedback=feedback_text,
-                intermediate_feedbacks=intermediate_feedbacks,
-                transcript=transcript,
-                timestamp=int(time.time()),
-                time_taken=time_taken
+                timestamp=timestamp if timestamp is not None else int(time.time()),
+                time_taken=time_taken,
+                total_score=total_score,
+                job_id=job_id,
+                device_id=device_id,
+                details_id=details["id"] if details is not None else None
             )
+            if details_entry is not None:
+                session.add(details_entry)
             session.add(feedback_entry)
+            scores = category_rows(None, feedback_entry.timestamp, intermediate_feedbacks)
+            if scores:
+                session.flush()
+                session.execute(insert(CategoryScore), [{**row, "feedback_id": feedback_entry.id} for row in scores])
+            totals = {}
+            rollups.accumulate(totals, feedback_entry.timestamp, rollups.entry_metrics(total_score, time_taken, category_means(scores)))
+            update_rollups(session, totals)
             session.commit()
             session.refresh(feedback_entry)
+            report = feedback_report((feedback_entry, details_entry))
+            report_cache.publish(report)
+            if device_id:
+                report_cache.publish(report, device_id)
             return feedback_entry.id
     except SQLAlchemyError as e:
         print(f"Error adding entry: {e}")
         raise
 
-def get_most_recent_entry() -> Optional[Tuple[str, int, str, int]]:
-    """Get the most recent feedback entry"""
+def add_entries(rows: List[dict]) -> List[Optional[int]]:
+    """
+    Insert feedback rows (dicts of Feedback columns) with one multi-row INSERT and
+    clear the staged copies on their jobs in the same transaction. Returns the new ids
+    in the order of `rows`, None for rows without reports and transcript.
+    """
+    # Rows staged before a column existed lack its key; a multi-row INSERT needs them all
+    rows = [{"job_id": None, "device_id": None, **row} for row in rows]
+    feedback_rows, details_rows, scores, totals = [], [], {}, {}
+    for row in rows:
+        details = details_row(row.get("intermediate_feedbacks"), row.get("transcript"))
+        entry_scores = category_rows(None, row["timestamp"], row.get("intermediate_feedbacks"))
+        if details is not None:
+            details_rows.append(details)
+            scores[details["id"]] = entry_scores
+        rollups.accumulate(totals, row["timestamp"], rollups.entry_metrics(
+            row.get("total_score"), row.get("time_taken"), category_means(entry_scores)
+        ))
+        feedback_rows.append({
+            "feedback": row["feedback"],
+            "timestamp": row["timestamp"],
+            "time_taken": row.get("time_taken"),
+            "total_score": row.get("total_score"),
+            "job_id": row["job_id"],
+            "device_id": row["device_id"],
+            "details_id": details["id"] if details is not None else None,
+        })
     try:
         with get_db_connection() as session:
-            feedback_entry = session.query(Feedback).order_by(
-                Feedback.timestamp.desc()
-            ).first()
-            
-            if feedback_entry is None:
+            if details_rows:
+                session.execute(insert(FeedbackDetails), details_rows)
+            session.execute(insert(Feedback), feedback_rows)
+            ids = {}
+            if details_rows:
+                # Multi-row INSERTs do not return the new ids; the details ids identify the rows
+                ids = dict(session.query(Feedback.details_id, Feedback.id).filter(
+                    Feedback.details_id.in_([details["id"] for details in details_rows])
+                ).all())
+            scores = {details_id: entry_scores for details_id, entry_scores in scores.items() if entry_scores}
+            if scores:
+                session.execute(insert(CategoryScore), [
+                    {**row, "feedback_id": ids[details_id]} for details_id, entry_scores in scores.items() for row in entry_scores
+                ])
+            update_rollups(session, totals)
+            job_ids = [row["job_id"] for row in rows if row.get("job_id")]
+            if job_ids:
+                session.query(Job).filter(Job.id.in_(job_ids)).update(
+                    {Job.feedback_row: None}, synchronize_session=False
+                )
+            session.commit()
+            # Multi-row INSERTs do not return the new ids, so read the latest back (one index probe each)
+            report_cache.publish(feedback_report(latest_feedback(session)))
+            for device_id in {row["device_id"] for row in rows if row["device_id"]}:
+                report_cache.publish(feedback_report(latest_feedback(session, device_id)), device_id)
+            return [ids.get(row["details_id"]) for row in feedback_rows]
+    except SQLAlchemyError as e:
+        print(f"Error adding entries: {e}")
+        raise
+
+def get_unwritten_feedback(limit: int) -> List[dict]:
+    """
+    Feedback rows staged on finished jobs that never made it into the feedback table.
+    Staged copies whose row does exist are cleared.
+    """
+    try:
+        with get_db_connection() as session:
+            staged = session.query(Job.id, Job.feedback_row).filter(
+                Job.feedback_row.isnot(None)
+            ).order_by(Job.finished_at).limit(limit).all()
+            if not staged:
+                return []
+            written = {job_id for (job_id,) in session.query(Feedback.job_id).filter(
+                Feedback.job_id.in_([job_id for job_id, _ in staged])
+            )}
+            if written:
+                session.query(Job).filter(Job.id.in_(written)).update(
+                    {Job.feedback_row: None}, synchronize_session=False
+                )
+                session.commit()
+            return [json.loads(row) for job_id, row in staged if job_id not in written]
+    except SQLAlchemyError as e:
+        print(f"Error getting unwritten feedback: {e}")
+        raise
+
+def move_feedback_details(after_id: int, limit: int) -> Optional[int]:
+    """
+    Move the sub-agent reports and transcripts that older versions stored on the feedback
+    rows into feedback_details, and their scores into category_scores, for up to `limit`
+    entries with an id above `after_id`.
+    Returns the last id examined, to pass as `after_id` next, or None when none are left.
+    """
+    try:
+        with get_db_connection() as session:
+            entries = session.query(
+                Feedback.id, Feedback.timestamp, Feedback.intermediate_feedbacks, Feedback.transcript
+            ).filter(
+                Feedback.id > after_id, Feedback.details_id.is_(None)
+            ).order_by(Feedback.id).limit(limit).all()
+            if not entries:
+                return None
+            for feedback_id, timestamp, intermediate_feedbacks, transcript in entries:
+                details = details_row(intermediate_feedbacks, transcript)
+                if details is None:
+                    continue
+                # Conditional, in case another process is moving the same entries
+                moved = session.query(Feedback).filter(
+                    Feedback.id == feedback_id, Feedback.details_id.is_(None)
+                ).update({
+                    Feedback.details_id: details["id"],
+                    Feedback.intermediate_feedbacks: None,
+                    Feedback.transcript: None
+                }, synchronize_session=False)
+                if moved == 1:
+                    session.execute(insert(FeedbackDetails), [details])
+                    scores = category_rows(feedback_id, timestamp, intermediate_feedbacks)
+                    if scores:
+                        session.execute(insert(CategoryScore), scores)
+            session.commit()
+            return entries[-1].id
+    except SQLAlchemyError as e:
+        print(f"Error moving feedback details: {e}")
+        raise
+
+def backfill_category_scores(after_id: int, limit: int) -> Optional[int]:
+    """
+    Add the category_scores rows of entries moved to feedback_details before that table
+    existed, parsed from their stored sub-agent reports, for up to `limit` entries with
+    an id above `after_id` and no category_scores rows.
+    Returns the last id examined, to pass as `after_id` next, or None when none are left.
+    """
+    try:
+        with get_db_connection() as session:
+            scored = session.query(CategoryScore.id).filter(CategoryScore.feedback_id == Feedback.id)
+            entries = session.query(Feedback.id, Feedback.timestamp, FeedbackDetails.intermediate_feedbacks).join(
+                FeedbackDetails, FeedbackDetails.id == Feedback.details_id
+            ).filter(
+                Feedback.id > after_id, ~scored.exists()
+            ).order_by(Feedback.id).limit(limit).all()
+            if not entries:
                 return None
-            
-            return (feedback_entry.feedback, feedback_entry.timestamp, feedback_entry.intermediate_feedbacks, feedback_entry.time_taken, feedback_entry.transcript)
+            scores = []
+            for feedback_id, timestamp, intermediate_feedbacks in entries:
+                scores.extend(category_rows(feedback_id, timestamp, compact.unpack_reports(intermediate_feedbacks)))
+            if scores:
+                session.execute(insert(CategoryScore), scores)
+            session.commit()
+            return entries[-1].id
+    except SQLAlchemyError as e:
+        print(f"Error backfilling category scores: {e}")
+        raise
+
+def with_details(session):
+    """Query of (Feedback, FeedbackDetails) rows; the details are None for entries without any"""
+    return session.query(Feedback, FeedbackDetails).outerjoin(
+        FeedbackDetails, FeedbackDetails.id == Feedback.details_id
+    )
+
+def latest_feedback(session, device_id: str = None) -> Optional[Tuple[Feedback, Optional[FeedbackDetails]]]:
+    query = with_details(session)
+    if device_id:
+        query = query.filter(Feedback.device_id == device_id)
+    return query.order_by(Feedback.timestamp.desc(), Feedback.id.desc()).first()
+
+def feedback_report(row: Optional[Tuple[Feedback, Optional[FeedbackDetails]]]) -> Optional[dict]:
+    """The latest-report cache entry for a (Feedback, FeedbackDetails) row"""
+    if row is None:
+        return None
+    feedback_entry, details = row
+    if details is not None:
+        intermediate_feedbacks = compact.unpack_reports(details.intermediate_feedbacks)
+        transcript = compact.unpack_transcript(details.transcript, details.transcript_codec)
+    else:
+        # Not moved to feedback_details yet
+        intermediate_feedbacks, transcript = feedback_entry.intermediate_feedbacks, feedback_entry.transcript
+    return {
+        "id": feedback_entry.id,
+        "feedback": feedback_entry.feedback,
+        "timestamp": feedback_entry.timestamp,
+        "intermediate_feedbacks": intermediate_feedbacks,
+        "time_taken": feedback_entry.time_taken,
+        "transcript": transcript,
+        "device_id": feedback_entry.device_id,
+    }
+
+def report_entry(report: Optional[dict]) -> Optional[Tuple[str, int, str, int]]:
+    if report is None:
+        return None
+    return (report["feedback"], report["timestamp"], report["intermediate_feedbacks"], report["time_taken"], report["transcript"])
+
+def load_most_recent_report(device_id: str = None) -> Optional[dict]:
+    """Read the most recent feedback entry (of `device_id`) from the database and refresh the cache with it"""
+    try:
+        with get_db_connection() as session:
+            report = feedback_report(latest_feedback(session, device_id))
     except SQLAlchemyError as e:
         print(f"Error getting most recent entry: {e}")
         raise
+    report_cache.publish(report, device_id)
+    return report
+
+def load_most_recent_entry(device_id: str = None) -> Optional[Tuple[str, int, str, int]]:
+    return report_entry(load_most_recent_report(device_id))
+
+def get_most_recent_entry(device_id: str = None) -> Optional[Tuple[str, int, str, int]]:
+    """
+    Get the most recent feedback entry, of one device if `device_id` is given,
+    from the latest-report cache when it is fresh
+    """
+    report = report_cache.get(device_id)
+    if report is not MISS:
+        return report_entry(report)
+    return load_most_recent_entry(device_id)
+
+def get_feedback_since(after: Tuple[int, int], limit: int) -> List[dict]:
+    """
+    Entries after the (timestamp, id) position `after`, oldest first, as latest-report
+    cache entries. Entries stored within the same second are told apart by their id.
+    """
+    try:
+        with get_db_connection() as session:
+            entries = with_details(session).filter(
+                tuple_(Feedback.timestamp, Feedback.id) > tuple_(*after)
+            ).order_by(Feedback.timestamp, Feedback.id).limit(limit).all()
+            return [feedback_report(entry) for entry in entries]
+    except SQLAlchemyError as e:
+        print(f"Error getting new feedback: {e}")
+        raise
+
+# Columns /feedback/history can return; the large text columns are only read when asked for
+FEEDBACK_FIELDS = ("id", "timestamp", "time_taken", "feedback", "intermediate_feedbacks", "transcript", "job_id", "device_id")
+# Fields stored in feedback_details
+DETAIL_FIELDS = ("intermediate_feedbacks", "transcript")
+
+def encode_cursor(position: Tuple[int, int]) -> str:
+    return base64.urlsafe_b64encode(f"{position[0]}:{position[1]}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """Raises ValueError for a malformed cursor"""
+    try:
+        timestamp, feedback_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return int(timestamp), int(feedback_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+def get_feedback_page(fields: Sequence[str], limit: int, before: Optional[Tuple[int, int]] = None, device_id: str = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+    """
+    Newest-first page of feedback entries (of one device if `device_id` is given)
+    with only `fields` selected. Paging is by keyset: `before` is the (timestamp, id)
+    of the last entry of the previous page, so every page is an index range scan no
+    matter how deep it is. Returns the entries and the position to pass as `before`
+    for the next page (None at the end).
+    """
+    columns = [name for name in dict.fromkeys(("timestamp", "id") + tuple(fields)) if name not in DETAIL_FIELDS]
+    details = [name for name in fields if name in DETAIL_FIELDS]
+    selected = [getattr(Feedback, name) for name in columns]
+    if details:
+        # Legacy columns as a fallback for entries that were not moved yet
+        selected += [Feedback.details_id] + [getattr(Feedback, name).label(f"legacy_{name}") for name in details]
+        if "intermediate_feedbacks" in details:
+            selected.append(FeedbackDetails.intermediate_feedbacks)
+        if "transcript" in details:
+            selected += [FeedbackDetails.transcript, FeedbackDetails.transcript_codec]
+    try:
+        with get_db_connection() as session:
+            query = session.query(*selected)
+            if details:
+                query = query.outerjoin(FeedbackDetails, FeedbackDetails.id == Feedback.details_id)
+            if device_id:
+                query = query.filter(Feedback.device_id == device_id)
+            if before is not None:
+                query = query.filter(tuple_(Feedback.timestamp, Feedback.id) < tuple_(*before))
+            rows = query.order_by(Feedback.timestamp.desc(), Feedback.id.desc()).limit(limit + 1).all()
+    except SQLAlchemyError as e:
+        print(f"Error getting feedback page: {e}")
+        raise
+    next_position = (rows[limit - 1].timestamp, rows[limit - 1].id) if len(rows) > limit else None
+    return [{name: page_field(row, name) for name in fields} for row in rows[:limit]], next_position
+
+def page_field(row, name: str) -> Any:
+    # Details are only decoded for the fields that were asked for
+    if name not in DETAIL_FIELDS:
+        return getattr(row, name)
+    if row.details_id is None:
+        return getattr(row, f"legacy_{name}")
+    if name == "intermediate_feedbacks":
+        return compact.unpack_reports(row.intermediate_feedbacks)
+    return compact.unpack_transcript(row.transcript, row.transcript_codec)
+
+
+# Percentiles reported by get_category_stats
+PERCENTILES = (50, 90, 95)
+
+def get_category_stats(since: int, until: int, categories: Optional[Sequence[str]] = None) -> List[dict]:
+    """
+    Count, mean, range and nearest-rank percentiles of each category's scores for
+    entries stored in [since, until), plus the mean of each rubric item, computed in
+    the database (window functions: MySQL 8+, SQLite 3.25+).
+    """
+    window = [CategoryScore.timestamp >= since, CategoryScore.timestamp < until]
+    if categories:
+        window.append(CategoryScore.category.in_(list(categories)))
+    try:
+        with get_db_connection() as session:
+            ranked = session.query(
+                CategoryScore.category,
+                CategoryScore.score,
+                func.row_number().over(partition_by=CategoryScore.category, order_by=CategoryScore.score).label("position"),
+                func.count().over(partition_by=CategoryScore.category).label("total"),
+            ).filter(CategoryScore.rubric_key.is_(None), *window).subquery()
+            # The p-th percentile is the smallest score at a position of at least p% of the count
+            percentiles = [
+                func.min(case((ranked.c.position >= ranked.c.total * p / 100.0, ranked.c.score))).label(f"p{p}")
+                for p in PERCENTILES
+            ]
+            stats = session.query(
+                ranked.c.category,
+                func.count().label("count"),
+                func.avg(ranked.c.score).label("mean"),
+                func.min(ranked.c.score).label("min"),
+                func.max(ranked.c.score).label("max"),
+                *percentiles
+            ).group_by(ranked.c.category).order_by(ranked.c.category).all()
+            rubrics = session.query(
+                CategoryScore.category, CategoryScore.rubric_key, func.avg(CategoryScore.value)
+            ).filter(CategoryScore.rubric_key.isnot(None), *window).group_by(
+                CategoryScore.category, CategoryScore.rubric_key
+            ).all()
+    except SQLAlchemyError as e:
+        print(f"Error getting category stats: {e}")
+        raise
+    rubric_means: Dict[str, Dict[str, float]] = {}
+    for category, rubric_key, mean in rubrics:
+        rubric_means.setdefault(category, {})[rubric_key] = float(mean)
+    return [
+        {**{name: (float(value) if name not in ("category", "count") else value) for name, value in row._mapping.items()},
+         "rubrics": rubric_means.get(row.category, {})}
+        for row in stats
+    ]
+
+
+def rebuild_rollups(since: int, until: int) -> int:
+    """
+    Recompute the hourly and daily rollups of the days overlapping [since, until) from
+    the stored entries, replacing what is there. Returns the number of rollup rows.
+    """
+    day = rollups.GRANULARITIES["day"]
+    since = rollups.bucket_start(since, "day")
+    until = rollups.bucket_start(until - 1, "day") + day
+    totals = {}
+    try:
+        with get_db_connection() as session:
+            entries = session.query(Feedback.timestamp, Feedback.total_score, Feedback.time_taken).filter(
+                Feedback.timestamp >= since, Feedback.timestamp < until
+            ).yield_per(1000)
+            for timestamp, total_score, time_taken in entries:
+                rollups.accumulate(totals, timestamp, rollups.entry_metrics(total_score, time_taken, {}))
+            scores = session.query(CategoryScore.timestamp, CategoryScore.category, CategoryScore.score).filter(
+                CategoryScore.rubric_key.is_(None), CategoryScore.timestamp >= since, CategoryScore.timestamp < until
+            ).yield_per(1000)
+            for timestamp, category, score in scores:
+                rollups.accumulate(totals, timestamp, [(category, score)])
+            session.query(FeedbackRollup).filter(
+                FeedbackRollup.bucket >= since, FeedbackRollup.bucket < until
+            ).delete(synchronize_session=False)
+            update_rollups(session, totals)
+            session.commit()
+            return len(totals)
+    except SQLAlchemyError as e:
+        print(f"Error rebuilding rollups: {e}")
+        raise
+
+def get_rollups(granularity: str, since: int, until: int, metrics: Optional[Sequence[str]] = None) -> List[dict]:
+    """Rollup rows of the buckets starting in [since, until), ordered by bucket (a primary key range scan)"""
+    try:
+        with get_db_connection() as session:
+            query = session.query(
+                FeedbackRollup.bucket, FeedbackRollup.metric, FeedbackRollup.count,
+                FeedbackRollup.value_sum, FeedbackRollup.value_sum_sq
+            ).filter(
+                FeedbackRollup.granularity == granularity,
+                FeedbackRollup.bucket >= since,
+                FeedbackRollup.bucket < until
+            )
+            if metrics:
+                query = query.filter(FeedbackRollup.metric.in_(list(metrics)))
+            return [dict(row._mapping) for row in query.order_by(FeedbackRollup.bucket, FeedbackRollup.metric)]
+    except SQLAlchemyError as e:
+        print(f"Error getting rollups: {e}")
+        raise
+
+
+def get_cached_result(cache_key: str, max_age: int) -> Optional[str]:
+    """Get a cached workflow result that is at most `max_age` seconds old"""
+    try:
+        with get_db_connection() as session:
+            entry = session.query(WorkflowCacheEntry).filter(
+                WorkflowCacheEntry.cache_key == cache_key,
+                WorkflowCacheEntry.created_at >= int(time.time()) - max_age
+            ).first()
+            return entry.result if entry is not None else None
+    except SQLAlchemyError as e:
+        print(f"Error reading cached result: {e}")
+        return None
+
+def put_cached_result(cache_key: str, result: str) -> None:
+    """Store a workflow result"""
+    try:
+        with get_db_connection() as session:
+            session.merge(WorkflowCacheEntry(cache_key=cache_key, result=result, created_at=int(time.time())))
+            session.commit()
+    except SQLAlchemyError as e:
+        print(f"Error storing cached result: {e}")
+
+def prune_cached_results(max_entries: int, max_age: int) -> int:
+    """
+    Delete expired cached results, then the oldest beyond `max_entries`. Entries
+    written in the current second are always kept, so a result that was just
+    stored cannot be pruned.
+    """
+    now = int(time.time())
+    try:
+        with get_db_connection() as session:
+            deleted = session.query(WorkflowCacheEntry).filter(
+                WorkflowCacheEntry.created_at < now - max_age
+            ).delete(synchronize_session=False)
+            cutoff = session.query(WorkflowCacheEntry.created_at).order_by(
+                WorkflowCacheEntry.created_at.desc()
+            ).offset(max_entries).limit(1).scalar()
+            if cutoff is not None:
+                deleted += session.query(WorkflowCacheEntry).filter(
+                    WorkflowCacheEntry.created_at <= cutoff,
+                    WorkflowCacheEntry.created_at < now
+                ).delete(synchronize_session=False)
+            session.commit()
+            return deleted
+    except SQLAlchemyError as e:
+        print(f"Error pruning cached results: {e}")
+        return 0
+
+
+def create_job(job_id: str, kind: str, payload: str, audio: bytes = None, owner: str = None, lease_seconds: int = None) -> None:
+    """Persist a new queued job, leased to `owner` when the creating process runs it itself"""
+    now = int(time.time())
+    try:
+        with get_db_connection() as session:
+            session.add(Job(
+                id=job_id,
+                kind=kind,
+                status=JOB_QUEUED,
+                payload=payload,
+                audio=audio,
+                attempts=0,
+                lease_owner=owner,
+                lease_expires_at=now + lease_seconds if owner is not None else None,
+                created_at=now
+            ))
+            session.commit()
+    except SQLAlchemyError as e:
+        print(f"Error creating job: {e}")
+        raise
+
+def mark_job_running(job_id: str, owner: str = None) -> bool:
+    """Start a job; with `owner`, only while that process still holds its lease"""
+    try:
+        with get_db_connection() as session:
+            query = session.query(Job).filter(Job.id == job_id)
+            if owner is not None:
+                query = query.filter(Job.lease_owner == owner)
+            updated = query.update({
+                Job.status: JOB_RUNNING,
+                Job.started_at: int(time.time()),
+                Job.attempts: Job.attempts + 1
+            }, synchronize_session=False)
+            session.commit()
+            return updated == 1
+    except SQLAlchemyError as e:
+        print(f"Error updating job: {e}")
+        raise
+
+def finish_job(job_id: str, status: str, result: str = None, error: str = None, feedback_id: int = None, owner: str = None, feedback_row: str = None) -> bool:
+    """
+    Record the outcome of a job. The audio is dropped once it is no longer needed.
+    With `owner`, only a worker that still holds the lease can finish the job.
+    """
+    try:
+        with get_db_connection() as session:
+            query = session.query(Job).filter(Job.id == job_id)
+            if owner is not None:
+                query = query.filter(Job.lease_owner == owner, Job.status == JOB_RUNNING)
+            updated = query.update({
+                Job.status: status,
+                Job.result: result,
+                Job.error: error,
+                Job.feedback_id: feedback_id,
+                Job.feedback_row: feedback_row,
+                Job.audio: None,
+                Job.lease_owner: None,
+                Job.lease_expires_at: None,
+                Job.finished_at: int(time.time())
+            }, synchronize_session=False)
+            session.commit()
+            return updated == 1
+    except SQLAlchemyError as e:
+        print(f"Error finishing job: {e}")
+        raise
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Get a job's status and result (without payload and audio)"""
+    try:
+        with get_db_connection() as session:
+            job = session.query(
+                Job.id, Job.kind, Job.status, Job.result, Job.error, Job.feedback_id,
+                Job.attempts, Job.created_at, Job.started_at, Job.finished_at
+            ).filter(Job.id == job_id).first()
+            return dict(job._mapping) if job is not None else None
+    except SQLAlchemyError as e:
+        print(f"Error getting job: {e}")
+        raise
+
+def unleased_jobs():
+    """Unfinished jobs nobody holds: never leased (worker mode) or whose owner stopped renewing"""
+    return and_(
+        Job.status.in_([JOB_QUEUED, JOB_RUNNING]),
+        or_(Job.lease_owner.is_(None), Job.lease_expires_at < int(time.time()))
+    )
+
+def take_over_jobs(owner: str, lease_seconds: int, limit: int, max_attempts: int) -> List[Tuple[str, str, str, Optional[bytes]]]:
+    """
+    Lease up to `limit` unfinished jobs that no live process holds to `owner`, oldest first,
+    as (id, kind, payload, audio). Each is taken with a conditional UPDATE, so concurrent
+    API processes never run the same job twice. Jobs already started `max_attempts` times
+    are failed instead.
+    """
+    try:
+        with get_db_connection() as session:
+            candidates = session.query(Job.id, Job.attempts).filter(unleased_jobs()).order_by(Job.created_at).limit(limit).all()
+            taken = []
+            for job_id, attempts in candidates:
+                now = int(time.time())
+                query = session.query(Job).filter(Job.id == job_id, unleased_jobs())
+                if attempts >= max_attempts:
+                    query.update({
+                        Job.status: JOB_FAILED,
+                        Job.error: f"Interrupted {attempts} times",
+                        Job.audio: None,
+                        Job.lease_owner: None,
+                        Job.lease_expires_at: None,
+                        Job.finished_at: now
+                    }, synchronize_session=False)
+                    session.commit()
+                    continue
+                updated = query.update({
+                    Job.status: JOB_QUEUED,
+                    Job.lease_owner: owner,
+                    Job.lease_expires_at: now + lease_seconds
+                }, synchronize_session=False)
+                session.commit()
+                if updated == 1:
+                    taken.append(tuple(session.query(Job.id, Job.kind, Job.payload, Job.audio).filter(Job.id == job_id).first()))
+            return taken
+    except SQLAlchemyError as e:
+        print(f"Error taking over jobs: {e}")
+        raise
+
+def renew_owner_leases(owner: str, lease_seconds: int) -> int:
+    """Heartbeat of an API process: extend the leases of all jobs it holds"""
+    try:
+        with get_db_connection() as session:
+            updated = session.query(Job).filter(
+                Job.lease_owner == owner, Job.status.in_([JOB_QUEUED, JOB_RUNNING])
+            ).update({Job.lease_expires_at: int(time.time()) + lease_seconds}, synchronize_session=False)
+            session.commit()
+            return updated
+    except SQLAlchemyError as e:
+        print(f"Error renewing leases: {e}")
+        raise
+
+def release_owner_jobs(owner: str) -> int:
+    """Hand the unfinished jobs of a stopping API process to whoever recovers next"""
+    try:
+        with get_db_connection() as session:
+            updated = session.query(Job).filter(
+                Job.lease_owner == owner, Job.status.in_([JOB_QUEUED, JOB_RUNNING])
+            ).update({Job.lease_owner: None, Job.lease_expires_at: None}, synchronize_session=False)
+            session.commit()
+            return updated
+    except SQLAlchemyError as e:
+        print(f"Error releasing jobs: {e}")
+        raise
+
+def count_jobs(status: str) -> int:
+    try:
+        with get_db_connection() as session:
+            return session.query(Job).filter(Job.status == status).count()
+    except SQLAlchemyError as e:
+        print(f"Error counting jobs: {e}")
+        raise
+
+def claim_job(owner: str, lease_seconds: int) -> Optional[Tuple[str, str, str, Optional[bytes]]]:
+    """
+    Lease the oldest queued job to `owner`, returning (id, kind, payload, audio) or None.
+
+    On MySQL the candidate row is locked with SELECT ... FOR UPDATE SKIP LOCKED so that
+    concurrent workers never wait on each other. Databases without SKIP LOCKED (SQLite)
+    rely on the conditional UPDATE alone: a worker that loses the race updates no row
+    and moves on to the next candidate.
+    """
+    try:
+        with get_db_connection() as session:
+            skip_locked = session.bind.dialect.name in ("mysql", "mariadb", "postgresql")
+            # Queued jobs leased to an API process are in its in-memory queue
+            query = session.query(Job.id).filter(
+                Job.status == JOB_QUEUED, or_(Job.lease_owner.is_(None), Job.lease_expires_at < int(time.time()))
+            ).order_by(Job.created_at)
+            if skip_locked:
+                query = query.with_for_update(skip_locked=True)
+            candidates = [job_id for (job_id,) in query.limit(1 if skip_locked else 5).all()]
+            now = int(time.time())
+            for job_id in candidates:
+                updated = session.query(Job).filter(
+                    Job.id == job_id, Job.status == JOB_QUEUED, or_(Job.lease_owner.is_(None), Job.lease_expires_at < now)
+                ).update({
+                    Job.status: JOB_RUNNING,
+                    Job.lease_owner: owner,
+                    Job.lease_expires_at: now + lease_seconds,
+                    Job.started_at: now,
+                    Job.attempts: Job.attempts + 1
+                }, synchronize_session=False)
+                session.commit()
+                if updated == 1:
+                    job = session.query(Job.id, Job.kind, Job.payload, Job.audio).filter(Job.id == job_id).first()
+                    return tuple(job)
+            session.commit()
+            return None
+    except SQLAlchemyError as e:
+        print(f"Error claiming job: {e}")
+        raise
+
+def renew_lease(job_id: str, owner: str, lease_seconds: int) -> bool:
+    """Heartbeat: extend the lease, False if `owner` no longer holds it"""
+    try:
+        with get_db_connection() as session:
+            updated = session.query(Job).filter(
+                Job.id == job_id, Job.lease_owner == owner, Job.status == JOB_RUNNING
+            ).update({Job.lease_expires_at: int(time.time()) + lease_seconds}, synchronize_session=False)
+            session.commit()
+            return updated == 1
+    except SQLAlchemyError as e:
+        print(f"Error renewing lease: {e}")
+        raise
+
+def release_job(job_id: str, owner: str) -> bool:
+    """Give a leased job back to the queue (graceful worker shutdown)"""
+    try:
+        with get_db_connection() as session:
+            updated = session.query(Job).filter(
+                Job.id == job_id, Job.lease_owner == owner, Job.status == JOB_RUNNING
+            ).update({
+                Job.status: JOB_QUEUED,
+                Job.lease_owner: None,
+                Job.lease_expires_at: None
+            }, synchronize_session=False)
+            session.commit()
+            return updated == 1
+    except SQLAlchemyError as e:
+        print(f"Error releasing job: {e}")
+        raise
+
+def requeue_expired_jobs(max_attempts: int) -> Tuple[int, int]:
+    """
+    Put jobs whose lease expired back in the queue, or fail them after `max_attempts`.
+    Returns (requeued, failed).
+    """
+    try:
+        with get_db_connection() as session:
+            now = int(time.time())
+            expired = and_(Job.status == JOB_RUNNING, Job.lease_expires_at < now)
+            failed = session.query(Job).filter(expired, Job.attempts >= max_attempts).update({
+                Job.status: JOB_FAILED,
+                Job.error: f"Lease expired after {max_attempts} attempts",
+                Job.audio: None,
+                Job.lease_owner: None,
+                Job.lease_expires_at: None,
+                Job.finished_at: now
+            }, synchronize_session=False)
+            requeued = session.query(Job).filter(expired).update({
+                Job.status: JOB_QUEUED,
+                Job.lease_owner: None,
+                Job.lease_expires_at: None
+            }, synchronize_session=False)
+            session.commit()
+            return requeued, failed
+    except SQLAlchemyError as e:
+        print(f"Error requeuing expired jobs: {e}")
+        raise
+
+
+# --- Async access ---
+# SQLAlchemy/PyMySQL calls block for a full network round trip (up to the 10 s timeouts).
+# These awaitables run the functions above on a dedicated thread pool so that the event
+# loop keeps serving requests, and so DB calls never queue behind other to_thread work.
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+    return _executor
+
+async def run_db(fn: Callable[..., Any], *args) -> Any:
+    """Run a blocking database function on the DB thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+async def aadd_entry(feedback_text: str, intermediate_feedbacks: str = None, time_taken: int = None, transcript: str = None, job_id: str = None, device_id: str = None, total_score: float = None, timestamp: int = None) -> int:
+    return await run_db(add_entry, feedback_text, intermediate_feedbacks, time_taken, transcript, job_id, device_id, total_score, timestamp)
+
+async def aadd_entries(rows: List[dict]) -> List[Optional[int]]:
+    return await run_db(add_entries, rows)
+
+async def aget_unwritten_feedback(limit: int) -> List[dict]:
+    return await run_db(get_unwritten_feedback, limit)
+
+async def aget_feedback_page(fields: Sequence[str], limit: int, before: Optional[Tuple[int, int]] = None, device_id: str = None):
+    return await run_db(get_feedback_page, fields, limit, before, device_id)
+
+async def aget_feedback_since(after: Tuple[int, int], limit: int) -> List[dict]:
+    return await run_db(get_feedback_since, after, limit)
+
+async def aget_category_stats(since: int, until: int, categories: Optional[Sequence[str]] = None) -> List[dict]:
+    return await run_db(get_category_stats, since, until, categories)
+
+async def aget_rollups(granularity: str, since: int, until: int, metrics: Optional[Sequence[str]] = None) -> List[dict]:
+    return await run_db(get_rollups, granularity, since, until, metrics)
+
+async def amove_feedback_details(after_id: int, limit: int) -> Optional[int]:
+    return await run_db(move_feedback_details, after_id, limit)
+
+async def aget_most_recent_entry(device_id: str = None) -> Optional[Tuple[str, int, str, int]]:
+    # Cache hits are answered on the event loop, without a trip to the DB threads
+    report = report_cache.get(device_id)
+    if report is not MISS:
+        return report_entry(report)
+    return await run_db(load_most_recent_entry, device_id)
+
+async def aget_most_recent_report(device_id: str = None) -> Optional[dict]:
+    """Like `aget_most_recent_entry`, as the latest-report cache entry (with its `id`)"""
+    report = report_cache.get(device_id)
+    if report is not MISS:
+        return report
+    return await run_db(load_most_recent_report, device_id)
+
+async def aget_cached_result(cache_key: str, max_age: int) -> Optional[str]:
+    return await run_db(get_cached_result, cache_key, max_age)
+
+async def aput_cached_result(cache_key: str, result: str) -> None:
+    return await run_db(put_cached_result, cache_key, result)
+
+async def aprune_cached_results(max_entries: int, max_age: int) -> int:
+    return await run_db(prune_cached_results, max_entries, max_age)
+
+async def acreate_job(job_id: str, kind: str, payload: str, audio: bytes = None, owner: str = None, lease_seconds: int = None) -> None:
+    return await run_db(create_job, job_id, kind, payload, audio, owner, lease_seconds)
+
+async def amark_job_running(job_id: str, owner: str = None) -> bool:
+    return await run_db(mark_job_running, job_id, owner)
+
+async def afinish_job(job_id: str, status: str, result: str = None, error: str = None, feedback_id: int = None, owner: str = None, feedback_row: str = None) -> bool:
+    return await run_db(finish_job, job_id, status, result, error, feedback_id, owner, feedback_row)
+
+async def aget_job(job_id: str) -> Optional[dict]:
+    return await run_db(get_job, job_id)
+
+async def atake_over_jobs(owner: str, lease_seconds: int, limit: int, max_attempts: int) -> List[Tuple[str, str, str, Optional[bytes]]]:
+    return await run_db(take_over_jobs, owner, lease_seconds, limit, max_attempts)
+
+async def arenew_owner_leases(owner: str, lease_seconds: int) -> int:
+    return await run_db(renew_owner_leases, owner, lease_seconds)
+
+async def arelease_owner_jobs(owner: str) -> int:
+    return await run_db(release_owner_jobs, owner)
+
+async def acount_jobs(status: str) -> int:
+    return await run_db(count_jobs, status)
+
+async def aclaim_job(owner: str, lease_seconds: int) -> Optional[Tuple[str, str, str, Optional[bytes]]]:
+    return await run_db(claim_job, owner, lease_seconds)
+
+async def arenew_lease(job_id: str, owner: str, lease_seconds: int) -> bool:
+    return await run_db(renew_lease, job_id, owner, lease_seconds)
+
+async def arelease_job(job_id: str, owner: str) -> bool:
+    return await run_db(release_job, job_id, owner)
+
+async def arequeue_expired_jobs(max_attempts: int) -> Tuple[int, int]:
+    return await run_db(requeue_expired_jobs, max_attempts)
@@ -0,0 +1,72 @@
+"""
+Local stand-in for the Deepgram pre-recorded API, for offline benchmarking.
+
+Run it and point the async transcriber at it:
+
+    python deepgram_stub.py --port 8089 --latency 0.8
+    DEEPGRAM_BASE_URL=http://127.0.0.1:8089 DEEPGRAM_API_KEY=stub python main.py
+
+`POST /v1/listen` reads the whole body, waits for the configured latency and
+returns a diarized transcript whose length grows with the size of the upload.
+"""
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+WORDS = ["um", "so", "i", "think", "we", "should", "like", "ship", "it", "today", "yeah", "right"]
+# One transcribed word per this many uploaded bytes (roughly 32 kbps speech)
+BYTES_PER_WORD = 1500
+
+
+def fake_response(audio_size: int) -> dict:
+    n_words = max(audio_size // BYTES_PER_WORD, 5)
+    words = []
+    t = 0.0
+    for i in range(n_words):
+        # Switch speakers every 8 words, with a short gap between words
+        speaker = (i // 8) % 2
+        duration = 0.25 + (i % 3) * 0.05
+        words.append({
+            "word": WORDS[i % len(WORDS)],
+            "start": round(t, 3),
+            "end": round(t + duration, 3),
+            "confidence": 0.99,
+            "speaker": speaker,
+            "punctuated_word": WORDS[i % len(WORDS)],
+        })
+        t += duration + (0.6 if i % 10 == 9 else 0.1)
+    transcript = " ".join(w["word"] for w in words)
+    return {
+        "metadata": {"duration": round(t, 3), "channels": 1, "models": ["stub"]},
+        "results": {"channels": [{"alternatives": [{"transcript": transcript, "confidence": 0.99, "words": words}]}]},
+    }
+
+
+def create_app(latency: float = 0.5, jitter: float = 0.0, failure_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Deepgram stub")
+
+    @app.post("/v1/listen")
+    async def listen(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        await asyncio.sleep(max(latency + random.uniform(-jitter, jitter), 0.0))
+        if random.random() < failure_rate:
+            raise HTTPException(status_code=503, detail="Stub failure")
+        return fake_response(size)
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Deepgram stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.jitter, args.failure_rate), host=args.host, port=args.port)
@@ -0,0 +1,79 @@
+"""
+Background move of old feedback rows to the compact storage format.
+
+Entries written before feedback_details existed keep their indented sub-agent reports
+and transcripts on the feedback row, and have no category_scores rows. Reads handle
+both layouts, so nothing has to happen at startup: while the API runs, this task
+walks the feedback table in id order, FEEDBACK_DETAILS_BATCH entries per
+transaction, pausing FEEDBACK_DETAILS_PAUSE_SECONDS between batches so it never
+competes with requests for long. Each entry is moved with a conditional UPDATE, so
+replicas running the move at the same time do not duplicate work. After a restart
+it starts over from the first id, skipping entries that were already moved.
+"""
+import asyncio
+import os
+from typing import Optional
+
+import database
+
+FEEDBACK_DETAILS_MIGRATION = os.getenv("FEEDBACK_DETAILS_MIGRATION", "1") == "1"
+FEEDBACK_DETAILS_BATCH = int(os.getenv("FEEDBACK_DETAILS_BATCH", "500"))
+FEEDBACK_DETAILS_PAUSE_SECONDS = float(os.getenv("FEEDBACK_DETAILS_PAUSE_SECONDS", "0.5"))
+# Pause before retrying a failed batch
+RETRY_SECONDS = 30.0
+
+
+class DetailsMigration:
+    def __init__(self, batch: int = FEEDBACK_DETAILS_BATCH, pause: float = FEEDBACK_DETAILS_PAUSE_SECONDS):
+        self.batch = batch
+        self.pause = pause
+        self.position = 0
+        self.batches = 0
+        self.failures = 0
+        self.done = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if FEEDBACK_DETAILS_MIGRATION:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run_batch(self) -> bool:
+        """Move one batch; False once every entry was examined"""
+        position = await database.amove_feedback_details(self.position, self.batch)
+        self.batches += 1
+        if position is None:
+            self.done = True
+            return False
+        self.position = position
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if not await self.run_batch():
+                    print(f"Feedback details migration finished after {self.batches} batches")
+                    return
+            except Exception as e:
+                print(f"Error migrating feedback details: {e}")
+                self.failures += 1
+                await asyncio.sleep(RETRY_SECONDS)
+                continue
+            await asyncio.sleep(self.pause)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": FEEDBACK_DETAILS_MIGRATION,
+            "done": self.done,
+            "position": self.position,
+            "batches": self.batches,
+            "failures": self.failures,
+        }
+
+
+details_migration = DetailsMigration()
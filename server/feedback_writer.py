@@ -0,0 +1,185 @@
+"""
+Write-behind buffer for feedback rows.
+
+Instead of an INSERT, commit and refresh round trip per analysis, finished results
+are buffered and written with one multi-row INSERT when FEEDBACK_BATCH_ROWS rows
+are waiting or the oldest row has waited FEEDBACK_MAX_STALENESS_MS, whichever
+comes first. `/feedback/report` therefore lags by at most the staleness bound, and
+so do the reports pushed to subscribers, which are published once their rows (and
+so their `(timestamp, id)` positions) exist.
+
+Durability: a result produced by a job is also staged on the job row together
+with the job's outcome (`finish_job(..., feedback_row=...)`), so it is not lost if
+the process dies before the buffer is flushed. Staged rows that never reached the
+feedback table are replayed on startup. The buffer is flushed on shutdown.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import compact
+import database
+from broadcast import broadcaster, report_event
+
+FEEDBACK_WRITE_BEHIND = os.getenv("FEEDBACK_WRITE_BEHIND", "1") == "1"
+FEEDBACK_BATCH_ROWS = int(os.getenv("FEEDBACK_BATCH_ROWS", "100"))
+FEEDBACK_MAX_STALENESS_MS = int(os.getenv("FEEDBACK_MAX_STALENESS_MS", "250"))
+# Staged rows replayed per startup
+FEEDBACK_RECOVERY_LIMIT = 10000
+# Pause before retrying a failed flush
+FLUSH_RETRY_SECONDS = 1.0
+
+
+def feedback_row(result: dict, time_taken: int, transcript: str, job_id: str = None, device_id: str = None) -> dict:
+    """Feedback table columns for a workflow result"""
+    return {
+        "feedback": result["final_answer"],
+        "intermediate_feedbacks": compact.dumps(result["sub_agent_reports"]),
+        "time_taken": time_taken,
+        "total_score": result.get("total_score"),
+        "transcript": transcript,
+        "timestamp": int(time.time()),
+        "job_id": job_id,
+        "device_id": device_id,
+    }
+
+
+def publish_row(row: dict, feedback_id: Optional[int]) -> None:
+    """Push a stored row to subscribed clients"""
+    if feedback_id is None:
+        # Without its id the row cannot be told apart from the watcher's copy
+        return
+    event = report_event(row["feedback"], row["timestamp"], row["intermediate_feedbacks"], row["device_id"])
+    broadcaster.publish(event, (row["timestamp"], feedback_id))
+
+
+class FeedbackWriter:
+    def __init__(self, batch_rows: int = FEEDBACK_BATCH_ROWS, max_staleness_ms: int = FEEDBACK_MAX_STALENESS_MS):
+        self.batch_rows = batch_rows
+        self.max_staleness = max_staleness_ms / 1000
+        self.buffer: List[dict] = []
+        self.oldest: Optional[float] = None
+        self.staged: Dict[str, dict] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+        self.recovered = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        try:
+            rows = await database.aget_unwritten_feedback(FEEDBACK_RECOVERY_LIMIT)
+        except Exception as e:
+            print(f"Could not recover staged feedback: {e}")
+            return
+        for row in rows:
+            self.submit(row)
+        self.recovered += len(rows)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self.buffer:
+            if not await self.flush():
+                # Left staged on their jobs, replayed on the next start
+                print(f"Dropping {len(self.buffer)} buffered feedback rows")
+                break
+
+    def submit(self, row: dict, stage: bool = False) -> None:
+        if not self.buffer:
+            self.oldest = time.monotonic()
+        self.buffer.append(row)
+        if stage:
+            # Picked up by the job runner and stored with the job's outcome
+            self.staged[row["job_id"]] = row
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def take_staged(self, job_id: str) -> Optional[str]:
+        row = self.staged.pop(job_id, None)
+        return json.dumps(row) if row is not None else None
+
+    def discard_staged(self, job_id: str) -> None:
+        """Forget the row staged for a job that failed or was cancelled after saving it"""
+        self.staged.pop(job_id, None)
+
+    async def flush(self) -> bool:
+        if not self.buffer:
+            return True
+        rows, self.buffer, self.oldest = self.buffer, [], None
+        try:
+            ids = await database.aadd_entries(rows)
+        except Exception as e:
+            print(f"Error flushing feedback: {e}")
+            self.failures += 1
+            self.buffer = rows + self.buffer
+            self.oldest = time.monotonic()
+            return False
+        self.flushes += 1
+        self.rows_written += len(rows)
+        for row, feedback_id in zip(rows, ids):
+            publish_row(row, feedback_id)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            if not self.buffer:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            # Wait until the batch is full or the oldest row reaches the staleness bound
+            while len(self.buffer) < self.batch_rows:
+                remaining = self.oldest + self.max_staleness - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if not await self.flush():
+                await asyncio.sleep(FLUSH_RETRY_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": FEEDBACK_WRITE_BEHIND,
+            "buffered": len(self.buffer),
+            "oldest_age_ms": round((time.monotonic() - self.oldest) * 1000) if self.oldest is not None else 0,
+            "max_staleness_ms": round(self.max_staleness * 1000),
+            "batch_rows": self.batch_rows,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+            "recovered": self.recovered,
+        }
+
+
+feedback_writer = FeedbackWriter()
+
+
+async def save_feedback(result: dict, time_taken: int, transcript: str, job_id: str = None, device_id: str = None) -> Optional[int]:
+    """
+    Store a workflow result and push it to subscribed clients. Returns the feedback ID
+    when it was written right away, None when it went to the write-behind buffer
+    (which pushes it once it is flushed).
+    """
+    row = feedback_row(result, time_taken, transcript, job_id, device_id)
+    if FEEDBACK_WRITE_BEHIND and feedback_writer.running:
+        feedback_writer.submit(row, stage=job_id is not None)
+        return None
+    feedback_id = await database.aadd_entry(
+        row["feedback"], row["intermediate_feedbacks"], time_taken, transcript, job_id, device_id, row["total_score"],
+        row["timestamp"],
+    )
+    publish_row(row, feedback_id)
+    return feedback_id
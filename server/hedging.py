@@ -0,0 +1,175 @@
+"""
+Hedged and retried model calls to cut tail latency.
+
+`resilient_call(key, fn)` runs `fn` (one model call) with two protections:
+
+- hedging: if the call is still running after the HEDGE_PERCENTILE latency of
+  recent calls with the same key (e.g. the sub-agent category), a duplicate is
+  fired and whichever succeeds first wins, the other one is cancelled. Hedges
+  draw from a budget that refills by HEDGE_BUDGET per call, so they can never
+  exceed that fraction of traffic even when the model is slow across the board.
+- retries: transient errors and unparseable structured output are retried up to
+  MODEL_MAX_RETRIES times with jittered exponential backoff. Quota errors are
+  already retried by the rate limiter and are not retried again here.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+
+from pydantic import ValidationError
+
+from ratelimit import is_throttled
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+# Latency percentile of recent calls after which a duplicate request is fired
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+# Hedges allowed per call on average
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))
+# Hedges that can be saved up while traffic is quiet
+HEDGE_MAX_BURST = float(os.getenv("HEDGE_MAX_BURST", "5"))
+# Below this many samples the percentile is not trusted and HEDGE_DEFAULT_DELAY_SECONDS is used
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "8.0"))
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "2"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "0.5"))
+LATENCY_WINDOW = 200
+
+
+class EmptyOutput(ValueError):
+    """The model answered but no structured output could be parsed from it"""
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (ValidationError, EmptyOutput, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if is_throttled(error):
+        # Already retried with backoff by the rate limiter
+        return False
+    name = error.__class__.__name__
+    return name in ("OutputParserException", "DeadlineExceeded", "InternalServerError", "ServiceUnavailable") \
+        or name.endswith(("TimeoutException", "ConnectError", "ReadError"))
+
+
+def _percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class LatencyTracker:
+    """Recent successful call latencies for one key"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def hedge_delay(self) -> float:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY_SECONDS
+        return _percentile(self.samples, HEDGE_PERCENTILE)
+
+    def stats(self) -> dict:
+        samples = list(self.samples)
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "latency_p50": round(_percentile(samples, 0.50), 3) if samples else 0.0,
+            "latency_p95": round(_percentile(samples, 0.95), 3) if samples else 0.0,
+            "hedge_delay": round(self.hedge_delay(), 3),
+        }
+
+
+class HedgeBudget:
+    """Each call earns HEDGE_BUDGET of a hedge, each hedge spends a whole one"""
+
+    def __init__(self, ratio: float = HEDGE_BUDGET, max_burst: float = HEDGE_MAX_BURST):
+        self.ratio = ratio
+        self.max_burst = max_burst
+        self.balance = 0.0
+
+    def earn(self) -> None:
+        self.balance = min(self.balance + self.ratio, self.max_burst)
+
+    def spend(self) -> bool:
+        if self.balance < 1.0:
+            return False
+        self.balance -= 1.0
+        return True
+
+
+trackers: Dict[str, LatencyTracker] = {}
+budget = HedgeBudget()
+
+
+def tracker_for(key: str) -> LatencyTracker:
+    if key not in trackers:
+        trackers[key] = LatencyTracker()
+    return trackers[key]
+
+
+async def _timed(fn: Callable[[], Awaitable[Any]], tracker: LatencyTracker) -> Any:
+    started = time.monotonic()
+    result = await fn()
+    tracker.record(time.monotonic() - started)
+    return result
+
+
+async def hedged(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Run `fn`, firing a duplicate if it is slower than usual and the hedge budget allows it"""
+    tracker = tracker_for(key)
+    tracker.calls += 1
+    budget.earn()
+    primary = asyncio.create_task(_timed(fn, tracker))
+    if not HEDGE_ENABLED:
+        return await primary
+
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=tracker.hedge_delay())
+        if not done and budget.spend():
+            tracker.hedges += 1
+            tasks.add(asyncio.create_task(_timed(fn, tracker)))
+
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        tracker.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def resilient_call(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """`hedged` plus bounded, jittered retries of retryable failures"""
+    for attempt in range(MODEL_MAX_RETRIES + 1):
+        try:
+            return await hedged(key, fn)
+        except Exception as e:
+            if attempt >= MODEL_MAX_RETRIES or not is_retryable(e):
+                raise
+            tracker_for(key).retries += 1
+            print(f"{key} call failed ({e.__class__.__name__}), retrying")
+            await asyncio.sleep(RETRY_BASE_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def hedging_stats() -> dict:
+    return {
+        "budget_balance": round(budget.balance, 2),
+        "calls": {key: tracker.stats() for key, tracker in trackers.items()},
+    }
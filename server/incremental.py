@@ -0,0 +1,230 @@
+"""
+Incremental (delta) analysis for cumulative transcripts.
+
+The Lens re-sends the whole accumulated transcript every `sendInterval` seconds.
+For a session we remember which words have already been analyzed together with
+the running per-category reports, send only the new suffix through the router
+and sub-agents, and fold the new rubric scores into the running results weighted
+by word count. Per-tick cost then depends on the size of the delta instead of
+the length of the conversation.
+
+A category whose sub-agent fails or times out keeps its previous running report
+and remembers where its unanalyzed words start; the next call sends those words
+to it again together with the new ones. When every sub-agent fails, nothing is
+treated as analyzed and the whole delta waits for the next call.
+
+Session state lives in the memory of the process that handled the previous
+upload. With several API processes (uvicorn --workers, replicas) each one keeps
+its own history, so a session's uploads must reach the same process (sticky
+routing on `session_id`) or deltas are computed against the wrong words; a
+process that has not seen the session analyzes the whole transcript again.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from backend import (
+    ANALYSIS_ENGINE, REPORT_OK, Deadline, SubAgentReport, SubAgentTask, average_score, final_synthesizer,
+    fused_analysis, quick_summary, route, run_sub_agent_until
+)
+
+# --- Config ---
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+# Fraction of the previously analyzed words that must still be present
+# for the new text to count as a continuation of the same transcript
+MIN_PREFIX_OVERLAP = float(os.getenv("MIN_PREFIX_OVERLAP", "0.8"))
+# Deltas shorter than this are held back until more words arrive
+MIN_DELTA_WORDS = int(os.getenv("MIN_DELTA_WORDS", "3"))
+# Trailing words of the transcript handed to the synthesizer as context
+SYNTH_CONTEXT_WORDS = int(os.getenv("SYNTH_CONTEXT_WORDS", "150"))
+
+
+# --- Session State ---
+class CategoryState(BaseModel):
+    report: SubAgentReport
+    words: int = Field(..., description="Number of words the running report is based on")
+
+
+class SessionState(BaseModel):
+    analyzed_words: List[str] = Field(default_factory=list)
+    categories: Dict[str, CategoryState] = Field(default_factory=dict)
+    # Categories whose sub-agent failed, with the index of the first word they have not analyzed
+    pending: Dict[str, int] = Field(default_factory=dict)
+    last_result: Optional[dict] = None
+    updated_at: float = Field(default_factory=time.time)
+
+
+_sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _get_session(session_id: str) -> SessionState:
+    """Return the state for `session_id`, evicting expired and least recently used sessions."""
+    now = time.time()
+    state = _sessions.get(session_id)
+    if state is not None and now - state.updated_at > SESSION_TTL_SECONDS:
+        state = None
+    if state is None:
+        state = SessionState()
+        _sessions[session_id] = state
+    _sessions.move_to_end(session_id)
+    excess = len(_sessions) - MAX_SESSIONS
+    if excess > 0:
+        # A session with a request in flight keeps its lock, or the next request would run alongside it
+        idle = [
+            key for key in _sessions
+            if key != session_id and (key not in _locks or not _locks[key].locked())
+        ]
+        for evicted in idle[:excess]:
+            del _sessions[evicted]
+            _locks.pop(evicted, None)
+    return state
+
+
+def reset_session(session_id: str) -> None:
+    _sessions.pop(session_id, None)
+    _locks.pop(session_id, None)
+
+
+def split_delta(analyzed_words: List[str], text: str) -> Tuple[bool, List[str]]:
+    """
+    Compare the new transcript with the already analyzed words.
+
+    Returns (is_continuation, delta_words). The comparison is done word by word so
+    that whitespace changes do not count as new text, and a few revised trailing
+    words (speech recognition often corrects the last words) are tolerated.
+    """
+    words = text.split()
+    if not analyzed_words:
+        return False, words
+
+    common = 0
+    for old, new in zip(analyzed_words, words):
+        if old != new:
+            break
+        common += 1
+
+    if common < len(analyzed_words) * MIN_PREFIX_OVERLAP:
+        return False, words
+    return True, words[common:]
+
+
+def merge_reports(previous: CategoryState, report: SubAgentReport, words: int) -> CategoryState:
+    """Fold a report computed on `words` new words into the running report, weighted by word count."""
+    old_words = previous.words
+    total_words = old_words + words
+    old = previous.report
+
+    rubric_scores = {}
+    for key in set(old.rubric_scores) | set(report.rubric_scores):
+        if key not in report.rubric_scores:
+            rubric_scores[key] = old.rubric_scores[key]
+        elif key not in old.rubric_scores:
+            rubric_scores[key] = report.rubric_scores[key]
+        else:
+            rubric_scores[key] = (old.rubric_scores[key] * old_words + report.rubric_scores[key] * words) / total_words
+
+    merged = SubAgentReport(
+        category=report.category,
+        score=(old.score * old_words + report.score * words) / total_words,
+        rubric_scores=rubric_scores,
+        # The prose always describes the most recent part of the conversation
+        what_went_right=report.what_went_right,
+        what_went_wrong=report.what_went_wrong,
+        how_to_improve=report.how_to_improve,
+    )
+    return CategoryState(report=merged, words=total_words)
+
+
+def completed(report: SubAgentReport) -> bool:
+    return report.status == REPORT_OK and bool(report.rubric_scores)
+
+
+async def run_incremental_workflow(session_id: str, input_text: str, router_mode: str = None, engine: str = None) -> Tuple[dict, bool]:
+    """
+    Session-aware variant of `backend.run_workflow`.
+
+    Returns (result, analyzed): the result has the same shape, but only the words that
+    were not analyzed on a previous call for this session are sent to the router and
+    sub-agents. `analyzed` is False when the delta was too short and the previous
+    result is returned unchanged, or when every sub-agent failed and the delta is
+    retried on the next call, so there is nothing new to store.
+    """
+    lock = _locks.setdefault(session_id, asyncio.Lock())
+    async with lock:
+        state = _get_session(session_id)
+        is_continuation, delta_words = split_delta(state.analyzed_words, input_text)
+        if not is_continuation:
+            # New or rewritten transcript, start over
+            state.categories = {}
+            state.pending = {}
+            state.last_result = None
+
+        if state.last_result is not None and len(delta_words) < MIN_DELTA_WORDS:
+            state.updated_at = time.time()
+            return state.last_result, False
+
+        words = input_text.split()
+        start = len(words) - len(delta_words)
+        delta_text = " ".join(delta_words)
+        # Categories that failed before catch up on every word since their failure
+        catch_up = [
+            SubAgentTask(category=category, text_to_analyze=" ".join(words[since:]))
+            for category, since in state.pending.items()
+        ]
+        summary = None
+        deadline = Deadline.from_seconds()
+        if (engine or ANALYSIS_ENGINE) == "fused":
+            # The fused summary describes the new words, which is what the prose fields describe as well
+            (reports, summary), *caught_up = await asyncio.gather(
+                fused_analysis(delta_text, deadline=deadline),
+                *(run_sub_agent_until(task, deadline=deadline) for task in catch_up)
+            )
+            reports = [r for r in reports if r.category not in state.pending] + caught_up
+        else:
+            router_context = await route(delta_text, router_mode, deadline)
+            tasks = [t for t in router_context.subagents_to_call if t.category not in state.pending] + catch_up
+            reports = await asyncio.gather(*(run_sub_agent_until(task, deadline=deadline) for task in tasks))
+
+        if reports and not any(completed(r) for r in reports):
+            # Every sub-agent failed: the delta stays unanalyzed and is sent again with the next call
+            state.updated_at = time.time()
+            if state.last_result is not None:
+                return state.last_result, False
+            fallback = quick_summary(reports)
+            return {
+                "sub_agent_reports": [r.dict() for r in reports],
+                "final_answer": fallback.summary,
+                "total_score": fallback.total_score
+            }, False
+
+        for report in reports:
+            since = state.pending.pop(report.category, start)
+            if not completed(report):
+                # Failed or timed out sub-agent, keep the previous running result for this category
+                state.pending[report.category] = since
+                continue
+            previous = state.categories.get(report.category)
+            if previous is None:
+                state.categories[report.category] = CategoryState(report=report, words=len(words) - since)
+            else:
+                state.categories[report.category] = merge_reports(previous, report, len(words) - since)
+
+        merged_reports = [c.report for c in state.categories.values()]
+        if summary is None:
+            context_text = " ".join(input_text.split()[-SYNTH_CONTEXT_WORDS:])
+            summary = (await final_synthesizer(context_text, merged_reports, deadline)).summary
+
+        state.analyzed_words = words
+        state.last_result = {
+            "sub_agent_reports": [r.dict() for r in merged_reports],
+            "final_answer": summary,
+            "total_score": average_score(merged_reports)
+        }
+        state.updated_at = time.time()
+        return state.last_result, True
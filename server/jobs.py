@@ -0,0 +1,298 @@
+"""
+Durable analysis jobs with a bounded worker pool.
+
+Uploads are persisted as job rows and put on a bounded in-process queue that a
+fixed number of workers drain. When the queue is full `submit` raises QueueFull
+so the API can answer 429 instead of opening unbounded Gemini calls.
+
+Every job of the queue is leased to its process, which renews all its leases every
+JOB_LEASE_SECONDS / 3. Jobs of a process that stopped (released on shutdown, or
+expired after a crash) are taken over by the next process with room in its queue,
+one conditional UPDATE per job, so several uvicorn workers never run a job twice.
+
+With JOB_EXECUTION=worker the API only persists jobs and separate `worker.py`
+processes lease and run them, so analysis capacity scales independently.
+
+Binary uploads (`voice_file` jobs) are copied from their spool to a file in
+JOB_AUDIO_DIR that the job's payload refers to, and removed when the job finishes,
+so an interrupted job can be run again after a restart. Processes on other hosts
+can only take such jobs over if JOB_AUDIO_DIR is shared storage. With JOB_AUDIO_DIR
+set to an empty string the audio only lives in the spool of the process that
+accepted it, and its job fails if that process stops before running it. In worker
+mode the audio is stored in the job row, where worker processes on any host find it.
+"""
+import asyncio
+import json
+import os
+import shutil
+import socket
+import time
+import uuid
+from typing import Optional
+
+import database
+import processors
+from feedback_writer import feedback_writer
+from uploads import SpooledAudio, spooled_from_bytes
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_RETRY_AFTER_SECONDS = int(os.getenv("JOB_RETRY_AFTER_SECONDS", "5"))
+# Directory keeping binary uploads until their jobs finish; empty keeps them in memory only
+JOB_AUDIO_DIR = os.getenv("JOB_AUDIO_DIR", "job_audio")
+# Audio files left behind (e.g. by jobs failed after too many attempts) are removed after this long
+JOB_AUDIO_RETENTION_SECONDS = int(os.getenv("JOB_AUDIO_RETENTION_SECONDS", str(24 * 3600)))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Jobs interrupted this many times are failed instead of run again
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# "inline": run jobs in the API process, "worker": leave them to worker.py processes
+JOB_EXECUTION = os.getenv("JOB_EXECUTION", "inline")
+JOB_EXECUTION_MODES = ("inline", "worker")
+# In worker mode, the number of queued jobs in the database at which uploads are rejected
+JOB_BACKLOG_LIMIT = int(os.getenv("JOB_BACKLOG_LIMIT", "1000"))
+
+
+class QueueFull(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+async def run_job(kind: str, payload: dict, audio: Optional[SpooledAudio] = None, job_id: str = None) -> dict:
+    """Run one job and return the processor result (workflow result plus `feedback_id`)"""
+    options = {
+        "router_mode": payload.get("router"),
+        "engine": payload.get("engine"),
+        "job_id": job_id,
+        "device_id": payload.get("device_id"),
+    }
+    if kind == "text":
+        return await processors.process_text(payload["text"], payload["timestamp"], payload.get("session_id"), **options)
+    if kind == "voice":
+        return await processors.process_voice(payload["voice"], payload["timestamp"], **options)
+    if kind == "voice_file":
+        if audio is None:
+            raise ValueError("Audio for this job is no longer available")
+        return await processors.process_voice_file(audio, payload["timestamp"], **options)
+    raise ValueError(f"Unknown job kind: {kind}")
+
+
+def restore_audio(kind: str, payload: dict, audio_bytes: Optional[bytes]) -> Optional[SpooledAudio]:
+    if kind != "voice_file":
+        return None
+    content_type = payload.get("content_type", "application/octet-stream")
+    if audio_bytes is not None:
+        return spooled_from_bytes(audio_bytes, content_type)
+    path = payload.get("audio_path")
+    if path is None or not os.path.exists(path):
+        return None
+    return SpooledAudio(open(path, "rb"), payload["audio_size"], payload["audio_sha256"], content_type)
+
+
+def store_audio(job_id: str, audio: SpooledAudio) -> str:
+    """Copy a spooled upload to its file in JOB_AUDIO_DIR, returning the path"""
+    os.makedirs(JOB_AUDIO_DIR, exist_ok=True)
+    path = os.path.join(JOB_AUDIO_DIR, f"{job_id}.audio")
+    audio.file.seek(0)
+    with open(path, "wb") as file:
+        shutil.copyfileobj(audio.file, file)
+        file.flush()
+        os.fsync(file.fileno())
+    return path
+
+
+def discard_audio(payload: dict) -> None:
+    """Remove the audio file of a finished job"""
+    path = payload.get("audio_path")
+    if path is None:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Could not remove {path}: {e}")
+
+
+def prune_audio(max_age_seconds: int = JOB_AUDIO_RETENTION_SECONDS) -> int:
+    """Remove audio files older than `max_age_seconds`, returning how many were removed"""
+    if not JOB_AUDIO_DIR or not os.path.isdir(JOB_AUDIO_DIR):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for entry in os.scandir(JOB_AUDIO_DIR):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def process_owner() -> str:
+    """Lease owner ID of this process"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class JobQueue:
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        maxsize: int = JOB_QUEUE_SIZE,
+        execution: str = JOB_EXECUTION,
+        lease_seconds: int = JOB_LEASE_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ):
+        if execution not in JOB_EXECUTION_MODES:
+            raise ValueError(f"Unknown job execution mode: {execution}")
+        self.workers = workers
+        self.maxsize = maxsize
+        self.execution = execution
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.owner = process_owner()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self.running = 0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.recovered = 0
+
+    async def start(self) -> None:
+        if self.execution == "worker":
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        await self.recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._queue is not None:
+            # Interrupted and still queued jobs can be taken over right away instead of after the lease
+            try:
+                await database.arelease_owner_jobs(self.owner)
+            except Exception as e:
+                print(f"Could not release jobs: {e}")
+
+    async def recover(self) -> None:
+        """Take over as many unfinished jobs of stopped processes as the queue has room for"""
+        room = self.maxsize - self._queue.qsize()
+        if room <= 0:
+            return
+        try:
+            unfinished = await database.atake_over_jobs(self.owner, self.lease_seconds, room, self.max_attempts)
+        except Exception as e:
+            print(f"Could not recover jobs: {e}")
+            return
+        for job_id, kind, payload, audio_bytes in unfinished:
+            payload = json.loads(payload)
+            self._queue.put_nowait((job_id, kind, payload, restore_audio(kind, payload, audio_bytes)))
+            self.recovered += 1
+
+    async def _maintain(self) -> None:
+        """Renew the leases of this process's jobs, and recover more jobs as the queue drains"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await database.arenew_owner_leases(self.owner, self.lease_seconds)
+            except Exception as e:
+                # Keep trying, the leases only lapse after lease_seconds
+                print(f"Could not renew job leases: {e}")
+            await self.recover()
+            await asyncio.to_thread(prune_audio)
+
+    async def submit(self, kind: str, payload: dict, audio: Optional[SpooledAudio] = None) -> str:
+        """Persist and enqueue a job, returning its ID. Raises QueueFull when at capacity."""
+        if self.execution == "worker":
+            return await self._submit_to_workers(kind, payload, audio)
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        if self._queue.full():
+            self.rejected += 1
+            raise QueueFull(f"Job queue is full ({self.maxsize} jobs)")
+
+        job_id = uuid.uuid4().hex
+        if audio is not None and JOB_AUDIO_DIR:
+            path = await asyncio.to_thread(store_audio, job_id, audio)
+            payload = {**payload, "audio_path": path, "audio_size": audio.size, "audio_sha256": audio.sha256}
+        try:
+            await database.acreate_job(job_id, kind, json.dumps(payload), None, self.owner, self.lease_seconds)
+        except BaseException:
+            discard_audio(payload)
+            raise
+        self._queue.put_nowait((job_id, kind, payload, audio))
+        self.submitted += 1
+        return job_id
+
+    async def _submit_to_workers(self, kind: str, payload: dict, audio: Optional[SpooledAudio]) -> str:
+        if await database.acount_jobs(database.JOB_QUEUED) >= JOB_BACKLOG_LIMIT:
+            self.rejected += 1
+            raise QueueFull(f"Job backlog is full ({JOB_BACKLOG_LIMIT} jobs)")
+        job_id = uuid.uuid4().hex
+        try:
+            # Worker processes can only see what is in the database
+            audio_bytes = await asyncio.to_thread(audio.read_all) if audio is not None else None
+        finally:
+            if audio is not None:
+                audio.close()
+        await database.acreate_job(job_id, kind, json.dumps(payload), audio_bytes)
+        self.submitted += 1
+        return job_id
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, kind, payload, audio = await self._queue.get()
+            self.running += 1
+            try:
+                if not await database.amark_job_running(job_id, self.owner):
+                    # The lease lapsed (e.g. the database was unreachable) and another process took the job
+                    if audio is not None:
+                        audio.close()
+                    continue
+                result = await run_job(kind, payload, audio, job_id)
+                await database.afinish_job(
+                    job_id,
+                    database.JOB_SUCCEEDED,
+                    result=json.dumps(result),
+                    feedback_id=result.get("feedback_id"),
+                    owner=self.owner,
+                    feedback_row=feedback_writer.take_staged(job_id),
+                )
+                discard_audio(payload)
+                self.succeeded += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self.failed += 1
+                try:
+                    await database.afinish_job(job_id, database.JOB_FAILED, error=str(e), owner=self.owner)
+                except Exception:
+                    pass
+                discard_audio(payload)
+            finally:
+                feedback_writer.discard_staged(job_id)
+                self.running -= 1
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "execution": self.execution,
+            "workers": self.workers,
+            "capacity": self.maxsize,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "recovered": self.recovered,
+        }
+
+
+job_queue = JobQueue()
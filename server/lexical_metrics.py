@@ -0,0 +1,181 @@
+"""
+Deterministic lexical metrics for the rubric numbers that can be counted from text.
+
+A single precompiled regex walks the transcript once and classifies every match as
+a filler phrase, hedge, acknowledgment, pause marker, sentence end, speaker label
+or plain word. The counts replace the corresponding LLM guesses so that scores are
+reproducible and the model only has to write the prose.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List
+
+from pydantic import BaseModel
+
+LEXICAL_METRICS = os.getenv("LEXICAL_METRICS", "1") == "1"
+# Sentences longer than this many words count as run-ons
+RUN_ON_WORDS = int(os.getenv("RUN_ON_WORDS", "15"))
+# Share of words at which a lexicon is considered saturated (raw score 1.0)
+FILLER_SATURATION = 0.10
+HEDGE_SATURATION = 0.10
+ACKNOWLEDGMENT_SATURATION = 0.05
+
+# --- Lexicons (lowercase, multi-word phrases allowed) ---
+FILLER_WORDS = [
+    "um", "umm", "ummm", "uh", "uhh", "uhm", "erm", "er", "ah", "hmm", "mm",
+    "you know", "i mean", "basically", "literally", "like",
+]
+HEDGES = [
+    "maybe", "perhaps", "probably", "possibly", "i think", "i guess", "i suppose",
+    "i feel like", "sort of", "kind of", "i don't know", "not sure", "might",
+]
+ACKNOWLEDGMENTS = [
+    "yeah", "yes", "right", "okay", "ok", "sure", "exactly", "i see", "got it",
+    "good point", "thank you", "thanks", "that makes sense", "i agree", "totally",
+]
+
+
+def _alternation(phrases: List[str]) -> str:
+    # Longest first so that "i feel like" wins over "like"
+    ordered = sorted(set(phrases), key=len, reverse=True)
+    return "|".join(r"\s+".join(re.escape(word) for word in phrase.split()) for phrase in ordered)
+
+
+def _filler_alternation() -> str:
+    # "like" is only a filler when set off by commas ("it was, like, fine"), not in "I like pizza"
+    others = [phrase for phrase in FILLER_WORDS if phrase != "like"]
+    return _alternation(others) + r"|(?<=,\s)like|like(?=\s*,)"
+
+
+MATCHER = re.compile(
+    r"(?P<label>^\s*Speaker\s+\d+:)"
+    rf"|(?P<hedge>\b(?:{_alternation(HEDGES)})\b)"
+    rf"|(?P<filler>\b(?:{_filler_alternation()})\b)"
+    rf"|(?P<ack>\b(?:{_alternation(ACKNOWLEDGMENTS)})\b)"
+    r"|(?P<pause>\.\.\.+|…)"
+    r"|(?P<end>[.!?]+)"
+    r"|(?P<word>[\w']+)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+class LexicalMetrics(BaseModel):
+    word_count: int
+    sentence_count: int
+    filler_count: int
+    hedge_count: int
+    acknowledgment_count: int
+    pause_count: int
+    speaker_count: int
+    mean_sentence_length: float
+    max_sentence_length: int
+    run_on_count: int
+
+    @property
+    def filler_ratio(self) -> float:
+        return self.filler_count / self.word_count if self.word_count else 0.0
+
+    @property
+    def hedge_ratio(self) -> float:
+        return self.hedge_count / self.word_count if self.word_count else 0.0
+
+    @property
+    def acknowledgment_ratio(self) -> float:
+        return self.acknowledgment_count / self.word_count if self.word_count else 0.0
+
+    @property
+    def run_on_ratio(self) -> float:
+        return self.run_on_count / self.sentence_count if self.sentence_count else 0.0
+
+    @property
+    def speed(self) -> float:
+        """The historical prosody "speed" figure (words / 5)"""
+        return self.word_count / 5
+
+
+@lru_cache(maxsize=256)
+def lexical_metrics(text: str) -> LexicalMetrics:
+    """Count everything in one pass over `text` (cached, every sub-agent sees the same text)"""
+    counts = {"filler": 0, "hedge": 0, "ack": 0, "pause": 0}
+    speakers = set()
+    sentence_lengths = []
+    words = 0
+    current = 0
+
+    for match in MATCHER.finditer(text):
+        kind = match.lastgroup
+        if kind == "label":
+            speakers.add(match.group().split()[1].rstrip(":"))
+            # A new speaker turn always starts a new sentence
+            if current:
+                sentence_lengths.append(current)
+                current = 0
+        elif kind == "end":
+            if current:
+                sentence_lengths.append(current)
+                current = 0
+        elif kind == "pause":
+            counts["pause"] += 1
+        else:
+            n = len(match.group().split())
+            words += n
+            current += n
+            if kind != "word":
+                counts[kind] += 1
+    if current:
+        sentence_lengths.append(current)
+
+    return LexicalMetrics(
+        word_count=words,
+        sentence_count=len(sentence_lengths),
+        filler_count=counts["filler"],
+        hedge_count=counts["hedge"],
+        acknowledgment_count=counts["ack"],
+        pause_count=counts["pause"],
+        speaker_count=max(len(speakers), 1),
+        mean_sentence_length=round(words / len(sentence_lengths), 2) if sentence_lengths else 0.0,
+        max_sentence_length=max(sentence_lengths, default=0),
+        run_on_count=sum(1 for length in sentence_lengths if length > RUN_ON_WORDS),
+    )
+
+
+def raw_scores(category: str, metrics: LexicalMetrics) -> Dict[str, float]:
+    """Raw rubric fields of the category output model that are measured instead of guessed"""
+    if not metrics.word_count:
+        return {}
+    if category == "FLUENCY":
+        return {
+            "raw_filler_words": min(metrics.filler_ratio / FILLER_SATURATION, 1.0),
+            "raw_run_ons": metrics.run_on_ratio,
+        }
+    if category == "CONSIDERATION":
+        scores = {"raw_hedging": min(metrics.hedge_ratio / HEDGE_SATURATION, 1.0)}
+        # Acknowledging others only makes sense in a conversation
+        if metrics.speaker_count > 1:
+            scores["raw_acknowledgment"] = min(metrics.acknowledgment_ratio / ACKNOWLEDGMENT_SATURATION, 1.0)
+        return scores
+    return {}
+
+
+def metrics_prompt(category: str, metrics: LexicalMetrics) -> str:
+    """Measured numbers handed to the sub-agent so it only has to explain them"""
+    if category == "FLUENCY":
+        lines = [
+            f"- filler words: {metrics.filler_count} of {metrics.word_count} words",
+            f"- run-on sentences (> {RUN_ON_WORDS} words): {metrics.run_on_count} of {metrics.sentence_count}",
+            f"- mean sentence length: {metrics.mean_sentence_length} words",
+        ]
+    elif category == "CONSIDERATION":
+        lines = [
+            f"- hedges: {metrics.hedge_count} of {metrics.word_count} words",
+            f"- acknowledgments: {metrics.acknowledgment_count}",
+        ]
+    elif category == "PROSODY":
+        lines = [f"- pause markers: {metrics.pause_count}"]
+    else:
+        return ""
+    return (
+        "\nMEASURED METRICS (exact counts, the matching scores are computed from them; "
+        "use them as given and focus on the written feedback):\n" + "\n".join(lines) + "\n"
+    )
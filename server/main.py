@@ -1,8 +1,14 @@
 import asyncio
-from fastapi import FastAPI, File, Query, UploadFile, HTTPException
+import json
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from fastapi import FastAPI, File, Query, Request, UploadFile, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile as FormFile
 import uvicorn
 import sys
 import os
+import time
 import dotenv
 
 dotenv.load_dotenv()
@@ -18,28 +24,86 @@ database.init_database()
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import processors
+from cache import workflow_cache
+from broadcast import TooManySubscribers, broadcaster
+from details_migration import details_migration
+from feedback_writer import feedback_writer
+from jobs import JOB_RETRY_AFTER_SECONDS, QueueFull, job_queue
+from report_cache import report_cache
+from rollups import GRANULARITIES, histogram_metrics, trend_buckets
+from ratelimit import limiter_stats
+from hedging import hedging_stats
+from transcribe_deepgram import transcriber
+from uploads import MAX_AUDIO_UPLOAD_BYTES, UploadTooLarge, read_upload_file, spool_stream
 from models import (
     TextUploadRequest, 
     TextUploadResponse, 
     ImageUploadResponse, 
+    CategoryAnalyticsResponse,
     ErrorResponse,
+    FeedbackHistoryResponse,
+    JobStatusResponse,
     ReportFeedbackResponse,
+    StreamAnalysisRequest,
+    TrendsResponse,
     VoiceUploadRequest,
     VoiceUploadResponse,
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await feedback_writer.start()
+    await broadcaster.start()
+    await job_queue.start()
+    await details_migration.start()
+    yield
+    await details_migration.stop()
+    # End open report streams and long-polls
+    await broadcaster.stop()
+    await job_queue.stop()
+    # Write out buffered feedback before the database executor goes away
+    await feedback_writer.stop()
+    # Close pooled connections on shutdown
+    await transcriber.aclose()
+    database.shutdown_executor()
+
 app = FastAPI(
     title="Speech Analysis API",
     description="AI-powered speech pattern and communication skills analysis system",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# Longest `wait` accepted by the /feedback/report long-poll
+MAX_LONG_POLL_SECONDS = 60
+# Comment lines sent on idle report streams so that proxies keep them open
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Columns of /feedback/history entries unless the caller picks others
+DEFAULT_HISTORY_FIELDS = "id,timestamp,time_taken,feedback"
+
+# Time window of /analytics/categories unless the caller gives one
+DEFAULT_ANALYTICS_WINDOW_SECONDS = 7 * 24 * 3600
+# Buckets of /analytics/trends: shown unless the caller gives a window, and at most
+DEFAULT_TREND_BUCKETS = {"hour": 48, "day": 30}
+MAX_TREND_BUCKETS = 1000
+
 def authenticate_request(secret_key: str):
     if secret_key != SECRET_KEY:
         raise HTTPException(status_code=403, detail="Invalid secret key")
 
+async def submit_job(kind: str, payload: dict, audio=None) -> str:
+    try:
+        return await job_queue.submit(kind, payload, audio)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(JOB_RETRY_AFTER_SECONDS)}
+        )
+
 @app.post("/upload/text", response_model=TextUploadResponse)
 async def upload_text(request: TextUploadRequest):
     """
@@ -56,7 +120,7 @@ async def upload_text(request: TextUploadRequest):
     - **TIME_BALANCE**: Assesses interruption ratio and speaking time distribution
     
     **Processing Workflow:**
-    1. Router Agent determines which analysis categories apply to the input
+    1. Router Agent (or the local router) determines which analysis categories apply to the input
     2. Relevant Sub-Agents analyze specific aspects and provide scores (0-1 scale)
     3. Synthesizer Agent combines all reports into a coherent summary
     4. Results are stored in the database for later retrieval
@@ -64,9 +128,22 @@ async def upload_text(request: TextUploadRequest):
     **Request Body:**
     - `text` (string, required): The text content to analyze (minimum 1 character)
     - `secret_key` (string, required): Secret key for authentication
+    - `session_id` (string, optional): Session ID for cumulative transcripts. When set, only the
+      text added since the previous upload of the same session goes through the sub-agents and
+      the new scores are merged into the running results of the session; an upload adding fewer
+      than `MIN_DELTA_WORDS` words keeps the previous result and stores no new entry
+    - `device_id` (string, optional): Device ID the feedback is stored under, see `device_id`
+      of `/feedback/report`
+    - `router` (string, optional): `"llm"` to let the router agent pick the categories, or `"local"` to
+      pick them deterministically without a model call (skips TIME_BALANCE for a single speaker).
+      Defaults to the `ROUTER_MODE` environment variable
+    - `engine` (string, optional): `"multi_agent"` for one sub-agent call per category plus the
+      synthesizer, or `"fused"` to analyze every category and write the summary in a single model
+      call. Defaults to the `ANALYSIS_ENGINE` environment variable
     
     **Response:**
     - `message`: Success confirmation message
+    - `job_id`: ID of the analysis job, poll `/jobs/{job_id}` for its status and result
     - `text_length`: Length of the processed text
     - `processed_at`: Timestamp when the request was processed
     
@@ -82,6 +159,7 @@ async def upload_text(request: TextUploadRequest):
     ```json
     {
         "message": "Text uploaded successfully",
+        "job_id": "3f2b9c1e8d7a4b6c9e0f1a2b3c4d5e6f",
         "text_length": 95,
         "processed_at": "2025-09-28T10:30:00"
     }
@@ -89,16 +167,26 @@ async def upload_text(request: TextUploadRequest):
     
     **Error Responses:**
     - `403 Forbidden`: Invalid or missing secret key
+    - `429 Too Many Requests`: The job queue is full, retry after the `Retry-After` header
     - `500 Internal Server Error`: Processing failed due to AI model issues or system errors
     
-    **Note:** Processing happens asynchronously. Use the `/feedback/report` endpoint to retrieve analysis results.
+    **Note:** Processing happens asynchronously in a bounded worker pool. Use `/jobs/{job_id}` or
+    the `/feedback/report` endpoint to retrieve analysis results.
     """
     authenticate_request(request.secret_key)
     
+    job_id = await submit_job("text", {
+        "text": request.text,
+        "timestamp": request.timestamp,
+        "session_id": request.session_id,
+        "device_id": request.device_id,
+        "router": request.router,
+        "engine": request.engine,
+    })
     try:
-        asyncio.create_task(processors.process_text(request.text, request.timestamp))
         return TextUploadResponse(
             message="Text uploaded successfully",
+            job_id=job_id,
             text_length=len(request.text)
         )
     except Exception as e:
@@ -111,19 +199,178 @@ async def upload_text(request: TextUploadRequest):
         )
 
 
+@app.post("/analyze/stream")
+async def analyze_stream(request: StreamAnalysisRequest):
+    """
+    Analyze text and stream the results as Server-Sent Events while they are produced.
+
+    Instead of waiting for the slowest sub-agent and the synthesizer, the client receives
+    each category report the moment its sub-agent finishes. The final result is stored in
+    the database like `/upload/text` results.
+
+    **Request Body:**
+    - `text` (string, required): The text content to analyze
+    - `secret_key` (string, required): Secret key for authentication
+    - `timestamp` (int, required): Timestamp of the request
+    - `device_id` (string, optional): Device ID the feedback is stored under
+    - `router` (string, optional): `"llm"` or `"local"`, see `/upload/text`
+    - `engine` (string, optional): `"multi_agent"` or `"fused"`, see `/upload/text`
+
+    **Event Stream:**
+    ```
+    event: report
+    data: {"category": "FLUENCY", "score": 0.82, "rubric_scores": {...}, ...}
+
+    event: report
+    data: {"category": "PRAGMATICS", ...}
+
+    event: summary
+    data: {"sub_agent_reports": [...], "final_answer": "...", "total_score": 0.78}
+    ```
+
+    **Error Responses:**
+    - `403 Forbidden`: Invalid or missing secret key
+    """
+    authenticate_request(request.secret_key)
+
+    async def event_stream():
+        try:
+            async for event in processors.stream_text(
+                request.text, request.timestamp, request.router, request.engine, request.device_id
+            ):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            error = ErrorResponse(message="Error processing text", error=str(e))
+            yield f"event: error\ndata: {error.model_dump_json()}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/upload/voice", response_model=VoiceUploadResponse)
 async def upload_voice(request: VoiceUploadRequest):
     """
     Upload and process voice files.
+
+    Returns a `job_id` to poll at `/jobs/{job_id}`, or `429 Too Many Requests` with a
+    `Retry-After` header when the job queue is full. With `device_id`, the feedback is
+    stored under that device.
     """
 
     authenticate_request(request.secret_key)
+    job_id = await submit_job("voice", {
+        "voice": request.voice,
+        "timestamp": request.timestamp,
+        "device_id": request.device_id,
+        "router": request.router,
+        "engine": request.engine,
+    })
+    try:
+        return VoiceUploadResponse(
+            message="Voice uploaded successfully",
+            job_id=job_id,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=ErrorResponse(
+                message="Error processing voice",
+                error=str(e)
+            ).model_dump()
+        )
+
+
+@app.post("/upload/voice/binary", response_model=VoiceUploadResponse)
+async def upload_voice_binary(
+    request: Request,
+    secret_key: str = Query(...),
+    timestamp: int = Query(...),
+    device_id: Optional[str] = Query(None, max_length=64),
+    router: Optional[Literal["llm", "local"]] = Query(None),
+    engine: Optional[Literal["multi_agent", "fused"]] = Query(None),
+):
+    """
+    Upload raw audio for transcription and analysis without base64 encoding.
+
+    The request body is streamed to a spooled temporary file and hashed on the fly, then
+    streamed on to the transcriber, so the audio is never held in memory more than once.
+    Until its job finishes the audio is also kept as a file in `JOB_AUDIO_DIR`, so the job
+    is run again after a restart. With `JOB_AUDIO_DIR` set to an empty string it only lives
+    in the accepting process, and the job fails if that process stops before running it.
+
+    **Request:**
+    - Body: the audio file itself (`Content-Type: audio/mpeg`, `audio/wav`, ...), sent with a
+      `Content-Length` or chunked transfer encoding, or as multipart form data with the
+      file in the first file field
+    - Query `secret_key` (string, required): Secret key for authentication
+    - Query `timestamp` (int, required): Timestamp of the request
+    - Query `device_id` (string, optional): Device ID the feedback is stored under
+    - Query `router` / `engine` (string, optional): see `/upload/text`
+
+    **Response:**
+    - `message`: Success confirmation message
+    - `job_id`: ID of the analysis job, poll `/jobs/{job_id}` for its status and result
+    - `size`: Number of bytes received
+    - `sha256`: SHA-256 of the audio, identical uploads are only transcribed once
+
+    **Error Responses:**
+    - `403 Forbidden`: Invalid or missing secret key
+    - `413 Request Entity Too Large`: Audio is larger than `MAX_AUDIO_UPLOAD_BYTES`
+    - `429 Too Many Requests`: The job queue is full, retry after the `Retry-After` header
+
+    **Usage Example (curl):**
+    ```bash
+    curl -X POST "http://localhost:8000/upload/voice/binary?secret_key=...&timestamp=1695902400" \
+         -H "Content-Type: audio/mpeg" \
+         --data-binary @recording.mp3
+    ```
+    """
+    authenticate_request(secret_key)
+
+    declared_length = request.headers.get("content-length")
+    if declared_length and declared_length.isdigit() and int(declared_length) > MAX_AUDIO_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Audio exceeds the {MAX_AUDIO_UPLOAD_BYTES} byte limit")
+
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            try:
+                upload = next((value for value in form.values() if isinstance(value, FormFile)), None)
+                if upload is None:
+                    raise HTTPException(status_code=400, detail="No audio file in the form data")
+                audio = await spool_stream(read_upload_file(upload), upload.content_type or "application/octet-stream")
+            finally:
+                # Removes the form's own temporary files, the audio lives on in its spool
+                await form.close()
+        else:
+            audio = await spool_stream(request.stream(), content_type)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        job_id = await submit_job("voice_file", {
+            "timestamp": timestamp,
+            "device_id": device_id,
+            "router": router,
+            "engine": engine,
+            "content_type": audio.content_type,
+        }, audio)
+    except HTTPException:
+        audio.close()
+        raise
     try:
-        asyncio.create_task(processors.process_voice(request.voice, request.timestamp))
         return VoiceUploadResponse(
             message="Voice uploaded successfully",
+            job_id=job_id,
+            size=audio.size,
+            sha256=audio.sha256
         )
     except Exception as e:
+        audio.close()
         raise HTTPException(
             status_code=500,
             detail=ErrorResponse(
@@ -209,8 +456,38 @@ async def upload_image(image: UploadFile = File(...), secret_key: str = Query(..
             ).model_dump()
         )
 
+def subscribe_to_reports(queue_size: int = None, device_id: str = None):
+    try:
+        return broadcaster.subscribe(queue_size, device_id)
+    except TooManySubscribers as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(JOB_RETRY_AFTER_SECONDS)}
+        )
+
+async def wait_for_report(subscription, since: int, wait: float) -> Optional[dict]:
+    """The first report pushed after subscribing, or None after `wait` seconds"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None
+        try:
+            event = await asyncio.wait_for(subscription.get(), remaining)
+        except asyncio.TimeoutError:
+            return None
+        # Pushed reports are new even within the second of `since` (timestamps are whole seconds)
+        if event is None or event["last_updated"] >= since:
+            return event
+
 @app.get("/feedback/report", response_model=ReportFeedbackResponse)
-async def report_feedback():
+async def report_feedback(
+    device_id: Optional[str] = Query(None, max_length=64, description="Only consider reports of this device"),
+    since: Optional[int] = Query(None, description="`last_updated` of the report the client already has"),
+    wait: float = Query(0, ge=0, le=MAX_LONG_POLL_SECONDS, description="Seconds to wait for a newer report")
+):
     """
     Retrieve the most recent speech analysis feedback report.
     
@@ -231,6 +508,8 @@ async def report_feedback():
     - Results are stored in SQLite database (`database/feedback.db`)
     - Each entry includes feedback text and Unix timestamp
     - Only the most recent entry is returned by this endpoint
+    - The latest entry is cached (see `report_cache.py`), so polling does not query the database;
+      the cache is updated when an entry is stored and refreshed after `REPORT_CACHE_TTL_SECONDS`
     
     **Response Fields:**
     - `message`: The complete analysis feedback text (empty string if no data)
@@ -254,28 +533,49 @@ async def report_feedback():
     }
     ```
     
+    **Devices:**
+    With `device_id`, the latest report of that device is returned (the one uploaded with
+    the same `device_id`), so several devices do not see each other's feedback. The lookup
+    is served by the `(device_id, timestamp)` index.
+
+    **Long-Polling:**
+    With `since` (the `last_updated` the client already has) and `wait` (seconds, up to 60),
+    the request is held until a newer report is stored and returns it right away. If none
+    arrives within `wait` seconds, the current report is returned unchanged. Clients loop
+    on this instead of polling on a timer; `/feedback/stream` pushes reports over SSE.
+
     **Error Responses:**
     - `500 Internal Server Error`: Database access failed or system error
+    - `503 Service Unavailable`: Too many clients are waiting for reports
     
     **Usage Notes:**
     - This endpoint should be called after submitting text for analysis
     - Results may take several seconds to appear due to AI processing time
-    - Only the most recent analysis is available; historical data is not exposed via API
-    - Consider implementing polling or webhooks for real-time updates in production
+    - Only the most recent analysis is returned; use `/feedback/history` for older entries
     
     **Usage Example (curl):**
     ```bash
     curl -X GET "http://localhost:8000/feedback/report" \
          -H "accept: application/json"
+
+    # Wait up to 30 s for a report newer than the one shown
+    curl "http://localhost:8000/feedback/report?since=1695902400&wait=30"
     ```
     """
+    # Subscribe before reading, so that a report stored in between is not missed
+    subscription = subscribe_to_reports(1, device_id) if since is not None and wait > 0 else None
     try:
-        recent_feedback = database.get_most_recent_entry()
+        recent_feedback = await database.aget_most_recent_entry(device_id)
         print(recent_feedback)
+        if subscription is not None and (recent_feedback is None or int(recent_feedback[1]) <= since):
+            event = await wait_for_report(subscription, since, wait)
+            if event is not None:
+                return ReportFeedbackResponse(**event)
         if recent_feedback is None:
             return ReportFeedbackResponse(
                 message="",
-                last_updated=0
+                last_updated=0,
+                details=""
             )
 
         return ReportFeedbackResponse(
@@ -291,6 +591,322 @@ async def report_feedback():
                 error=str(e)
             ).model_dump()
         )
+    finally:
+        if subscription is not None:
+            broadcaster.unsubscribe(subscription)
+
+@app.get("/feedback/stream")
+async def feedback_stream(
+    device_id: Optional[str] = Query(None, max_length=64, description="Only push reports of this device"),
+    since: Optional[int] = Query(None, description="`last_updated` of the report the client already has")
+):
+    """
+    Push every finished analysis as a Server-Sent Event the moment it is stored.
+
+    Replaces polling `/feedback/report`: the connection stays open and each report is
+    sent as soon as `process_text`/`process_voice` finishes, to every connected client.
+    A client that reads too slowly skips the oldest undelivered reports rather than
+    building up a backlog.
+
+    **Query Parameters:**
+    - `device_id` (string, optional): Only push reports of this device
+    - `since` (int, optional): `last_updated` of the report the client already has. If the
+      latest stored report is newer, it is sent right after connecting.
+
+    **Event Stream:**
+    ```
+    event: report
+    data: {"message": "Analysis Summary: ...", "last_updated": 1695902400, "details": "[...]"}
+
+    : keepalive
+    ```
+
+    **Error Responses:**
+    - `503 Service Unavailable`: Too many clients are subscribed
+
+    **Usage Example (curl):**
+    ```bash
+    curl -N "http://localhost:8000/feedback/stream"
+    ```
+    """
+    subscription = subscribe_to_reports(device_id=device_id)
+
+    async def event_stream():
+        try:
+            if since is not None:
+                recent_feedback = await database.aget_most_recent_entry(device_id)
+                if recent_feedback is not None and int(recent_feedback[1]) > since:
+                    event = ReportFeedbackResponse(
+                        message=recent_feedback[0],
+                        last_updated=int(recent_feedback[1]),
+                        details=recent_feedback[2] or ""
+                    )
+                    yield f"event: report\ndata: {event.model_dump_json()}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield f"event: report\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/feedback/history", response_model=FeedbackHistoryResponse)
+async def feedback_history(
+    limit: int = Query(20, ge=1, le=100, description="Entries per page"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+    fields: str = Query(DEFAULT_HISTORY_FIELDS, description="Comma-separated columns to return"),
+    device_id: Optional[str] = Query(None, max_length=64, description="Only entries of this device")
+):
+    """
+    Page through stored feedback entries, newest first.
+
+    Pages are cursor based: pass the `next_cursor` of a response to get the next page.
+    Unlike offset paging, every page costs the same index range scan however deep it
+    is, and entries stored while paging do not shift the pages.
+
+    **Query Parameters:**
+    - `limit` (int, optional): Entries per page, 1 to 100 (default 20)
+    - `cursor` (string, optional): Opaque cursor from the previous page
+    - `fields` (string, optional): Comma-separated columns to return, from `id`, `timestamp`,
+      `time_taken`, `feedback`, `intermediate_feedbacks`, `transcript`, `job_id`, `device_id`
+      (default `id,timestamp,time_taken,feedback`). The large `transcript` and
+      `intermediate_feedbacks` columns are only read from the database when requested.
+    - `device_id` (string, optional): Only entries of this device
+
+    **Response Fields:**
+    - `items`: The entries, each with the requested fields
+    - `next_cursor`: Cursor of the next page, null on the last page
+
+    **Error Responses:**
+    - `400 Bad Request`: Unknown field or malformed cursor
+    - `500 Internal Server Error`: Database access failed
+
+    **Usage Example (curl):**
+    ```bash
+    curl "http://localhost:8000/feedback/history?limit=50&fields=id,timestamp,transcript"
+    ```
+    """
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in database.FEEDBACK_FIELDS]
+    if not requested or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown) or '(none given)'}")
+    try:
+        before = database.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        items, next_position = await database.aget_feedback_page(
+            list(dict.fromkeys(requested)), limit, before, device_id
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=ErrorResponse(
+                message="Error getting feedback history",
+                error=str(e)
+            ).model_dump()
+        )
+    return FeedbackHistoryResponse(
+        items=items,
+        next_cursor=database.encode_cursor(next_position) if next_position else None
+    )
+
+@app.get("/analytics/categories", response_model=CategoryAnalyticsResponse)
+async def category_analytics(
+    since: Optional[int] = Query(None, description="Start of the window (unix seconds, default 7 days ago)"),
+    until: Optional[int] = Query(None, description="End of the window, exclusive (unix seconds, default now)"),
+    categories: Optional[str] = Query(None, description="Comma-separated categories to include (default all)")
+):
+    """
+    Score distribution of each analysis category over a time window.
+
+    Every stored analysis writes one row per sub-agent report (and per rubric item) to
+    the `category_scores` table, so the statistics are aggregated by the database from
+    an index on (category, timestamp) instead of parsing `intermediate_feedbacks` of
+    every entry. Reports of failed or timed-out agents are not counted.
+
+    **Query Parameters:**
+    - `since` (int, optional): Start of the window in unix seconds (default 7 days ago)
+    - `until` (int, optional): End of the window in unix seconds, exclusive (default now)
+    - `categories` (string, optional): Comma-separated categories, e.g. `FLUENCY,PROSODY`
+
+    **Response Fields:**
+    - `since`, `until`: The window that was aggregated
+    - `categories`: Per category: `count`, `mean`, `min`, `max`, the nearest-rank
+      percentiles `p50`, `p90` and `p95` of its scores, and `rubrics`, the mean of each
+      rubric item
+
+    **Error Responses:**
+    - `400 Bad Request`: `since` is not before `until`
+    - `500 Internal Server Error`: Database access failed
+
+    **Usage Example (curl):**
+    ```bash
+    curl "http://localhost:8000/analytics/categories?categories=FLUENCY"
+    ```
+    """
+    until = until if until is not None else int(time.time()) + 1
+    since = since if since is not None else until - DEFAULT_ANALYTICS_WINDOW_SECONDS
+    if since >= until:
+        raise HTTPException(status_code=400, detail="`since` must be before `until`")
+    selected = [name.strip() for name in categories.split(",") if name.strip()] if categories else None
+    try:
+        stats = await database.aget_category_stats(since, until, selected)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=ErrorResponse(
+                message="Error getting category analytics",
+                error=str(e)
+            ).model_dump()
+        )
+    return CategoryAnalyticsResponse(since=since, until=until, categories=stats)
+
+@app.get("/analytics/trends", response_model=TrendsResponse)
+async def analytics_trends(
+    granularity: Literal["hour", "day"] = Query("hour", description="Bucket size"),
+    since: Optional[int] = Query(None, description="Start of the window (unix seconds, default 48 hours / 30 days ago)"),
+    until: Optional[int] = Query(None, description="End of the window, exclusive (unix seconds, default now)"),
+    metrics: Optional[str] = Query(None, description="Comma-separated metrics to include (default all)")
+):
+    """
+    Hourly or daily trends of the stored analyses.
+
+    Served from the `feedback_rollups` table, which every stored analysis updates as it
+    is committed, so the cost grows with the number of buckets rather than the number
+    of entries. Buckets without any analysis are left out.
+
+    **Query Parameters:**
+    - `granularity` (string, optional): `hour` (default) or `day`, in UTC
+    - `since` (int, optional): Start of the window in unix seconds (default 48 hours ago
+      for `hour`, 30 days ago for `day`)
+    - `until` (int, optional): End of the window in unix seconds, exclusive (default now)
+    - `metrics` (string, optional): Comma-separated metrics, from `total_score`,
+      `time_taken` and the category names (e.g. `FLUENCY`)
+
+    **Response Fields:**
+    - `buckets`: One per hour/day, with its `start` (unix seconds), the `count`, `mean`
+      and `stddev` of each metric, and the `time_taken_histogram` (entries per bin of
+      analysis time in seconds, e.g. `le_5`, `gt_60`)
+
+    **Error Responses:**
+    - `400 Bad Request`: `since` is not before `until`, or the window spans more than
+      1000 buckets
+    - `500 Internal Server Error`: Database access failed
+
+    **Usage Example (curl):**
+    ```bash
+    curl "http://localhost:8000/analytics/trends?granularity=day&metrics=total_score,FLUENCY"
+    ```
+    """
+    size = GRANULARITIES[granularity]
+    until = until if until is not None else int(time.time()) + 1
+    since = since if since is not None else until - DEFAULT_TREND_BUCKETS[granularity] * size
+    if since >= until:
+        raise HTTPException(status_code=400, detail="`since` must be before `until`")
+    if (until - since) / size > MAX_TREND_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"The window spans more than {MAX_TREND_BUCKETS} buckets")
+    selected = [name.strip() for name in metrics.split(",") if name.strip()] if metrics else None
+    if selected and "time_taken" in selected:
+        # The histogram comes with time_taken
+        selected += histogram_metrics()
+    try:
+        rows = await database.aget_rollups(granularity, since - since % size, until, selected)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=ErrorResponse(
+                message="Error getting trends",
+                error=str(e)
+            ).model_dump()
+        )
+    return TrendsResponse(granularity=granularity, since=since, until=until, buckets=trend_buckets(rows))
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def job_status(job_id: str):
+    """
+    Status and result of an analysis job.
+
+    Uploads return a `job_id`. Jobs move from `queued` to `running` to `succeeded` or
+    `failed`; job state is stored in the database, so jobs queued before a restart are
+    resumed and stay queryable afterwards.
+
+    **Response Fields:**
+    - `job_id`, `kind` (`text`, `voice` or `voice_file`) and `status`
+    - `attempts`: Number of times a worker started the job
+    - `feedback_id`: ID of the stored feedback entry once the job succeeded; null when the entry
+      went through the write-behind buffer (it is matched to the job by `job_id` instead)
+    - `result`: The analysis result (`sub_agent_reports`, `final_answer`, `total_score`) once the job succeeded
+    - `error`: The error message if the job failed
+    - `created_at`, `started_at`, `finished_at`: Job timestamps
+
+    **Error Responses:**
+    - `404 Not Found`: No job with this ID
+    """
+    try:
+        job = await database.aget_job(job_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=ErrorResponse(
+                message="Error getting job",
+                error=str(e)
+            ).model_dump()
+        )
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(
+        job_id=job["id"],
+        kind=job["kind"],
+        status=job["status"],
+        attempts=job["attempts"],
+        feedback_id=job["feedback_id"],
+        result=json.loads(job["result"]) if job["result"] else None,
+        error=job["error"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"]
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Runtime counters for capacity planning.
+
+    **Response Fields:**
+    - `workflow_cache`: Size, hit/miss counters and eviction counts of the analysis result cache
+    - `transcriber`: Concurrency limit, in-flight uploads and request counters of the Deepgram client
+    - `jobs`: Worker count, queue depth and job counters of the analysis job queue
+    - `llm`: Per model: adaptive concurrency limit, in-flight and waiting calls, 429/503 count,
+      retries and the time calls spent queued in the rate limiter (mean, p50, p95, max seconds)
+    - `hedging`: Per sub-agent category: latency percentiles, hedge delay, hedges fired and won,
+      retries, plus the remaining hedge budget
+    - `feedback_writer`: Rows waiting in the write-behind buffer, age of the oldest one, flushes,
+      rows written, failed flushes and rows recovered from jobs on startup
+    - `report_cache`: Backend, TTL and hit/miss/publish counters of the latest-report cache
+    - `broadcast`: Connected report subscribers, reports pushed and reports dropped for slow clients
+    """
+    return {
+        "workflow_cache": workflow_cache.stats(),
+        "transcriber": transcriber.stats(),
+        "jobs": job_queue.stats(),
+        "llm": limiter_stats(),
+        "hedging": hedging_stats(),
+        "feedback_writer": feedback_writer.stats(),
+        "report_cache": report_cache.stats(),
+        "broadcast": broadcaster.stats(),
+        "details_migration": details_migration.stats()
+    }
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,122 @@
+"""
+Versioned schema migrations.
+
+`Base.metadata.create_all` creates missing tables with their current columns and
+indexes, but never changes a table that already exists. Changes to existing tables
+are listed in MIGRATIONS and applied in order by `run_migrations`, which records
+the versions it applied in the `schema_version` table. Every migration inspects the
+live schema first, so on a database that create_all just built it only records its
+version.
+"""
+import time
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, inspect, select, text
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.engine import Connection, Engine
+
+metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", Integer, nullable=False),
+)
+
+
+# --- Helpers ---
+
+def has_column(connection: Connection, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(connection).get_columns(table)}
+
+
+def has_index(connection: Connection, table: str, name: str) -> bool:
+    return name in {i["name"] for i in inspect(connection).get_indexes(table)}
+
+
+def add_column(connection: Connection, table: str, column: str, column_type) -> None:
+    if not has_column(connection, table, column):
+        ddl = column_type.compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl} NULL"))
+
+
+def create_index(connection: Connection, table: str, name: str, columns: Tuple[str, ...]) -> None:
+    if not has_index(connection, table, name):
+        connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+
+# --- Migrations ---
+
+def add_job_leases(connection: Connection) -> None:
+    add_column(connection, "jobs", "lease_owner", String(64))
+    add_column(connection, "jobs", "lease_expires_at", Integer())
+    create_index(connection, "jobs", "ix_jobs_lease_expires_at", ("lease_expires_at",))
+
+
+def add_write_behind_columns(connection: Connection) -> None:
+    add_column(connection, "feedback", "job_id", String(32))
+    create_index(connection, "feedback", "ix_feedback_job_id", ("job_id",))
+    add_column(connection, "jobs", "feedback_row", Text().with_variant(LONGTEXT(), "mysql"))
+
+
+def index_feedback_timestamp(connection: Connection) -> None:
+    # Serves the latest report and keyset pages of /feedback/history from the index
+    create_index(connection, "feedback", "ix_feedback_timestamp_id", ("timestamp", "id"))
+
+
+def add_feedback_devices(connection: Connection) -> None:
+    add_column(connection, "feedback", "device_id", String(64))
+    create_index(connection, "feedback", "ix_feedback_device_timestamp", ("device_id", "timestamp", "id"))
+
+
+def add_feedback_details(connection: Connection) -> None:
+    # The feedback_details table itself is created by create_all; existing rows are
+    # moved into it in the background (details_migration.py)
+    add_column(connection, "feedback", "details_id", String(32))
+
+
+def index_feedback_details(connection: Connection) -> None:
+    # Finds the ids of batch-inserted entries for their category_scores rows (a table create_all makes)
+    create_index(connection, "feedback", "ix_feedback_details_id", ("details_id",))
+
+
+def add_feedback_total_score(connection: Connection) -> None:
+    # Rolled up into feedback_rollups, a table create_all makes
+    add_column(connection, "feedback", "total_score", Float())
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Lease columns on jobs", add_job_leases),
+    (2, "Write-behind columns on feedback and jobs", add_write_behind_columns),
+    (3, "Index feedback by (timestamp, id)", index_feedback_timestamp),
+    (4, "Device ID on feedback, indexed with (timestamp, id)", add_feedback_devices),
+    (5, "Reference from feedback to its feedback_details row", add_feedback_details),
+    (6, "Index feedback by details_id", index_feedback_details),
+    (7, "Total score on feedback", add_feedback_total_score),
+]
+
+
+def current_version(engine: Engine) -> int:
+    metadata.create_all(engine)
+    with engine.connect() as connection:
+        versions = connection.execute(select(schema_version.c.version)).scalars().all()
+    return max(versions, default=0)
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply pending migrations, each in its own transaction; returns the versions applied"""
+    applied = []
+    version = current_version(engine)
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(schema_version.insert().values(
+                version=number, description=description, applied_at=int(time.time())
+            ))
+        print(f"Applied migration {number}: {description}")
+        applied.append(number)
+    return applied
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime
 
 
@@ -8,6 +8,20 @@ class TextUploadRequest(BaseModel):
     text: str = Field(..., min_length=1, description="Text content to process")
     secret_key: str = Field(..., description="Secret key to authenticate the request")
     timestamp: int = Field(..., description="Timestamp of the request")
+    session_id: Optional[str] = Field(None, max_length=64, description="Session of cumulative transcripts; when set, only the text added since the previous upload of this session is analyzed")
+    device_id: Optional[str] = Field(None, max_length=64, description="Device ID the feedback is stored under")
+    router: Optional[Literal["llm", "local"]] = Field(None, description="Router used to pick the analysis categories (defaults to ROUTER_MODE)")
+    engine: Optional[Literal["multi_agent", "fused"]] = Field(None, description="Analysis engine (defaults to ANALYSIS_ENGINE)")
+
+
+class StreamAnalysisRequest(BaseModel):
+    """Request model for the streaming analysis endpoint"""
+    text: str = Field(..., min_length=1, description="Text content to analyze")
+    secret_key: str = Field(..., description="Secret key to authenticate the request")
+    timestamp: int = Field(..., description="Timestamp of the request")
+    device_id: Optional[str] = Field(None, max_length=64, description="Device ID the feedback is stored under")
+    router: Optional[Literal["llm", "local"]] = Field(None, description="Router used to pick the analysis categories (defaults to ROUTER_MODE)")
+    engine: Optional[Literal["multi_agent", "fused"]] = Field(None, description="Analysis engine (defaults to ANALYSIS_ENGINE)")
 
 
 class ImageUploadResponse(BaseModel):
@@ -22,6 +36,7 @@ class ImageUploadResponse(BaseModel):
 class TextUploadResponse(BaseModel):
     """Response model for text upload endpoint"""
     message: str
+    job_id: Optional[str] = None
     text_length: Optional[int] = None
     processed_at: datetime = Field(default_factory=datetime.now)
 
@@ -49,8 +64,69 @@ class VoiceUploadRequest(BaseModel):
     voice: str = Field(..., description="Voice content to process")
     secret_key: str = Field(..., description="Secret key to authenticate the request")
     timestamp: int = Field(..., description="Timestamp of the request")
+    device_id: Optional[str] = Field(None, max_length=64, description="Device ID the feedback is stored under")
+    router: Optional[Literal["llm", "local"]] = Field(None, description="Router used to pick the analysis categories (defaults to ROUTER_MODE)")
+    engine: Optional[Literal["multi_agent", "fused"]] = Field(None, description="Analysis engine (defaults to ANALYSIS_ENGINE)")
 
 class VoiceUploadResponse(BaseModel):
     """Response model for voice upload endpoint"""
     message: str
+    job_id: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
     processed_at: datetime = Field(default_factory=datetime.now)
+
+class JobStatusResponse(BaseModel):
+    """Response model for job status endpoint"""
+    job_id: str
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    attempts: int = 0
+    feedback_id: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class FeedbackHistoryResponse(BaseModel):
+    """Response model for feedback history endpoint"""
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+class CategoryStats(BaseModel):
+    """Score distribution of one analysis category"""
+    category: str
+    count: int
+    mean: float
+    min: float
+    max: float
+    p50: float
+    p90: float
+    p95: float
+    rubrics: Dict[str, float] = Field(default_factory=dict, description="Mean of each rubric item")
+
+class CategoryAnalyticsResponse(BaseModel):
+    """Response model for category analytics endpoint"""
+    since: int
+    until: int
+    categories: List[CategoryStats]
+
+class MetricSummary(BaseModel):
+    """Distribution of a metric within one time bucket"""
+    count: int
+    mean: Optional[float] = None
+    stddev: Optional[float] = None
+
+class TrendBucket(BaseModel):
+    """Rolled-up analyses of one hour or day"""
+    start: int
+    metrics: Dict[str, MetricSummary]
+    time_taken_histogram: Dict[str, int] = Field(default_factory=dict, description="Entries per time_taken bin, e.g. `le_5` (seconds)")
+
+class TrendsResponse(BaseModel):
+    """Response model for trends endpoint"""
+    granularity: Literal["hour", "day"]
+    since: int
+    until: int
+    buckets: List[TrendBucket]
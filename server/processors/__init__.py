@@ -1,4 +1,4 @@
-from .text import process_text
+from .text import process_text, stream_text
 from .image import process_image
-from .voice import process_voice
-__all__ = ['process_text', 'process_image', 'process_voice']
+from .voice import process_voice, process_voice_file
+__all__ = ['process_text', 'stream_text', 'process_image', 'process_voice', 'process_voice_file']
@@ -1,14 +1,31 @@
-import json
 import time
-from database import add_entry
-from backend import run_workflow
+from feedback_writer import save_feedback
+from backend import run_workflow, stream_workflow
+from incremental import run_incremental_workflow
 
-async def process_text(text: str, timestamp: int):
+async def process_text(text: str, timestamp: int, session_id: str = None, router_mode: str = None, engine: str = None, job_id: str = None, device_id: str = None):
     print(text)
     starting_time = int(time.time())
-    result = await run_workflow(text)
+    if session_id:
+        result, analyzed = await run_incremental_workflow(session_id, text, router_mode, engine)
+        if not analyzed:
+            # Too few new words: the previous result still stands and is already stored
+            return {"feedback_id": None, **result}
+    else:
+        result = await run_workflow(text, router_mode=router_mode, engine=engine)
     print(result["final_answer"])
     time_taken = int(time.time()) - starting_time
     print(f"Time taken: {time_taken} seconds")
-    add_entry(result["final_answer"], json.dumps(result["sub_agent_reports"], indent=2), time_taken, text)
-    
\ No newline at end of file
+    feedback_id = await save_feedback(result, time_taken, text, job_id, device_id)
+    return {"feedback_id": feedback_id, **result}
+
+async def stream_text(text: str, timestamp: int, router_mode: str = None, engine: str = None, device_id: str = None):
+    """Like process_text, but yields each workflow event as it happens"""
+    starting_time = int(time.time())
+    async for event in stream_workflow(text, router_mode=router_mode, engine=engine):
+        if event["event"] == "summary":
+            result = event["data"]
+            time_taken = int(time.time()) - starting_time
+            print(f"Time taken: {time_taken} seconds")
+            await save_feedback(result, time_taken, text, device_id=device_id)
+        yield event
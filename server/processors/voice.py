@@ -1,18 +1,43 @@
-import json
 import time
-from transcribe_deepgram import parse_speaker_transcript, transcribe_base64_audio
+from transcribe_deepgram import extract_words, parse_speaker_transcript, transcribe_base64_audio_async, transcriber
+from timing_metrics import timing_metrics
+from cache import LRUCache
+from uploads import SpooledAudio
 
-from database import add_entry
+from feedback_writer import save_feedback
 from backend import run_workflow
 
-async def process_voice(base64_audio: str, timestamp: int):
+# Transcripts of recent binary uploads by SHA-256, so device retries are not transcribed twice
+transcription_cache = LRUCache(max_entries=64, ttl_seconds=3600)
+
+async def process_voice(base64_audio: str, timestamp: int, router_mode: str = None, engine: str = None, job_id: str = None, device_id: str = None):
     print("Processing voice...")
     starting_time = int(time.time())
-    transcription_result = transcribe_base64_audio(base64_audio)
+    transcription_result = await transcribe_base64_audio_async(base64_audio)
+    return await analyze_transcription(transcription_result, starting_time, router_mode, engine, job_id, device_id)
+
+async def process_voice_file(audio: SpooledAudio, timestamp: int, router_mode: str = None, engine: str = None, job_id: str = None, device_id: str = None):
+    """Like process_voice, for a streamed binary upload. Takes ownership of `audio`."""
+    print(f"Processing voice upload ({audio.size} bytes, sha256 {audio.sha256[:12]})...")
+    starting_time = int(time.time())
+    try:
+        transcription_result = transcription_cache.get(audio.sha256)
+        if transcription_result is None:
+            transcription_result = await transcriber.transcribe(
+                audio.chunks(), content_type=audio.content_type, content_length=audio.size
+            )
+            transcription_cache.set(audio.sha256, transcription_result)
+    finally:
+        audio.close()
+    return await analyze_transcription(transcription_result, starting_time, router_mode, engine, job_id, device_id)
+
+async def analyze_transcription(transcription_result: dict, starting_time: int, router_mode: str = None, engine: str = None, job_id: str = None, device_id: str = None):
     parsed_result = parse_speaker_transcript(transcription_result)
+    timing = timing_metrics(extract_words(transcription_result))
     print(parsed_result)
-    result = await run_workflow(parsed_result)
+    result = await run_workflow(parsed_result, router_mode=router_mode, engine=engine, timing=timing)
     print(result["final_answer"])
     time_taken = int(time.time()) - starting_time
     print(f"Time taken: {time_taken} seconds")
-    add_entry(result["final_answer"], json.dumps(result["sub_agent_reports"], indent=2), time_taken, parsed_result)
+    feedback_id = await save_feedback(result, time_taken, parsed_result, job_id, device_id)
+    return {"feedback_id": feedback_id, **result}
@@ -0,0 +1,43 @@
+CATEGORY_RUBRICS = {
+    "FLUENCY": """fluency (Filler & Fluency):
+- raw_filler_words: share of filler words ("um", "uh", "like", "you know") in the text (0 = none, 1 = extreme)
+- raw_run_ons: share of run-on sentences (0 = none, 1 = extreme)
+- raw_wpm: deviation from a comfortable speaking pace (0 = ideal, 1 = far too fast or slow)""",
+    "PROSODY": """prosody:
+- raw_pace: deviation from an ideal pace (0 = ideal, 1 = far too fast or slow)
+- raw_pauses: excessive pausing, e.g. "..." or broken-up phrases (0 = ideal, 1 = pauses too much)
+- raw_volume_variance: lack of variation, e.g. repetitive monotone phrasing (0 = ideal variation, 1 = monotone)
+- raw_speed: deviation from an ideal speed (0 = ideal, 1 = far too fast or slow)""",
+    "PRAGMATICS": """pragmatics:
+- raw_answered_question: how fully the question was answered (0 = not at all, 1 = fully)
+- raw_rambling: amount of rambling or going off-topic (0 = concise, 1 = rambles constantly)""",
+    "CONSIDERATION": """consideration (Empathy/Politeness):
+- raw_hedging: amount of hedging such as "maybe", "I think" (0 = none, 1 = excessive)
+- raw_acknowledgment: acknowledging others, e.g. "yeah", "right", "good point" (0 = none, 1 = frequent)
+- raw_interruptions: interrupting or talking over others (0 = never, 1 = frequent)""",
+    "TIME_BALANCE": """time_balance (Turn-Taking):
+- raw_interruption_ratio: how often the speaker interrupts others (0 = never, 1 = frequent)
+- raw_speaking_share: how much the speaker dominates the conversation (0 = balanced, 1 = dominates)""",
+}
+
+
+def fused_agent_prompt(text, categories):
+    rubrics = "\n\n".join(CATEGORY_RUBRICS[category] for category in categories)
+    return f"""
+You are a speaker coach doing a complete analysis of a conversation in one pass.
+
+You MUST be as concise as possible. Be specific and to the point.
+
+For each of the following categories, score every rubric item as a float between 0.0 and 1.0,
+then fill in "what_went_right", "what_went_wrong" and "how_to_improve" with one short sentence each.
+Set "prompt" to an empty string.
+
+{rubrics}
+
+Finally, write "summary": one coherent piece of feedback on the speaker's speaking style that combines all categories.
+Always speak in second person. Say "you should" instead of "the speaker should". Keep it short.
+If the text only contains something like "transcribing...", or is extremely short, the summary must be "No analysis".
+
+Text to analyze:
+\"\"\"{text}\"\"\"
+"""
@@ -1,5 +1,6 @@
-def prosody_agent_prompt(text):
-  speed = len(text.split()) / 5
+def prosody_agent_prompt(text, speed=None):
+  if speed is None:
+    speed = len(text.split()) / 5
   return f"""
 You are a Prosody sub-agent. Analyze the text and evaluate:
 
@@ -0,0 +1,272 @@
+"""
+Client-side rate limiting and adaptive concurrency for Gemini calls.
+
+Every model client is wrapped in a `GovernedLLM`, which makes each `ainvoke` go
+through the `AdaptiveLimiter` of its model first:
+
+- token buckets for requests per minute and tokens per minute, so bursts queue
+  instead of being answered with 429
+- an AIMD concurrency limit: +1/limit after each success, halved on 429/503
+- a shared backoff window after a 429/503, after which the call is retried
+
+Time spent waiting in the limiter is recorded and exposed through `limiter_stats`
+so that quotas can be sized from real traffic.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_SECONDS", "1.0"))
+RATE_LIMIT_MAX_BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_MAX_BACKOFF_SECONDS", "30.0"))
+# Output tokens assumed per call when reserving the TPM budget (structured outputs are short)
+LLM_OUTPUT_TOKENS = int(os.getenv("LLM_OUTPUT_TOKENS", "1000"))
+CHARS_PER_TOKEN = 4
+# Multiplicative decrease of the concurrency limit on 429/503
+DECREASE_FACTOR = 0.5
+# Queue times kept for the percentiles in stats()
+QUEUE_TIME_WINDOW = 1000
+
+# Defaults per model (Gemini paid tier 1), overridable with <PREFIX>_RPM / <PREFIX>_TPM / <PREFIX>_MAX_CONCURRENCY
+MODEL_LIMITS = {
+    "gemini-2.5-flash-lite": {"rpm": 4000, "tpm": 4_000_000, "max_concurrency": 64},
+    "gemini-2.5-flash": {"rpm": 1000, "tpm": 1_000_000, "max_concurrency": 32},
+}
+DEFAULT_LIMITS = {"rpm": 1000, "tpm": 1_000_000, "max_concurrency": 32}
+
+THROTTLING_STATUS_CODES = (429, 503)
+try:
+    from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, TooManyRequests
+    THROTTLING_ERRORS: Tuple[type, ...] = (ResourceExhausted, ServiceUnavailable, TooManyRequests)
+except ImportError:
+    THROTTLING_ERRORS = ()
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """
+    HTTP status of an API error: `code` of google-api-core and google-genai errors,
+    `status_code` or `response.status_code` of HTTP client errors
+    """
+    for value in (getattr(error, "code", None), getattr(error, "status_code", None),
+                  getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    return None
+
+
+def is_throttled(error: BaseException) -> bool:
+    """True for 429 (quota) and 503 (overloaded) errors from the Gemini API, also when wrapped"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, THROTTLING_ERRORS) or status_code(error) in THROTTLING_STATUS_CODES:
+            return True
+        # LangChain re-raises client errors as its own exception types
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def estimate_tokens(messages: Any) -> int:
+    if isinstance(messages, str):
+        chars = len(messages)
+    else:
+        chars = sum(len(str(getattr(m, "content", m))) for m in messages)
+    return chars // CHARS_PER_TOKEN + LLM_OUTPUT_TOKENS
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class TokenBucket:
+    """
+    Refills `rate_per_minute` units per minute up to one minute's worth.
+    Callers reserve units up front and sleep off any deficit, so waiters are served in order.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` units and return how long to wait until they are actually available"""
+        self._refill()
+        self.available -= min(amount, self.capacity)
+        return -self.available / self.rate if self.available < 0 else 0.0
+
+
+class AdaptiveLimiter:
+    def __init__(self, name: str, rpm: float, tpm: float, max_concurrency: int, min_concurrency: int = 1):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.blocked_until = 0.0
+        self.consecutive_throttles = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop = None
+        self.queue_times = deque(maxlen=QUEUE_TIME_WINDOW)
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.errors = 0
+
+    def _ensure_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self.in_flight = 0
+            self.waiting = 0
+        return self._condition
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait for a concurrency slot, the backoff window and both budgets; returns the time waited"""
+        started = time.monotonic()
+        condition = self._ensure_condition()
+        self.waiting += 1
+        try:
+            async with condition:
+                await condition.wait_for(lambda: self.in_flight < max(int(self.limit), self.min_concurrency))
+                self.in_flight += 1
+        finally:
+            self.waiting -= 1
+        try:
+            backoff = self.blocked_until - time.monotonic()
+            if backoff > 0:
+                await asyncio.sleep(backoff)
+            delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            await self._release()
+            raise
+        waited = time.monotonic() - started
+        self.queue_times.append(waited)
+        return waited
+
+    async def _release(self) -> None:
+        condition = self._ensure_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    async def release(self, throttled: bool = False, succeeded: bool = True) -> None:
+        if throttled:
+            self.throttled += 1
+            self.consecutive_throttles += 1
+            self.limit = max(self.limit * DECREASE_FACTOR, float(self.min_concurrency))
+            backoff = min(
+                RATE_LIMIT_BACKOFF_SECONDS * 2 ** (self.consecutive_throttles - 1), RATE_LIMIT_MAX_BACKOFF_SECONDS
+            )
+            # Jitter so that the queued callers do not all retry at the same instant
+            self.blocked_until = max(self.blocked_until, time.monotonic() + backoff * random.uniform(0.5, 1.0))
+        elif succeeded:
+            self.consecutive_throttles = 0
+            self.limit = min(self.limit + 1 / self.limit, float(self.max_concurrency))
+        await self._release()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], tokens: int) -> Any:
+        """Run `fn` within the limits, retrying it after 429/503 responses"""
+        self.calls += 1
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            await self.acquire(tokens)
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                await self.release(succeeded=False)
+                raise
+            except Exception as e:
+                throttled = is_throttled(e)
+                await self.release(throttled=throttled, succeeded=False)
+                if throttled and attempt < RATE_LIMIT_MAX_RETRIES:
+                    self.retries += 1
+                    print(f"{self.name} throttled ({e.__class__.__name__}), retrying")
+                    continue
+                self.errors += 1
+                raise
+            await self.release()
+            return result
+
+    def stats(self) -> dict:
+        times = list(self.queue_times)
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "errors": self.errors,
+            "queue_time_mean": round(sum(times) / len(times), 4) if times else 0.0,
+            "queue_time_p50": round(_percentile(times, 0.50), 4),
+            "queue_time_p95": round(_percentile(times, 0.95), 4),
+            "queue_time_max": round(max(times, default=0.0), 4),
+        }
+
+
+class GovernedRunnable:
+    """A runnable (e.g. `llm.with_structured_output(...)`) whose `ainvoke` goes through a limiter"""
+
+    def __init__(self, runnable, limiter: AdaptiveLimiter):
+        self.runnable = runnable
+        self.limiter = limiter
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        if not RATE_LIMIT_ENABLED:
+            return await self.runnable.ainvoke(messages, *args, **kwargs)
+        return await self.limiter.call(
+            lambda: self.runnable.ainvoke(messages, *args, **kwargs), estimate_tokens(messages)
+        )
+
+
+class GovernedLLM(GovernedRunnable):
+    """Chat model wrapper; structured-output runnables derived from it share its limiter"""
+
+    def with_structured_output(self, schema, **kwargs) -> GovernedRunnable:
+        return GovernedRunnable(self.runnable.with_structured_output(schema, **kwargs), self.limiter)
+
+    def __getattr__(self, name):
+        return getattr(self.runnable, name)
+
+
+limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def limiter_for(model_name: str, env_prefix: str) -> AdaptiveLimiter:
+    """The shared limiter of `model_name`, created from MODEL_LIMITS and <env_prefix>_* overrides"""
+    if model_name not in limiters:
+        defaults = MODEL_LIMITS.get(model_name, DEFAULT_LIMITS)
+        limiters[model_name] = AdaptiveLimiter(
+            model_name,
+            rpm=float(os.getenv(f"{env_prefix}_RPM", defaults["rpm"])),
+            tpm=float(os.getenv(f"{env_prefix}_TPM", defaults["tpm"])),
+            max_concurrency=int(os.getenv(f"{env_prefix}_MAX_CONCURRENCY", defaults["max_concurrency"])),
+        )
+    return limiters[model_name]
+
+
+def governed(llm, model_name: str, env_prefix: str) -> GovernedLLM:
+    return GovernedLLM(llm, limiter_for(model_name, env_prefix))
+
+
+def limiter_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
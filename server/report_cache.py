@@ -0,0 +1,244 @@
+"""
+Cache of the latest feedback report, overall and per device.
+
+Clients poll `/feedback/report` every couple of seconds, but the answer only changes
+when an analysis is stored. Writers publish the new latest entry here right after
+their commit (`add_entry` / `add_entries`), and reads are answered from the cache
+without a query. Each device has its own entry next to the overall one.
+
+Backends (REPORT_CACHE_BACKEND):
+
+- `local` (default): a dict in this process. Correct for a single API process;
+  with several processes each one sees other processes' writes after the TTL.
+- `shm`: JSON files on tmpfs (/dev/shm) shared by every process on the host, so
+  uvicorn workers and worker.py processes see each other's writes. Updates are
+  serialized with flock and swapped in with an atomic rename; readers only
+  re-parse a file when it changed. Opt-in, since the files outlive the process
+  and are shared by everything on the host using the same database.
+- `auto`: `shm` where /dev/shm exists, otherwise `local`.
+- `off`: every read goes to the database.
+
+Invalidation: entries are versioned by (timestamp, id), the order of
+`get_most_recent_entry`, and a publish never replaces a newer unexpired entry
+with an older one, so racing writers and loaders converge on the true latest.
+Writers the cache cannot see (another host, a process on another backend) are
+covered by REPORT_CACHE_TTL_SECONDS: an entry older than that is reloaded from
+the database. Feedback rows are never updated or deleted, so no other
+invalidation is needed. Expired device entries are pruned, so only devices
+that are being polled take up space.
+"""
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "local")
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "5"))
+# Devices kept by the local backend (least recently used are evicted)
+REPORT_CACHE_MAX_DEVICES = int(os.getenv("REPORT_CACHE_MAX_DEVICES", "1024"))
+SHM_DIR = "/dev/shm"
+# Publishes between sweeps for expired device files
+PRUNE_EVERY = 256
+
+# Returned by `get` when the database has to be asked
+MISS = object()
+
+
+def _version(envelope: Optional[dict]) -> tuple:
+    # An empty table (version None) is older than any entry
+    if envelope is None or envelope["version"] is None:
+        return (-1, -1)
+    return tuple(envelope["version"])
+
+
+def _replaces(new: dict, current: Optional[dict], ttl: float) -> bool:
+    # An expired entry is always replaced, so a database that went back (e.g. restored) is picked up
+    return current is None or _version(new) >= _version(current) or new["stored_at"] - current["stored_at"] > ttl
+
+
+class LocalBackend:
+    name = "local"
+
+    def __init__(self, max_devices: int = REPORT_CACHE_MAX_DEVICES):
+        self.max_devices = max_devices
+        self.entries: "OrderedDict[Optional[str], dict]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def read(self, key: Optional[str]) -> Optional[dict]:
+        return self.entries.get(key)
+
+    def update(self, key: Optional[str], envelope: dict, ttl: float) -> None:
+        with self.lock:
+            if _replaces(envelope, self.entries.get(key), ttl):
+                self.entries[key] = envelope
+                self.entries.move_to_end(key)
+            # The overall entry (key None) is never evicted
+            while len(self.entries) > self.max_devices + 1:
+                del self.entries[next(k for k in self.entries if k is not None)]
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def prune(self, max_age: float) -> None:
+        # Bounded by max_devices already
+        pass
+
+
+class SharedMemoryBackend:
+    name = "shm"
+
+    def __init__(self, path: str, max_devices: int = REPORT_CACHE_MAX_DEVICES):
+        self.path = path
+        self.stem = path[:-len(".json")] if path.endswith(".json") else path
+        self.lock_path = path + ".lock"
+        self.max_devices = max_devices
+        # Parsed files by path, with the stat they were parsed at
+        self._parsed = {}
+
+    def path_for(self, key: Optional[str]) -> str:
+        if key is None:
+            return self.path
+        return f"{self.stem}.{hashlib.sha256(key.encode()).hexdigest()[:16]}.json"
+
+    def read(self, key: Optional[str]) -> Optional[dict]:
+        path = self.path_for(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        parsed = self._parsed.get(path)
+        if parsed is None or parsed[0] != signature:
+            try:
+                with open(path) as f:
+                    parsed = (signature, json.load(f))
+            except (OSError, ValueError):
+                return None
+            if len(self._parsed) > self.max_devices:
+                self._parsed.clear()
+            self._parsed[path] = parsed
+        return parsed[1]
+
+    def update(self, key: Optional[str], envelope: dict, ttl: float) -> None:
+        path = self.path_for(key)
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not _replaces(envelope, self.read(key), ttl):
+                return
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp, "w") as f:
+                json.dump(envelope, f)
+            os.replace(tmp, path)
+
+    def device_files(self):
+        return [p for p in glob.glob(f"{glob.escape(self.stem)}.*.json") if p != self.path]
+
+    def clear(self) -> None:
+        for path in [self.path] + self.device_files():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._parsed.clear()
+
+    def prune(self, max_age: float) -> None:
+        """Remove expired device files, they would be reloaded from the database anyway"""
+        cutoff = time.time() - max_age
+        for path in self.device_files():
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    self._parsed.pop(path, None)
+            except FileNotFoundError:
+                pass
+
+
+def default_shm_path() -> str:
+    # One set of files per database, so unrelated deployments on the host do not share reports
+    url = os.getenv("DATABASE_URL") or f"{os.getenv('DB_HOST', '')}/{os.getenv('DB_NAME', 'feedback_db')}"
+    return os.path.join(SHM_DIR, f"speech-latest-report-{hashlib.sha256(url.encode()).hexdigest()[:12]}.json")
+
+
+def make_backend(name: str = REPORT_CACHE_BACKEND):
+    if name == "off":
+        return None
+    if name == "shm" or (name == "auto" and os.path.isdir(SHM_DIR)):
+        return SharedMemoryBackend(os.getenv("REPORT_CACHE_PATH") or default_shm_path())
+    return LocalBackend()
+
+
+class ReportCache:
+    def __init__(self, backend, ttl_seconds: float = REPORT_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.publishes = 0
+        self.errors = 0
+
+    def get(self, device_id: str = None):
+        """
+        The latest report, of one device if `device_id` is given (None when there is
+        none), or MISS when it is unknown or expired
+        """
+        if self.backend is None:
+            return MISS
+        try:
+            envelope = self.backend.read(device_id or None)
+        except OSError as e:
+            print(f"Error reading report cache: {e}")
+            self.errors += 1
+            envelope = None
+        if envelope is None or time.time() - envelope["stored_at"] > self.ttl:
+            self.misses += 1
+            return MISS
+        self.hits += 1
+        return envelope["report"]
+
+    def publish(self, report: Optional[dict], device_id: str = None) -> None:
+        """
+        Store the latest report (of `device_id`) after a write, or after loading it from
+        the database. `report` needs `timestamp` and `id`; None means there is no entry.
+        """
+        if self.backend is None:
+            return
+        envelope = {
+            "version": [report["timestamp"], report["id"]] if report is not None else None,
+            "report": report,
+            "stored_at": time.time(),
+        }
+        try:
+            self.backend.update(device_id or None, envelope, self.ttl)
+            self.publishes += 1
+            if self.publishes % PRUNE_EVERY == 0:
+                self.backend.prune(self.ttl * 2)
+        except OSError as e:
+            # The write itself succeeded; readers fall back to the database
+            print(f"Error updating report cache: {e}")
+            self.errors += 1
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        if self.backend is not None:
+            try:
+                self.backend.clear()
+            except OSError as e:
+                print(f"Error clearing report cache: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name if self.backend is not None else "off",
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "publishes": self.publishes,
+            "errors": self.errors,
+        }
+
+
+report_cache = ReportCache(make_backend())
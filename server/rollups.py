@@ -0,0 +1,125 @@
+"""
+Hourly and daily rollups of stored analyses, for trend views.
+
+Each stored entry adds to the `feedback_rollups` rows of its hour and its day, in the
+same transaction as the entry (`add_entry` / `add_entries`): per metric, the count,
+sum and sum of squares of the values, from which `/analytics/trends` derives the
+mean and standard deviation of every bucket without reading a single entry. Metrics
+are `total_score`, each category score (by category name), `time_taken`, and the
+counts of the `time_taken` histogram bins (TIME_TAKEN_BINS).
+
+Entries stored before the rollups existed are added by the backfill, which rebuilds
+the buckets of a time range from the stored entries. It first fills in the
+category_scores rows of entries stored before that table existed, since category
+metrics are rolled up from them:
+
+    python rollups.py                      # everything
+    python rollups.py --since 1726000000   # from a unix time on
+
+Run it once after deploying, while no analyses are being stored: entries stored
+during the rebuild of their bucket can end up counted twice or not at all, until the
+next backfill of that range.
+"""
+import argparse
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import dotenv
+
+GRANULARITIES = {"hour": 3600, "day": 86400}
+# Upper bounds in seconds of the time_taken histogram bins; a last bin holds the rest
+TIME_TAKEN_BINS = (2, 5, 10, 20, 30, 60)
+HISTOGRAM_METRIC = "time_taken_bin:"
+
+Totals = Dict[Tuple[str, int, str], List[float]]
+
+
+def bucket_start(timestamp: int, granularity: str) -> int:
+    return timestamp - timestamp % GRANULARITIES[granularity]
+
+
+def time_taken_bin(seconds: float) -> str:
+    for bound in TIME_TAKEN_BINS:
+        if seconds <= bound:
+            return f"le_{bound}"
+    return f"gt_{TIME_TAKEN_BINS[-1]}"
+
+
+def histogram_metrics() -> List[str]:
+    return [HISTOGRAM_METRIC + f"le_{bound}" for bound in TIME_TAKEN_BINS] + [HISTOGRAM_METRIC + f"gt_{TIME_TAKEN_BINS[-1]}"]
+
+
+def entry_metrics(total_score: Optional[float], time_taken: Optional[float], category_scores: Dict[str, float]) -> List[Tuple[str, float]]:
+    """(metric, value) pairs an entry adds to its buckets"""
+    metrics = list(category_scores.items())
+    if total_score is not None:
+        metrics.append(("total_score", total_score))
+    if time_taken is not None:
+        metrics.append(("time_taken", time_taken))
+        metrics.append((HISTOGRAM_METRIC + time_taken_bin(time_taken), 0.0))
+    return metrics
+
+
+def accumulate(totals: Totals, timestamp: int, metrics: Iterable[Tuple[str, float]]) -> None:
+    """Add values stored at `timestamp` to the hourly and daily totals"""
+    for metric, value in metrics:
+        for granularity in GRANULARITIES:
+            entry = totals.setdefault((granularity, bucket_start(timestamp, granularity), metric), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += value
+            entry[2] += value * value
+
+
+def rollup_rows(totals: Totals) -> List[dict]:
+    """feedback_rollups rows for accumulated totals, in key order so concurrent writers lock rows in the same order"""
+    return [
+        {"granularity": granularity, "bucket": bucket, "metric": metric,
+         "count": int(count), "value_sum": value_sum, "value_sum_sq": value_sum_sq}
+        for (granularity, bucket, metric), (count, value_sum, value_sum_sq) in sorted(totals.items())
+    ]
+
+
+def summarize(count: int, value_sum: float, value_sum_sq: float) -> dict:
+    mean = value_sum / count if count else None
+    stddev = math.sqrt(max(value_sum_sq / count - mean * mean, 0.0)) if count else None
+    return {"count": count, "mean": mean, "stddev": stddev}
+
+
+def trend_buckets(rows: Iterable[dict]) -> List[dict]:
+    """Rollup rows of one granularity, ordered by bucket, as `/analytics/trends` buckets"""
+    buckets: Dict[int, dict] = {}
+    for row in rows:
+        bucket = buckets.setdefault(row["bucket"], {"start": row["bucket"], "metrics": {}, "time_taken_histogram": {}})
+        if row["metric"].startswith(HISTOGRAM_METRIC):
+            bucket["time_taken_histogram"][row["metric"][len(HISTOGRAM_METRIC):]] = row["count"]
+        else:
+            bucket["metrics"][row["metric"]] = summarize(row["count"], row["value_sum"], row["value_sum_sq"])
+    return [buckets[start] for start in sorted(buckets)]
+
+
+def main(args) -> None:
+    dotenv.load_dotenv()
+    # Imported here: database itself uses this module
+    import database
+    from details_migration import FEEDBACK_DETAILS_BATCH
+
+    database.init_database()
+    # Entries not moved to feedback_details yet have no category_scores to roll up
+    position = 0
+    while position is not None:
+        position = database.move_feedback_details(position, FEEDBACK_DETAILS_BATCH)
+    # Entries moved before category_scores existed have none either
+    position = 0
+    while position is not None:
+        position = database.backfill_category_scores(position, FEEDBACK_DETAILS_BATCH)
+    until = args.until if args.until is not None else int(time.time()) + 1
+    rows = database.rebuild_rollups(args.since, until)
+    print(f"Rebuilt {rows} rollup rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the analytics rollups from stored entries")
+    parser.add_argument("--since", type=int, default=0, help="Unix time to rebuild from (rounded down to a day)")
+    parser.add_argument("--until", type=int, default=None, help="Unix time to rebuild until (rounded up to a day, default now)")
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+import json
+import os
+import unittest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+
+import database
+import main
+from test_support import use_sqlite
+
+
+def reports(fluency: float, prosody: float = None) -> str:
+    result = [{"category": "FLUENCY", "score": fluency, "rubric_scores": {"good_wpm": fluency, "lack_of_run_ons": 1.0}}]
+    if prosody is not None:
+        result.append({"category": "PROSODY", "score": prosody, "rubric_scores": {}})
+    # Not a measurement, never counted
+    result.append({"category": "PRAGMATICS", "score": 0.0, "rubric_scores": {}, "status": "skipped (timeout)"})
+    return json.dumps(result, indent=2)
+
+
+class TestCategoryAnalytics(unittest.TestCase):
+    def setUp(self):
+        use_sqlite(self)
+        self.client = TestClient(main.app)
+
+    def test_mean_and_percentiles_per_category(self):
+        database.add_entries([
+            {"feedback": f"entry {i}", "intermediate_feedbacks": reports(i / 10, 0.5), "time_taken": 1,
+             "transcript": "text", "timestamp": 1000 + i}
+            for i in range(1, 11)
+        ])
+        body = self.client.get("/analytics/categories", params={"since": 1000, "until": 2000}).json()
+        stats = {entry["category"]: entry for entry in body["categories"]}
+        self.assertEqual(set(stats), {"FLUENCY", "PROSODY"})
+        fluency = stats["FLUENCY"]
+        self.assertEqual(fluency["count"], 10)
+        self.assertAlmostEqual(fluency["mean"], 0.55)
+        self.assertEqual((fluency["min"], fluency["max"]), (0.1, 1.0))
+        self.assertEqual((fluency["p50"], fluency["p90"], fluency["p95"]), (0.5, 0.9, 1.0))
+        self.assertAlmostEqual(fluency["rubrics"]["good_wpm"], 0.55)
+        self.assertEqual(fluency["rubrics"]["lack_of_run_ons"], 1.0)
+        self.assertEqual(stats["PROSODY"]["p50"], 0.5)
+
+    def test_window_and_category_filter(self):
+        database.add_entries([
+            {"feedback": "old", "intermediate_feedbacks": reports(0.1), "timestamp": 100},
+            {"feedback": "new", "intermediate_feedbacks": reports(0.9, 0.4), "timestamp": 200},
+        ])
+        feedback_id = database.add_entry("latest", reports(0.7))
+        with database.get_db_connection() as session:
+            self.assertEqual(session.query(database.CategoryScore).filter_by(feedback_id=feedback_id).count(), 3)
+
+        body = self.client.get("/analytics/categories", params={"since": 150, "until": 250, "categories": "FLUENCY"}).json()
+        self.assertEqual([(entry["category"], entry["count"], entry["mean"]) for entry in body["categories"]],
+                         [("FLUENCY", 1, 0.9)])
+        self.assertEqual(self.client.get("/analytics/categories").json()["categories"][0]["mean"], 0.7)
+        self.assertEqual(self.client.get("/analytics/categories", params={"since": 5, "until": 5}).status_code, 400)
+
+    def test_old_entries_are_backfilled_when_moved(self):
+        with database.get_db_connection() as session:
+            session.add(database.Feedback(feedback="old", intermediate_feedbacks=reports(0.3), timestamp=100))
+            session.commit()
+        self.assertEqual(database.move_feedback_details(0, 10), 1)
+        self.assertEqual(database.get_category_stats(0, 1000)[0]["mean"], 0.3)
+
+    def test_entries_moved_before_category_scores_are_backfilled(self):
+        database.add_entries([
+            {"feedback": f"entry {i}", "intermediate_feedbacks": reports(i / 10, 0.5), "time_taken": 1,
+             "transcript": "text", "timestamp": 100 + i, "job_id": None}
+            for i in range(1, 4)
+        ])
+        with database.get_db_connection() as session:
+            expected = session.query(database.CategoryScore).count()
+            # As stored by a version with feedback_details but without category_scores
+            session.query(database.CategoryScore).filter(database.CategoryScore.feedback_id != 2).delete()
+            session.commit()
+
+        position, passes = 0, 0
+        while position is not None:
+            position = database.backfill_category_scores(position, 1)
+            passes += 1
+        self.assertEqual(passes, 3)
+        with database.get_db_connection() as session:
+            self.assertEqual(session.query(database.CategoryScore).count(), expected)
+        fluency = next(row for row in database.get_category_stats(0, 1000) if row["category"] == "FLUENCY")
+        self.assertAlmostEqual(fluency["mean"], 0.2)
+        # Nothing left to do
+        self.assertIsNone(database.backfill_category_scores(0, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
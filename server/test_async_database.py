@@ -0,0 +1,45 @@
+import asyncio
+import tempfile
+import time
+import unittest
+
+from sqlalchemy import event
+
+import database
+from test_support import use_sqlite
+
+
+class TestAsyncDatabase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.engine = use_sqlite(self, f"{self.tmp.name}/feedback.db")
+
+    async def test_round_trip(self):
+        self.assertIsNone(await database.aget_most_recent_entry())
+        feedback_id = await database.aadd_entry("great job", "[]", 3, "hello")
+        self.assertIsInstance(feedback_id, int)
+        entry = await database.aget_most_recent_entry()
+        self.assertEqual((entry[0], entry[2], entry[3], entry[4]), ("great job", "[]", 3, "hello"))
+
+    async def test_slow_query_does_not_block_loop(self):
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def slow(*_):
+            time.sleep(0.2)
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await database.aadd_entry("slow", "[]", 1, "text")
+        task.cancel()
+        self.assertGreater(ticks, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
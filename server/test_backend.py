@@ -1,5 +1,11 @@
+import os
 import unittest
 import asyncio
+
+# Replays need no key; recording the cassette does (CASSETTE_MODE=record)
+os.environ.setdefault("GEMINI_API_KEY", "replay")
+
+import cassette
 from backend import (
     FluencyOutput, ProsodyOutput, PragmaticsOutput,
     ConsiderationOutput, TimeBalanceOutput, run_workflow
@@ -19,7 +25,26 @@ TIME_DOMINATE = "I spoke the entire meeting, others didn't get to speak."
 NICE_BALANCE = "I spoke clearly and let others share their points as well."
 
 
+# Model responses come from cassettes/test_backend.json, replayed in strict mode so that
+# a request that was not recorded fails instead of calling Gemini. The committed cassette
+# holds hand-written responses within the expected score ranges, so the test runs offline;
+# a prompt, schema or model change is a miss, so re-record it with a real key:
+#     CASSETTE_MODE=record GEMINI_API_KEY=... python -m pytest test_backend.py
+CASSETTE_PATH = os.path.join(cassette.CASSETTE_DIR, "test_backend.json")
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "strict")
+
+
+@unittest.skipUnless(
+    os.path.exists(CASSETTE_PATH) or CASSETTE_MODE != "strict",
+    "No recorded cassette; record cassettes/test_backend.json with CASSETTE_MODE=record and a GEMINI_API_KEY"
+)
 class AsyncTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        cassette.install(cassette.Cassette(CASSETTE_PATH, CASSETTE_MODE))
+
+    def tearDown(self):
+        cassette.uninstall()
+
     async def test_run_workflow_scores(self):
         # Test GOOD_BALANCED
         result = await run_workflow(GOOD_BALANCED)
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import httpx
+
+import broadcast
+import database
+import feedback_writer
+import main
+from broadcast import Broadcaster, TooManySubscribers, report_event
+from report_cache import LocalBackend, ReportCache
+from test_support import use_sqlite
+
+
+class TestBroadcaster(unittest.IsolatedAsyncioTestCase):
+    async def test_fan_out(self):
+        broadcaster = Broadcaster()
+        subscriptions = [broadcaster.subscribe() for _ in range(3)]
+        broadcaster.publish(report_event("great job", 100, "[]"), (100, 1))
+        for subscription in subscriptions:
+            self.assertEqual((await subscription.get())["message"], "great job")
+        self.assertEqual(broadcaster.last_updated, 100)
+
+    async def test_slow_subscriber_drops_oldest(self):
+        broadcaster = Broadcaster(queue_size=2)
+        subscription = broadcaster.subscribe()
+        for i in range(5):
+            broadcaster.publish(report_event(f"report {i}", 100 + i, "[]"), (100 + i, i))
+        self.assertEqual((await subscription.get())["message"], "report 3")
+        self.assertEqual((await subscription.get())["message"], "report 4")
+        self.assertEqual(broadcaster.stats()["dropped"], 3)
+
+    async def test_subscriber_limit_and_unsubscribe(self):
+        broadcaster = Broadcaster(max_subscribers=1)
+        subscription = broadcaster.subscribe()
+        with self.assertRaises(TooManySubscribers):
+            broadcaster.subscribe()
+        broadcaster.unsubscribe(subscription)
+        broadcaster.subscribe()
+
+    async def test_stop_ends_subscriptions(self):
+        broadcaster = Broadcaster()
+        await broadcaster.start()
+        subscription = broadcaster.subscribe()
+        await broadcaster.stop()
+        self.assertIsNone(await subscription.get())
+        self.assertIsNone(await subscription.get())
+
+    async def test_watcher_publishes_entries_from_other_processes(self):
+        use_sqlite(self, report_cache=ReportCache(LocalBackend(), ttl_seconds=0))
+        broadcaster = Broadcaster()
+        with patch.object(broadcast, "BROADCAST_POLL_SECONDS", 0.02):
+            database.add_entry("old", "[]", 1, "text")
+            subscription = broadcaster.subscribe()
+            await broadcaster.start()
+            await asyncio.sleep(0.1)
+            # Stored by e.g. worker.py: only the database knows about it
+            with database.get_db_connection() as session:
+                session.add(database.Feedback(feedback="from a worker", timestamp=int(time.time()) + 1))
+                session.commit()
+            event = await asyncio.wait_for(subscription.get(), 2)
+            await broadcaster.stop()
+        self.assertEqual(event["message"], "from a worker")
+
+    async def test_watcher_tells_entries_of_the_same_second_apart(self):
+        use_sqlite(self, report_cache=ReportCache(LocalBackend(), ttl_seconds=0))
+        broadcaster = Broadcaster()
+        now = int(time.time())
+
+        def store(feedback):
+            with database.get_db_connection() as session:
+                entry = database.Feedback(feedback=feedback, timestamp=now + 1)
+                session.add(entry)
+                session.commit()
+                return entry.id
+
+        with patch.object(broadcast, "BROADCAST_POLL_SECONDS", 0.02):
+            database.add_entry("old", "[]", 1, "text")
+            subscription = broadcaster.subscribe()
+            await broadcaster.start()
+            await asyncio.sleep(0.1)
+            # Stored and published by this process, then the same text by a worker within the same second
+            broadcaster.publish(report_event("well done", now + 1, "[]"), (now + 1, store("well done")))
+            store("well done")
+            events = [await asyncio.wait_for(subscription.get(), 2) for _ in range(2)]
+            await asyncio.sleep(0.1)
+            await broadcaster.stop()
+        self.assertEqual([event["message"] for event in events], ["well done", "well done"])
+        # The local entry was not delivered a second time by the watcher
+        self.assertIsNone(await subscription.get())
+
+    async def test_new_subscriber_gets_no_entries_stored_before_it(self):
+        use_sqlite(self, report_cache=ReportCache(LocalBackend(), ttl_seconds=0))
+        broadcaster = Broadcaster()
+        with patch.object(broadcast, "BROADCAST_POLL_SECONDS", 0.02):
+            database.add_entry("old", "[]", 1, "text")
+            first = broadcaster.subscribe()
+            await broadcaster.start()
+            await asyncio.sleep(0.1)
+            broadcaster.unsubscribe(first)
+            # Stored by a worker while nobody listens
+            for i in range(3):
+                with database.get_db_connection() as session:
+                    session.add(database.Feedback(feedback=f"stale {i}", timestamp=int(time.time()) + 1))
+                    session.commit()
+            await asyncio.sleep(0.1)
+            subscription = broadcaster.subscribe()
+            await asyncio.sleep(0.1)
+            await broadcaster.stop()
+        self.assertIsNone(await subscription.get())
+
+
+class TestPushEndpoints(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        use_sqlite(self)
+        self.broadcaster = Broadcaster()
+        self.patches = [
+            patch.object(main, "broadcaster", self.broadcaster),
+            patch.object(feedback_writer, "broadcaster", self.broadcaster),
+        ]
+        for p in self.patches:
+            p.start()
+        database.add_entry("first report", "[]", 1, "text")
+        self.first = database.get_most_recent_entry()[1]
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def client(self):
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+    async def test_long_poll_returns_as_soon_as_a_report_is_stored(self):
+        async with self.client() as client:
+            request = asyncio.create_task(
+                client.get("/feedback/report", params={"since": self.first, "wait": 10})
+            )
+            await asyncio.sleep(0.1)
+            self.assertFalse(request.done())
+            started = time.monotonic()
+            await feedback_writer.save_feedback(
+                {"final_answer": "pushed report", "sub_agent_reports": []}, 1, "text"
+            )
+            response = await request
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.json()["message"], "pushed report")
+        self.assertEqual(self.broadcaster.stats()["subscribers"], 0)
+
+    async def test_long_poll_times_out_with_current_report(self):
+        async with self.client() as client:
+            response = await client.get("/feedback/report", params={"since": self.first, "wait": 0.1})
+            older = await client.get("/feedback/report", params={"since": self.first - 1, "wait": 10})
+        self.assertEqual(response.json()["message"], "first report")
+        self.assertEqual(older.json()["message"], "first report")
+
+    async def test_stream_sends_missed_and_pushed_reports(self):
+        response = await main.feedback_stream(device_id=None, since=self.first - 1)
+        events = response.body_iterator
+        missed = await anext(events)
+        self.assertEqual(json.loads(missed.split("data: ")[1])["message"], "first report")
+
+        nxt = asyncio.create_task(anext(events))
+        await asyncio.sleep(0.05)
+        self.broadcaster.publish(report_event("pushed report", self.first + 1, "[]"), (self.first + 1, 2))
+        pushed = await asyncio.wait_for(nxt, 2)
+        self.assertTrue(pushed.startswith("event: report\n"))
+        self.assertEqual(json.loads(pushed.split("data: ")[1])["message"], "pushed report")
+        await events.aclose()
+        self.assertEqual(self.broadcaster.stats()["subscribers"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
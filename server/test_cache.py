@@ -0,0 +1,142 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import cache
+import database
+from backend import SYNTHESIS_FAILED, is_cacheable
+from cache import LRUCache, WorkflowCache
+from test_support import use_sqlite
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_ttl(self):
+        cache = LRUCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", 1, stored_at=time.time() - 120)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.expirations, 1)
+
+
+class TestWorkflowCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.prompts_dir = tempfile.mkdtemp()
+        self.prompt_path = os.path.join(self.prompts_dir, "agent_prompt.py")
+        with open(self.prompt_path, "w") as f:
+            f.write("PROMPT = 'v1'\n")
+        self.cache = WorkflowCache(max_entries=8, ttl_seconds=60, persist=False, enabled=True,
+                                   prompts_dir=self.prompts_dir)
+        self.calls = 0
+
+    async def compute(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"sub_agent_reports": [], "final_answer": "ok", "total_score": 1.0}
+
+    async def test_key_ignores_whitespace(self):
+        self.assertEqual(self.cache.key("hello  world ", "m"), self.cache.key("hello world", "m"))
+        self.assertNotEqual(self.cache.key("hello world", "m"), self.cache.key("hello world", "other-model"))
+
+    async def test_hit_after_miss(self):
+        key = self.cache.key("hello", "m")
+        await self.cache.get_or_compute(key, self.compute)
+        await self.cache.get_or_compute(key, self.compute)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    async def test_concurrent_requests_share_computation(self):
+        key = self.cache.key("hello", "m")
+        await asyncio.gather(*(self.cache.get_or_compute(key, self.compute) for _ in range(5)))
+        self.assertEqual(self.calls, 1)
+
+    async def test_prompt_change_invalidates(self):
+        key = self.cache.key("hello", "m")
+        await self.cache.get_or_compute(key, self.compute)
+        with open(self.prompt_path, "w") as f:
+            f.write("PROMPT = 'version 2'\n")
+        # Templates are imported once; reloading them is what makes a change take effect
+        self.assertEqual(self.cache.key("hello", "m"), key)
+        self.cache.fingerprint.refresh()
+        new_key = self.cache.key("hello", "m")
+        self.assertNotEqual(key, new_key)
+        await self.cache.get_or_compute(new_key, self.compute)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    async def test_inline_prompt_change_invalidates(self):
+        key = self.cache.key("hello", "m")
+        self.cache.register_prompts(router="Route v1")
+        self.assertNotEqual(self.cache.key("hello", "m"), key)
+        routed = self.cache.key("hello", "m")
+        self.cache.register_prompts(router="Route v2")
+        self.assertNotEqual(self.cache.key("hello", "m"), routed)
+
+    async def test_prompt_files_are_part_of_the_fingerprint(self):
+        metrics_path = os.path.join(tempfile.mkdtemp(), "metrics.py")
+        with open(metrics_path, "w") as f:
+            f.write("HEADER = 'MEASURED METRICS'\n")
+        key = self.cache.key("hello", "m")
+        self.cache.register_prompt_files(metrics_path)
+        self.assertNotEqual(self.cache.key("hello", "m"), key)
+
+    async def test_fingerprint_is_not_recomputed_per_key(self):
+        self.cache.key("hello", "m")
+        with patch.object(cache.glob, "glob", side_effect=AssertionError("prompts read again")):
+            for _ in range(3):
+                self.cache.key("hello", "m")
+
+    def test_backend_registers_metrics_prompts(self):
+        import lexical_metrics
+        import timing_metrics
+        self.assertTrue({os.path.abspath(lexical_metrics.__file__), os.path.abspath(timing_metrics.__file__)}
+                        <= cache.workflow_cache.fingerprint.files)
+
+
+def report(status="ok", rubric_scores=None):
+    return {"category": "FLUENCY", "status": status, "rubric_scores": {"item": 1.0} if rubric_scores is None else rubric_scores}
+
+
+class TestIsCacheable(unittest.TestCase):
+    def test_only_complete_results(self):
+        self.assertTrue(is_cacheable({"sub_agent_reports": [report()], "final_answer": "ok"}))
+        # Router failure
+        self.assertFalse(is_cacheable({"sub_agent_reports": [], "final_answer": "No analysis"}))
+        self.assertFalse(is_cacheable({"sub_agent_reports": [report()], "final_answer": SYNTHESIS_FAILED}))
+        self.assertFalse(is_cacheable({"sub_agent_reports": [report(), report("skipped (timeout)")], "final_answer": "ok"}))
+        self.assertFalse(is_cacheable({"sub_agent_reports": [report(rubric_scores={})], "final_answer": "ok"}))
+
+
+class TestPersistentTier(unittest.TestCase):
+    def setUp(self):
+        use_sqlite(self)
+
+    def test_prune_keeps_newest_entries(self):
+        now = int(time.time())
+        with database.get_db_connection() as session:
+            for i, age in enumerate((10_000, 30, 20, 10)):
+                session.add(database.WorkflowCacheEntry(cache_key=f"k{i}", result="{}", created_at=now - age))
+            session.commit()
+        database.put_cached_result("new", "{}")
+        self.assertEqual(database.prune_cached_results(max_entries=2, max_age=3600), 3)
+        with database.get_db_connection() as session:
+            keys = sorted(key for (key,) in session.query(database.WorkflowCacheEntry.cache_key))
+        self.assertEqual(keys, ["k3", "new"])
+        self.assertEqual(database.get_cached_result("new", 3600), "{}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import httpx
+from langchain.schema import HumanMessage, SystemMessage
+from pydantic import BaseModel
+
+import backend
+import cassette
+from transcribe_deepgram import AsyncTranscriber
+
+
+class Score(BaseModel):
+    score: float
+    comment: str
+
+
+class StubStructured:
+    def __init__(self, llm, schema):
+        self.llm = llm
+        self.schema = schema
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        self.llm.calls += 1
+        if self.llm.fail:
+            raise RuntimeError("Network call in a replay")
+        return self.schema(score=0.75, comment=messages[-1].content)
+
+
+class StubLLM:
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    def with_structured_output(self, schema, **kwargs):
+        return StubStructured(self, schema)
+
+
+def messages(text: str):
+    return [SystemMessage(content="Score this."), HumanMessage(content=text)]
+
+
+class TestCassette(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "calls.json")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    async def test_records_once_then_replays_offline(self):
+        live = StubLLM()
+        llm = cassette.CassetteLLM(live, cassette.Cassette(self.path, "replay"), "model-a")
+        first = await llm.with_structured_output(Score).ainvoke(messages("hello"))
+        again = await llm.with_structured_output(Score).ainvoke(messages("hello"))
+        self.assertEqual(live.calls, 1)
+        self.assertEqual(again, first)
+
+        offline = cassette.CassetteLLM(StubLLM(fail=True), cassette.Cassette(self.path, "strict"), "model-a")
+        replayed = await offline.with_structured_output(Score).ainvoke(messages("hello"))
+        self.assertEqual(replayed, Score(score=0.75, comment="hello"))
+
+    async def test_strict_mode_fails_on_misses(self):
+        recorder = cassette.CassetteLLM(StubLLM(), cassette.Cassette(self.path, "replay"), "model-a")
+        await recorder.with_structured_output(Score).ainvoke(messages("hello"))
+
+        strict = cassette.CassetteLLM(StubLLM(fail=True), cassette.Cassette(self.path, "strict"), "model-a")
+        with self.assertRaises(cassette.CassetteMiss):
+            await strict.with_structured_output(Score).ainvoke(messages("other text"))
+        other_model = cassette.CassetteLLM(StubLLM(fail=True), cassette.Cassette(self.path, "strict"), "model-b")
+        with self.assertRaises(cassette.CassetteMiss):
+            await other_model.with_structured_output(Score).ainvoke(messages("hello"))
+
+    async def test_record_mode_refreshes_entries(self):
+        await cassette.CassetteLLM(StubLLM(), cassette.Cassette(self.path, "replay"), "m").with_structured_output(Score).ainvoke(messages("a"))
+        live = StubLLM()
+        recording = cassette.Cassette(self.path, "record")
+        await cassette.CassetteLLM(live, recording, "m").with_structured_output(Score).ainvoke(messages("a"))
+        self.assertEqual((live.calls, len(recording.entries)), (1, 1))
+
+    async def test_deepgram_transport_replays_by_audio(self):
+        calls = []
+
+        def deepgram(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(200, json={"results": {"audio_bytes": len(request.content)}})
+
+        recorder = AsyncTranscriber(api_key="key", transport=cassette.CassetteTransport(
+            cassette.Cassette(self.path, "replay"), httpx.MockTransport(deepgram)
+        ))
+        first = await recorder.transcribe(b"audio")
+        await recorder.aclose()
+
+        replayer = AsyncTranscriber(api_key="other-key", transport=cassette.CassetteTransport(
+            cassette.Cassette(self.path, "strict"), httpx.MockTransport(deepgram)
+        ))
+        self.assertEqual(await replayer.transcribe(b"audio"), first)
+        with self.assertRaises(cassette.CassetteMiss):
+            await replayer.transcribe(b"other audio")
+        await replayer.aclose()
+        self.assertEqual(len(calls), 1)
+
+    def test_install_and_uninstall(self):
+        original = backend.llm
+        cassette.install(cassette.Cassette(self.path, "strict"))
+        try:
+            self.assertIsInstance(backend.llm, cassette.CassetteLLM)
+            self.assertIs(backend.llm.llm, original)
+        finally:
+            cassette.uninstall()
+        self.assertIs(backend.llm, original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import backend
+from backend import Deadline, RouterContext, SubAgentReport, SubAgentTask, SynthesizerOutput
+
+DELAYS = {"FLUENCY": 0.01, "PRAGMATICS": 0.02, "PROSODY": 5.0}
+
+
+async def fake_route(text, router_mode=None, deadline=None):
+    return RouterContext(subagents_to_call=[
+        SubAgentTask(category=category, text_to_analyze=text) for category in DELAYS
+    ])
+
+
+async def fake_run_sub_agent(task, timing=None):
+    await asyncio.sleep(DELAYS[task.category])
+    score = {"FLUENCY": 0.8, "PRAGMATICS": 0.6}.get(task.category, 1.0)
+    return SubAgentReport(category=task.category, score=score, rubric_scores={"item": score},
+                          what_went_right=f"good {task.category}", what_went_wrong="",
+                          how_to_improve=f"improve {task.category}")
+
+
+class TestDeadline(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.synthesized = []
+
+        async def fake_final_synthesizer_llm(*args, **kwargs):
+            self.synthesized.append(1)
+            return SynthesizerOutput(summary="model summary", total_score=0.0)
+
+        self.patches = [
+            patch.object(backend, "route", fake_route),
+            patch.object(backend, "run_sub_agent", fake_run_sub_agent),
+            patch.object(backend, "structured_call", fake_final_synthesizer_llm),
+            patch.object(backend, "SYNTHESIZER_MIN_SECONDS", 0.05),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_slow_sub_agent_is_skipped(self):
+        result = await backend.run_workflow("hello there", use_cache=False, engine="multi_agent", deadline_seconds=0.2)
+        statuses = {r["category"]: r["status"] for r in result["sub_agent_reports"]}
+        self.assertEqual(statuses, {"FLUENCY": "ok", "PRAGMATICS": "ok", "PROSODY": "skipped (timeout)"})
+        # Averaged over the completed categories only
+        self.assertEqual(result["total_score"], 0.7)
+
+    async def test_quick_summary_when_time_is_up(self):
+        result = await backend.run_workflow("hello there", use_cache=False, engine="multi_agent", deadline_seconds=0.06)
+        self.assertEqual(self.synthesized, [])
+        self.assertIn("Strongest: fluency", result["final_answer"])
+        self.assertIn("Not analyzed in time: prosody", result["final_answer"])
+        self.assertEqual(result["total_score"], 0.7)
+
+    async def test_synthesizer_runs_with_time_left(self):
+        with patch.dict(DELAYS, {"PROSODY": 0.03}):
+            result = await backend.run_workflow("hello there", use_cache=False, engine="multi_agent", deadline_seconds=5)
+        self.assertEqual(self.synthesized, [1])
+        self.assertEqual(result["final_answer"], "model summary")
+        self.assertEqual(result["total_score"], 0.8)
+
+    async def test_failed_reports_do_not_count(self):
+        reports = [
+            SubAgentReport(category="FLUENCY", score=0.9, rubric_scores={"a": 0.9},
+                           what_went_right="", what_went_wrong="", how_to_improve=""),
+            backend.failed_report("PROSODY", RuntimeError("boom")),
+            backend.timeout_report("PRAGMATICS"),
+        ]
+        self.assertEqual(backend.average_score(reports), 0.9)
+
+
+class TestRouterDeadline(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_router_falls_back_to_local(self):
+        async def slow_main_agent(text):
+            await asyncio.sleep(5)
+
+        with patch.object(backend, "main_agent", slow_main_agent):
+            context = await backend.route("Speaker 0: hi\nSpeaker 1: hello", "llm", Deadline(0.2))
+        self.assertIn("TIME_BALANCE", [task.category for task in context.subagents_to_call])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import unittest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import database
+import main
+from broadcast import Broadcaster, report_event
+from report_cache import LocalBackend, ReportCache
+from test_support import use_sqlite
+
+
+class TestDevices(unittest.TestCase):
+    def setUp(self):
+        self.cache = ReportCache(LocalBackend(), ttl_seconds=60)
+        self.engine = use_sqlite(self, report_cache=self.cache)
+        self.client = TestClient(main.app)
+
+    def store(self, feedback, device_id, timestamp):
+        database.add_entries([{"feedback": feedback, "intermediate_feedbacks": "[]", "time_taken": 1,
+                               "transcript": "text", "timestamp": timestamp, "device_id": device_id}])
+
+    def test_latest_report_per_device(self):
+        self.store("alice 1", "alice", 100)
+        self.store("bob 1", "bob", 101)
+        self.store("alice 2", "alice", 102)
+        self.store("bob 2", "bob", 103)
+
+        self.assertEqual(self.client.get("/feedback/report", params={"device_id": "alice"}).json()["message"], "alice 2")
+        self.assertEqual(self.client.get("/feedback/report", params={"device_id": "bob"}).json()["message"], "bob 2")
+        self.assertEqual(self.client.get("/feedback/report").json()["message"], "bob 2")
+        self.assertEqual(self.client.get("/feedback/report", params={"device_id": "carol"}).json()["message"], "")
+
+    def test_device_reads_are_cached_and_fall_back_to_the_index(self):
+        database.add_entry("alice", "[]", 1, "text", device_id="alice")
+        self.assertEqual(self.cache.get("alice")["feedback"], "alice")
+        self.cache.invalidate()
+        self.assertEqual(database.get_most_recent_entry("alice")[0], "alice")
+        self.assertEqual(self.cache.get("alice")["feedback"], "alice")
+
+    def test_history_per_device(self):
+        for i in range(6):
+            self.store(f"entry {i}", "alice" if i % 2 else "bob", 100 + i)
+        body = self.client.get(
+            "/feedback/history", params={"device_id": "alice", "limit": 2, "fields": "feedback,device_id"}
+        ).json()
+        self.assertEqual([item["feedback"] for item in body["items"]], ["entry 5", "entry 3"])
+        rest = self.client.get("/feedback/history", params={"device_id": "alice", "cursor": body["next_cursor"]}).json()
+        self.assertEqual([item["feedback"] for item in rest["items"]], ["entry 1"])
+
+    def test_device_lookups_use_the_composite_index(self):
+        with self.engine.connect() as connection:
+            plan = connection.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM feedback WHERE device_id = 'alice' "
+                "ORDER BY timestamp DESC, id DESC LIMIT 1"
+            )).all()
+        details = " ".join(str(row[-1]) for row in plan)
+        self.assertIn("ix_feedback_device_timestamp", details)
+        self.assertNotIn("TEMP B-TREE", details)
+
+
+class TestDeviceBroadcast(unittest.IsolatedAsyncioTestCase):
+    async def test_subscribers_only_get_their_device(self):
+        broadcaster = Broadcaster()
+        alice = broadcaster.subscribe(device_id="alice")
+        everyone = broadcaster.subscribe()
+        broadcaster.publish(report_event("for bob", 100, "[]", "bob"), (100, 1))
+        broadcaster.publish(report_event("for alice", 101, "[]", "alice"), (101, 2))
+        self.assertEqual((await alice.get())["message"], "for alice")
+        self.assertEqual((await everyone.get())["message"], "for bob")
+        self.assertEqual((await everyone.get())["message"], "for alice")
+
+
+if __name__ == "__main__":
+    unittest.main()
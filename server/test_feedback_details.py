@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import unittest
+import zlib
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from sqlalchemy import event
+
+import compact
+import database
+from details_migration import DetailsMigration
+from test_support import use_sqlite
+
+REPORTS = json.dumps([{"agent": "fluency", "score": 0.8, "feedback": "Clear and steady."}], indent=2)
+LONG_TRANSCRIPT = "so basically the quarterly numbers look good " * 200
+
+
+class TestCompact(unittest.TestCase):
+    def test_reports_are_minified(self):
+        self.assertEqual(compact.unpack_reports(compact.pack_reports(REPORTS)),
+                         '[{"agent":"fluency","score":0.8,"feedback":"Clear and steady."}]')
+        self.assertEqual(compact.unpack_reports(compact.pack_reports("not json")), "not json")
+        self.assertIsNone(compact.unpack_reports(compact.pack_reports(None)))
+
+    def test_only_large_transcripts_are_compressed(self):
+        self.assertEqual(compact.pack_transcript("short", "zlib"), (b"short", None))
+        data, codec = compact.pack_transcript(LONG_TRANSCRIPT, "zlib")
+        self.assertEqual(codec, "zlib")
+        self.assertLess(len(data), len(LONG_TRANSCRIPT) / 10)
+        self.assertEqual(zlib.decompress(data).decode(), LONG_TRANSCRIPT)
+        self.assertEqual(compact.unpack_transcript(data, codec), LONG_TRANSCRIPT)
+        self.assertEqual(compact.pack_transcript(LONG_TRANSCRIPT, None, 10 ** 9), (LONG_TRANSCRIPT.encode(), None))
+
+    @unittest.skipIf(compact.zstandard is None, "zstandard is not installed")
+    def test_zstd_round_trip(self):
+        data, codec = compact.pack_transcript(LONG_TRANSCRIPT, "zstd")
+        self.assertEqual(codec, "zstd")
+        self.assertEqual(compact.unpack_transcript(data, codec), LONG_TRANSCRIPT)
+
+
+class TestFeedbackDetails(unittest.TestCase):
+    def setUp(self):
+        self.engine = use_sqlite(self)
+        self.statements = []
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def record(conn, cursor, statement, *_):
+            self.statements.append(statement)
+
+    def test_details_are_stored_outside_the_feedback_row(self):
+        feedback_id = database.add_entry("good", REPORTS, 2, LONG_TRANSCRIPT)
+        database.add_entries([{"feedback": "batched", "intermediate_feedbacks": REPORTS, "time_taken": 1,
+                               "transcript": "short", "timestamp": 1, "job_id": None}])
+        with database.get_db_connection() as session:
+            entry = session.get(database.Feedback, feedback_id)
+            self.assertIsNone(entry.intermediate_feedbacks)
+            self.assertIsNone(entry.transcript)
+            details = session.get(database.FeedbackDetails, entry.details_id)
+            self.assertIsNotNone(details.transcript_codec)
+            self.assertEqual(session.query(database.FeedbackDetails).count(), 2)
+
+        database.report_cache.invalidate()
+        entry = database.get_most_recent_entry()
+        self.assertEqual((entry[0], entry[2], entry[4]), ("good", compact.dumps(json.loads(REPORTS)), LONG_TRANSCRIPT))
+        items, _ = database.get_feedback_page(["feedback", "transcript"], 10)
+        self.assertEqual([item["transcript"] for item in items], [LONG_TRANSCRIPT, "short"])
+
+    def test_pages_without_details_do_not_read_them(self):
+        database.add_entry("good", REPORTS, 2, LONG_TRANSCRIPT)
+        self.statements = []
+        items, _ = database.get_feedback_page(["id", "feedback"], 10)
+        self.assertEqual(items[0]["feedback"], "good")
+        self.assertNotIn("feedback_details", " ".join(self.statements))
+
+    def test_old_rows_are_moved_in_the_background(self):
+        with database.get_db_connection() as session:
+            session.add_all([
+                database.Feedback(feedback=f"old {i}", intermediate_feedbacks=REPORTS, transcript=LONG_TRANSCRIPT,
+                                  timestamp=100 + i, time_taken=1)
+                for i in range(5)
+            ] + [database.Feedback(feedback="bare", timestamp=200)])
+            session.commit()
+        before = database.get_feedback_page(["feedback", "intermediate_feedbacks", "transcript"], 10)[0]
+
+        migration = DetailsMigration(batch=2, pause=0)
+        while asyncio.run(migration.run_batch()):
+            pass
+        self.assertTrue(migration.stats()["done"])
+
+        with database.get_db_connection() as session:
+            self.assertEqual(session.query(database.Feedback).filter(database.Feedback.transcript.isnot(None)).count(), 0)
+            self.assertEqual(session.query(database.FeedbackDetails).count(), 5)
+        after = database.get_feedback_page(["feedback", "intermediate_feedbacks", "transcript"], 10)[0]
+        self.assertEqual([item["transcript"] for item in after], [item["transcript"] for item in before])
+        self.assertEqual([json.loads(item["intermediate_feedbacks"] or "null") for item in after],
+                         [json.loads(item["intermediate_feedbacks"] or "null") for item in before])
+        # A second pass finds nothing left to move
+        database.move_feedback_details(0, 10)
+        with database.get_db_connection() as session:
+            self.assertEqual(session.query(database.FeedbackDetails).count(), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+
+import database
+import main
+import migrations
+from test_support import use_sqlite
+
+
+class TestFeedbackHistory(unittest.TestCase):
+    def setUp(self):
+        use_sqlite(self)
+        # Several entries share a timestamp so that pages must break ties by id
+        database.add_entries([
+            {"feedback": f"feedback {i}", "intermediate_feedbacks": "[]", "time_taken": i,
+             "transcript": f"transcript {i}", "timestamp": 1000 + i // 3, "job_id": None}
+            for i in range(10)
+        ])
+        self.client = TestClient(main.app)
+
+    def test_pages_cover_every_entry_newest_first(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 4, "fields": "id,timestamp"}
+            if cursor:
+                params["cursor"] = cursor
+            body = self.client.get("/feedback/history", params=params).json()
+            seen.extend(body["items"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 10)
+        keys = [(item["timestamp"], item["id"]) for item in seen]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(len(set(keys)), 10)
+
+    def test_returns_only_requested_fields(self):
+        body = self.client.get("/feedback/history", params={"limit": 2, "fields": "transcript"}).json()
+        self.assertEqual(body["items"], [{"transcript": "transcript 9"}, {"transcript": "transcript 8"}])
+
+        default = self.client.get("/feedback/history", params={"limit": 1}).json()["items"][0]
+        self.assertEqual(set(default), {"id", "timestamp", "time_taken", "feedback"})
+
+    def test_rejects_unknown_fields_and_bad_cursors(self):
+        self.assertEqual(self.client.get("/feedback/history", params={"fields": "id,password"}).status_code, 400)
+        self.assertEqual(self.client.get("/feedback/history", params={"cursor": "not-a-cursor"}).status_code, 400)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(database.decode_cursor(database.encode_cursor((1700000000, 42))), (1700000000, 42))
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmp.name}/feedback.db")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_upgrades_original_schema(self):
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE feedback (id INTEGER PRIMARY KEY, intermediate_feedbacks TEXT, feedback TEXT NOT NULL, "
+                "timestamp INTEGER NOT NULL, time_taken INTEGER, transcript TEXT)"
+            ))
+            connection.execute(text(
+                "CREATE TABLE jobs (id VARCHAR(32) PRIMARY KEY, kind VARCHAR(16) NOT NULL, status VARCHAR(16) NOT NULL, "
+                "payload TEXT NOT NULL, audio BLOB, result TEXT, error TEXT, feedback_id INTEGER, "
+                "attempts INTEGER NOT NULL, created_at INTEGER NOT NULL, started_at INTEGER, finished_at INTEGER)"
+            ))
+
+        self.assertEqual(migrations.run_migrations(self.engine), [1, 2, 3, 4, 5, 6, 7])
+        schema = inspect(self.engine)
+        columns = {c["name"] for c in schema.get_columns("feedback")}
+        self.assertTrue({"job_id", "device_id", "details_id"} <= columns)
+        self.assertNotIn("session_id", columns)
+        self.assertIn("ix_feedback_device_timestamp", {i["name"] for i in schema.get_indexes("feedback")})
+        self.assertIn("ix_feedback_timestamp_id", {i["name"] for i in schema.get_indexes("feedback")})
+        self.assertTrue({"lease_owner", "lease_expires_at", "feedback_row"} <= {c["name"] for c in schema.get_columns("jobs")})
+        self.assertEqual(migrations.run_migrations(self.engine), [])
+        self.assertEqual(migrations.current_version(self.engine), 7)
+
+    def test_fresh_schema_only_records_versions(self):
+        database.Base.metadata.create_all(self.engine)
+        self.assertEqual(migrations.run_migrations(self.engine), [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(migrations.current_version(self.engine), len(migrations.MIGRATIONS))
+        self.assertNotIn("session_id", {c["name"] for c in inspect(self.engine).get_columns("feedback")})
+
+
+if __name__ == "__main__":
+    unittest.main()
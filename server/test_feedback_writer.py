@@ -0,0 +1,123 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import database
+import feedback_writer
+from broadcast import Broadcaster
+from feedback_writer import FeedbackWriter, feedback_row
+from test_support import use_sqlite
+
+RESULT = {"final_answer": "great job", "sub_agent_reports": []}
+
+
+def count_feedback() -> int:
+    with database.get_db_connection() as session:
+        return session.query(database.Feedback).count()
+
+
+class TestFeedbackWriter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        use_sqlite(self, f"{self.tmp.name}/feedback.db")
+
+    async def test_flushes_when_batch_is_full(self):
+        writer = FeedbackWriter(batch_rows=3, max_staleness_ms=60_000)
+        await writer.start()
+        for i in range(3):
+            writer.submit(feedback_row(RESULT, i, f"text {i}"))
+        await asyncio.sleep(0.2)
+        self.assertEqual(count_feedback(), 3)
+        self.assertEqual(writer.flushes, 1)
+        await writer.stop()
+
+    async def test_flushes_after_max_staleness(self):
+        writer = FeedbackWriter(batch_rows=100, max_staleness_ms=50)
+        await writer.start()
+        writer.submit(feedback_row(RESULT, 1, "text"))
+        self.assertEqual(count_feedback(), 0)
+        await asyncio.sleep(0.3)
+        self.assertEqual(count_feedback(), 1)
+        await writer.stop()
+
+    async def test_stop_flushes_buffer(self):
+        writer = FeedbackWriter(batch_rows=100, max_staleness_ms=60_000)
+        await writer.start()
+        writer.submit(feedback_row(RESULT, 1, "text"))
+        await writer.stop()
+        self.assertEqual(count_feedback(), 1)
+        self.assertFalse(writer.running)
+
+    async def test_failed_flush_keeps_rows(self):
+        writer = FeedbackWriter()
+        writer.submit(feedback_row(RESULT, 1, "text"))
+
+        async def failing(rows):
+            raise RuntimeError("database down")
+
+        with patch.object(database, "aadd_entries", failing):
+            self.assertFalse(await writer.flush())
+        self.assertEqual(len(writer.buffer), 1)
+        self.assertTrue(await writer.flush())
+        self.assertEqual(count_feedback(), 1)
+
+    async def test_recovers_row_staged_on_job(self):
+        await database.acreate_job("job1", "text", "{}")
+        row = feedback_row(RESULT, 1, "text", job_id="job1")
+        await database.afinish_job("job1", database.JOB_SUCCEEDED, feedback_row=json.dumps(row))
+
+        writer = FeedbackWriter(batch_rows=100, max_staleness_ms=60_000)
+        await writer.start()
+        self.assertEqual(writer.recovered, 1)
+        await writer.stop()
+        self.assertEqual(count_feedback(), 1)
+        self.assertEqual(await database.aget_unwritten_feedback(10), [])
+
+    async def test_does_not_duplicate_written_row(self):
+        await database.acreate_job("job1", "text", "{}")
+        row = feedback_row(RESULT, 1, "text", job_id="job1")
+        await database.aadd_entries([row])
+        # Staged after the flush already wrote it
+        await database.afinish_job("job1", database.JOB_SUCCEEDED, feedback_row=json.dumps(row))
+
+        writer = FeedbackWriter()
+        await writer.start()
+        await writer.stop()
+        self.assertEqual(writer.recovered, 0)
+        self.assertEqual(count_feedback(), 1)
+
+    async def test_save_feedback_stages_job_rows(self):
+        writer = FeedbackWriter(batch_rows=100, max_staleness_ms=60_000)
+        await writer.start()
+        with patch.object(feedback_writer, "feedback_writer", writer), \
+                patch.object(feedback_writer, "FEEDBACK_WRITE_BEHIND", True):
+            self.assertIsNone(await feedback_writer.save_feedback(RESULT, 1, "text", "job1"))
+            self.assertIsNone(await feedback_writer.save_feedback(RESULT, 1, "text"))
+        self.assertEqual(json.loads(writer.take_staged("job1"))["job_id"], "job1")
+        self.assertIsNone(writer.take_staged("job1"))
+        await writer.stop()
+        self.assertEqual(count_feedback(), 2)
+
+    async def test_flush_pushes_rows_with_their_positions(self):
+        broadcaster = Broadcaster()
+        subscription = broadcaster.subscribe()
+        writer = FeedbackWriter()
+        writer.submit(feedback_row(RESULT, 1, "text"))
+        with patch.object(feedback_writer, "broadcaster", broadcaster):
+            self.assertTrue(await writer.flush())
+        self.assertEqual((await subscription.get())["message"], "great job")
+        report = database.load_most_recent_report()
+        self.assertIn((report["timestamp"], report["id"]), broadcaster.seen)
+
+    async def test_save_feedback_writes_directly_without_writer(self):
+        with patch.object(feedback_writer, "feedback_writer", FeedbackWriter()):
+            feedback_id = await feedback_writer.save_feedback(RESULT, 1, "text")
+        self.assertIsInstance(feedback_id, int)
+        self.assertEqual(count_feedback(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
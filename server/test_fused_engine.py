@@ -0,0 +1,59 @@
+import os
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import backend
+
+
+class FakeStructuredLLM:
+    def __init__(self, schema, calls):
+        self.schema = schema
+        self.calls = calls
+
+    async def ainvoke(self, messages):
+        self.calls.append(self.schema)
+        values = {"summary": "You should slow down."}
+        for name, field in self.schema.model_fields.items():
+            if name == "summary":
+                continue
+            model = field.annotation
+            raw = {key: 0.0 for key in model.model_fields if key.startswith("raw_")}
+            values[name] = model(**raw, what_went_right="", what_went_wrong="", how_to_improve="", prompt="")
+        return self.schema(**values)
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = []
+
+    def with_structured_output(self, schema):
+        return FakeStructuredLLM(schema, self.calls)
+
+
+class TestFusedEngine(unittest.IsolatedAsyncioTestCase):
+    async def test_single_call_same_result_shape(self):
+        fake = FakeLLM()
+        with patch.object(backend, "llm", fake):
+            result = await backend.run_workflow(
+                "Speaker 0: Hi there.\nSpeaker 1: Hello.", use_cache=False, engine="fused"
+            )
+        self.assertEqual(len(fake.calls), 1)
+        self.assertEqual(set(result), {"sub_agent_reports", "final_answer", "total_score"})
+        self.assertEqual(
+            [r["category"] for r in result["sub_agent_reports"]],
+            ["FLUENCY", "PROSODY", "PRAGMATICS", "CONSIDERATION", "TIME_BALANCE"]
+        )
+        self.assertEqual(result["final_answer"], "You should slow down.")
+
+    async def test_placeholder_text_makes_no_call(self):
+        fake = FakeLLM()
+        with patch.object(backend, "llm", fake):
+            result = await backend.run_workflow("Transcribing...", use_cache=False, engine="fused")
+        self.assertEqual(fake.calls, [])
+        self.assertEqual(result["total_score"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import hedging
+from hedging import EmptyOutput, HedgeBudget, LatencyTracker, hedged, resilient_call
+
+
+class Throttled(Exception):
+    code = 429
+
+
+class HedgingTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.patches = [
+            patch.object(hedging, "trackers", {}),
+            patch.object(hedging, "budget", HedgeBudget(ratio=1.0, max_burst=10)),
+            patch.object(hedging, "HEDGE_DEFAULT_DELAY_SECONDS", 0.05),
+            patch.object(hedging, "RETRY_BASE_SECONDS", 0.001),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+
+class TestHedged(HedgingTestCase):
+    async def test_slow_call_is_hedged(self):
+        latencies = [1.0, 0.01]
+        cancelled = []
+
+        async def call():
+            latency = latencies.pop(0)
+            try:
+                await asyncio.sleep(latency)
+            except asyncio.CancelledError:
+                cancelled.append(latency)
+                raise
+            return latency
+
+        self.assertEqual(await hedged("FLUENCY", call), 0.01)
+        await asyncio.sleep(0)
+        self.assertEqual(cancelled, [1.0])
+        stats = hedging.trackers["FLUENCY"].stats()
+        self.assertEqual((stats["hedges"], stats["hedge_wins"]), (1, 1))
+
+    async def test_fast_call_is_not_hedged(self):
+        calls = []
+
+        async def call():
+            calls.append(1)
+            return "ok"
+
+        self.assertEqual(await hedged("FLUENCY", call), "ok")
+        self.assertEqual(len(calls), 1)
+
+    async def test_budget_caps_hedges(self):
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.08)
+            return "ok"
+
+        with patch.object(hedging, "budget", HedgeBudget(ratio=0.25, max_burst=1)):
+            await asyncio.gather(*(hedged("PROSODY", slow) for _ in range(8)))
+        hedges = hedging.trackers["PROSODY"].hedges
+        self.assertLessEqual(hedges, 2)
+        self.assertEqual(len(calls), 8 + hedges)
+
+    async def test_failed_primary_falls_back_to_hedge(self):
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                await asyncio.sleep(0.1)
+                raise EmptyOutput("no output")
+            await asyncio.sleep(0.2)
+            return "hedge"
+
+        self.assertEqual(await hedged("PRAGMATICS", call), "hedge")
+
+
+class TestResilientCall(HedgingTestCase):
+    async def test_retries_empty_output(self):
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise EmptyOutput("no output")
+            return "ok"
+
+        self.assertEqual(await resilient_call("FLUENCY", call), "ok")
+        self.assertEqual(hedging.trackers["FLUENCY"].retries, 2)
+
+    async def test_retries_are_bounded(self):
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            raise EmptyOutput("no output")
+
+        with self.assertRaises(EmptyOutput):
+            await resilient_call("FLUENCY", call)
+        self.assertEqual(len(attempts), hedging.MODEL_MAX_RETRIES + 1)
+
+    async def test_quota_and_programming_errors_are_not_retried(self):
+        for error in (Throttled("quota"), KeyError("missing")):
+            attempts = []
+
+            async def call():
+                attempts.append(1)
+                raise error
+
+            with self.assertRaises(type(error)):
+                await resilient_call("FLUENCY", call)
+            self.assertEqual(len(attempts), 1)
+
+
+class TestLatencyTracker(unittest.TestCase):
+    def test_delay_follows_percentile(self):
+        tracker = LatencyTracker()
+        with patch.object(hedging, "HEDGE_MIN_SAMPLES", 10), patch.object(hedging, "HEDGE_PERCENTILE", 0.9):
+            self.assertEqual(tracker.hedge_delay(), hedging.HEDGE_DEFAULT_DELAY_SECONDS)
+            for i in range(1, 101):
+                tracker.record(i / 100)
+            self.assertAlmostEqual(tracker.hedge_delay(), 0.91)
+
+
+if __name__ == "__main__":
+    unittest.main()
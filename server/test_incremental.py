@@ -0,0 +1,196 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import backend
+import incremental
+from backend import RouterContext, SubAgentTask, SubAgentReport, SynthesizerOutput
+
+
+def make_report(category: str, score: float) -> SubAgentReport:
+    return SubAgentReport(
+        category=category,
+        score=score,
+        rubric_scores={"item": score},
+        what_went_right="right",
+        what_went_wrong="wrong",
+        how_to_improve="improve"
+    )
+
+
+class TestSplitDelta(unittest.TestCase):
+    def test_new_session(self):
+        self.assertEqual(incremental.split_delta([], "hello there"), (False, ["hello", "there"]))
+
+    def test_continuation(self):
+        self.assertEqual(
+            incremental.split_delta(["hello", "there"], "hello  there general kenobi"),
+            (True, ["general", "kenobi"])
+        )
+
+    def test_rewritten_transcript(self):
+        continuation, delta = incremental.split_delta(["hello", "there"], "something else entirely")
+        self.assertFalse(continuation)
+        self.assertEqual(delta, ["something", "else", "entirely"])
+
+
+class TestMergeReports(unittest.TestCase):
+    def test_weighted_by_word_count(self):
+        state = incremental.CategoryState(report=make_report("FLUENCY", 1.0), words=30)
+        merged = incremental.merge_reports(state, make_report("FLUENCY", 0.0), 10)
+        self.assertEqual(merged.words, 40)
+        self.assertAlmostEqual(merged.report.score, 0.75)
+        self.assertAlmostEqual(merged.report.rubric_scores["item"], 0.75)
+
+
+class TestIncrementalWorkflow(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.analyzed = []
+        self.categories = ["FLUENCY"]
+        self.failing = set()
+        self.sub_agent_texts = []
+
+        async def fake_route(text, router_mode=None, deadline=None):
+            self.analyzed.append(text)
+            return RouterContext(subagents_to_call=[
+                SubAgentTask(category=category, text_to_analyze=text) for category in self.categories
+            ])
+
+        async def fake_run_sub_agent(task, timing=None):
+            self.sub_agent_texts.append((task.category, task.text_to_analyze))
+            if task.category in self.failing:
+                return backend.failed_report(task.category, RuntimeError("quota exceeded"))
+            return make_report(task.category, 0.5 if "um" in task.text_to_analyze else 1.0)
+
+        async def fake_final_synthesizer(text, reports, deadline=None):
+            return SynthesizerOutput(summary="summary", total_score=round(sum(r.score for r in reports) / len(reports), 2))
+
+        self.patches = [
+            patch.object(incremental, "route", fake_route),
+            patch.object(backend, "run_sub_agent", fake_run_sub_agent),
+            patch.object(incremental, "final_synthesizer", fake_final_synthesizer),
+        ]
+        for p in self.patches:
+            p.start()
+        incremental.reset_session("s1")
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_only_delta_is_analyzed(self):
+        await incremental.run_incremental_workflow("s1", "I am confident in my work")
+        result, analyzed = await incremental.run_incremental_workflow("s1", "I am confident in my work um um like um")
+        self.assertTrue(analyzed)
+        self.assertEqual(self.analyzed, ["I am confident in my work", "um um like um"])
+        # 6 words at 1.0 merged with 4 words at 0.5
+        self.assertEqual(result["total_score"], 0.8)
+
+    async def test_failed_category_catches_up_on_missed_words(self):
+        self.categories = ["FLUENCY", "PROSODY"]
+        await incremental.run_incremental_workflow("s1", "I am confident in my work")
+        self.failing = {"PROSODY"}
+        result, analyzed = await incremental.run_incremental_workflow("s1", "I am confident in my work um um like um")
+        self.assertTrue(analyzed)
+        prosody = next(r for r in result["sub_agent_reports"] if r["category"] == "PROSODY")
+        self.assertEqual(prosody["score"], 1.0)
+
+        self.failing = set()
+        self.sub_agent_texts = []
+        result, analyzed = await incremental.run_incremental_workflow(
+            "s1", "I am confident in my work um um like um and then some"
+        )
+        self.assertTrue(analyzed)
+        self.assertIn(("PROSODY", "um um like um and then some"), self.sub_agent_texts)
+        self.assertIn(("FLUENCY", "and then some"), self.sub_agent_texts)
+        states = incremental._sessions["s1"].categories
+        self.assertEqual(states["PROSODY"].words, 13)
+        self.assertEqual(states["FLUENCY"].words, 13)
+        self.assertEqual(incremental._sessions["s1"].pending, {})
+
+    async def test_delta_stays_pending_when_every_sub_agent_fails(self):
+        first, _ = await incremental.run_incremental_workflow("s1", "I am confident in my work")
+        self.failing = {"FLUENCY"}
+        result, analyzed = await incremental.run_incremental_workflow("s1", "I am confident in my work um um like um")
+        self.assertFalse(analyzed)
+        self.assertEqual(result, first)
+
+        self.failing = set()
+        result, analyzed = await incremental.run_incremental_workflow("s1", "I am confident in my work um um like um")
+        self.assertTrue(analyzed)
+        self.assertEqual(self.analyzed[-1], "um um like um")
+        self.assertEqual(result["total_score"], 0.8)
+
+    async def test_first_call_failing_is_not_analyzed(self):
+        self.failing = {"FLUENCY"}
+        result, analyzed = await incremental.run_incremental_workflow("s1", "I am confident in my work")
+        self.assertFalse(analyzed)
+        self.assertEqual(result["sub_agent_reports"][0]["status"], backend.REPORT_FAILED)
+        self.assertEqual(incremental._sessions["s1"].analyzed_words, [])
+
+    async def test_eviction_keeps_sessions_with_a_request_in_flight(self):
+        with patch.object(incremental, "MAX_SESSIONS", 1):
+            lock = incremental._locks.setdefault("busy", asyncio.Lock())
+            async with lock:
+                incremental._get_session("busy")
+                incremental._get_session("other")
+                self.assertIn("other", incremental._sessions)
+                self.assertIs(incremental._locks["busy"], lock)
+                self.assertIn("busy", incremental._sessions)
+            incremental._get_session("third")
+            self.assertNotIn("busy", incremental._sessions)
+        for session_id in ("busy", "other", "third"):
+            incremental.reset_session(session_id)
+
+    async def test_short_delta_returns_previous_result(self):
+        first, _ = await incremental.run_incremental_workflow("s1", "I am confident in my work")
+        second, analyzed = await incremental.run_incremental_workflow("s1", "I am confident in my work today")
+        self.assertEqual(len(self.analyzed), 1)
+        self.assertFalse(analyzed)
+        self.assertEqual(first, second)
+
+    async def test_short_delta_is_not_stored_again(self):
+        from processors import text as text_processor
+
+        stored = []
+
+        async def fake_save_feedback(result, time_taken, transcript, job_id=None, device_id=None):
+            stored.append(transcript)
+            return len(stored)
+
+        with patch.object(text_processor, "save_feedback", fake_save_feedback):
+            first = await text_processor.process_text("I am confident in my work", 0, session_id="s1")
+            second = await text_processor.process_text("I am confident in my work today", 0, session_id="s1")
+        self.assertEqual(stored, ["I am confident in my work"])
+        self.assertEqual(first["feedback_id"], 1)
+        self.assertIsNone(second["feedback_id"])
+        self.assertEqual(second["final_answer"], first["final_answer"])
+
+    async def test_device_id_alone_analyzes_the_whole_text(self):
+        from processors import text as text_processor
+
+        stored = []
+
+        async def fake_run_workflow(text, router_mode=None, engine=None):
+            return {"final_answer": text, "sub_agent_reports": [], "total_score": 0.5}
+
+        async def fake_save_feedback(result, time_taken, transcript, job_id=None, device_id=None):
+            stored.append((transcript, device_id))
+            return len(stored)
+
+        async def no_incremental(*args):
+            raise AssertionError("Only a session_id selects incremental analysis")
+
+        with patch.object(text_processor, "run_workflow", fake_run_workflow), \
+                patch.object(text_processor, "run_incremental_workflow", no_incremental), \
+                patch.object(text_processor, "save_feedback", fake_save_feedback):
+            for text in ("I am confident in my work", "I am confident in my work today"):
+                await text_processor.process_text(text, 0, device_id="lens-1")
+        self.assertEqual(stored, [("I am confident in my work", "lens-1"), ("I am confident in my work today", "lens-1")])
+
+
+if __name__ == "__main__":
+    unittest.main()
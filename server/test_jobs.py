@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+
+import database
+import jobs
+import main
+from feedback_writer import FeedbackWriter
+from jobs import JobQueue, QueueFull
+from test_support import use_sqlite
+from uploads import spooled_from_bytes
+
+AUDIO = b"RIFF" + os.urandom(4096)
+
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        use_sqlite(self)
+        self.calls = []
+
+        async def fake_run_job(kind, payload, audio=None, job_id=None):
+            self.calls.append((kind, payload, audio.read_all() if audio is not None else None))
+            if payload.get("fail"):
+                raise RuntimeError("model unavailable")
+            return {"feedback_id": 7, "final_answer": "ok", "sub_agent_reports": [], "total_score": 0.5}
+
+        self.patch = patch.object(jobs, "run_job", fake_run_job)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    async def wait_until_done(self, queue):
+        for _ in range(200):
+            if queue.stats()["queued"] == 0 and queue.stats()["running"] == 0:
+                return
+            await asyncio.sleep(0.01)
+        self.fail("Jobs did not finish")
+
+    async def test_success_and_failure_are_persisted(self):
+        queue = JobQueue(workers=2, maxsize=10)
+        await queue.start()
+        ok = await queue.submit("text", {"text": "hello", "timestamp": 1})
+        failed = await queue.submit("text", {"text": "hello", "timestamp": 1, "fail": True})
+        await self.wait_until_done(queue)
+        await queue.stop()
+
+        job = database.get_job(ok)
+        self.assertEqual(job["status"], database.JOB_SUCCEEDED)
+        self.assertEqual(job["feedback_id"], 7)
+        self.assertEqual(json.loads(job["result"])["final_answer"], "ok")
+        self.assertEqual(job["attempts"], 1)
+        job = database.get_job(failed)
+        self.assertEqual(job["status"], database.JOB_FAILED)
+        self.assertEqual(job["error"], "model unavailable")
+        self.assertEqual(queue.stats()["succeeded"], 1)
+        self.assertEqual(queue.stats()["failed"], 1)
+
+    async def test_failed_job_discards_its_staged_row(self):
+        writer = FeedbackWriter()
+
+        async def stage_then_fail(kind, payload, audio=None, job_id=None):
+            # e.g. the feedback was saved, then the job failed afterwards
+            writer.submit({"job_id": job_id, "feedback": "saved"}, stage=True)
+            raise RuntimeError("model unavailable")
+
+        queue = JobQueue(workers=1, maxsize=10)
+        with patch.object(jobs, "feedback_writer", writer), patch.object(jobs, "run_job", stage_then_fail):
+            await queue.start()
+            job_id = await queue.submit("text", {"text": "hello", "timestamp": 1})
+            await self.wait_until_done(queue)
+            await queue.stop()
+        self.assertEqual(database.get_job(job_id)["status"], database.JOB_FAILED)
+        self.assertEqual(writer.staged, {})
+
+    async def test_full_queue_rejects(self):
+        queue = JobQueue(workers=1, maxsize=2)
+        # Not started workers: fill the queue without draining it
+        queue._queue = asyncio.Queue(maxsize=2)
+        await queue.submit("text", {"text": "a", "timestamp": 1})
+        await queue.submit("text", {"text": "b", "timestamp": 1})
+        with self.assertRaises(QueueFull):
+            await queue.submit("text", {"text": "c", "timestamp": 1})
+        self.assertEqual(queue.stats()["rejected"], 1)
+
+    async def test_unfinished_jobs_are_recovered(self):
+        database.create_job("queued", "text", json.dumps({"text": "a", "timestamp": 1}))
+        database.create_job("interrupted", "voice_file", json.dumps({"timestamp": 1, "content_type": "audio/wav"}), AUDIO)
+        database.mark_job_running("interrupted")
+        database.create_job("done", "text", json.dumps({"text": "b", "timestamp": 1}))
+        database.finish_job("done", database.JOB_SUCCEEDED, result="{}")
+
+        queue = JobQueue(workers=2, maxsize=10)
+        await queue.start()
+        await self.wait_until_done(queue)
+        await queue.stop()
+
+        self.assertEqual(queue.stats()["recovered"], 2)
+        self.assertEqual(sorted(kind for kind, _, _ in self.calls), ["text", "voice_file"])
+        self.assertIn(AUDIO, [audio for _, _, audio in self.calls])
+        interrupted = database.get_job("interrupted")
+        self.assertEqual(interrupted["status"], database.JOB_SUCCEEDED)
+        self.assertEqual(interrupted["attempts"], 2)
+
+    async def test_jobs_leased_by_live_processes_are_left_alone(self):
+        payload = json.dumps({"text": "a", "timestamp": 1})
+        database.create_job("live", "text", payload, owner="other-api", lease_seconds=60)
+        database.create_job("crashed", "text", payload, owner="gone-api", lease_seconds=60)
+        with database.get_db_connection() as session:
+            session.query(database.Job).filter(database.Job.id == "crashed").update({database.Job.lease_expires_at: 0})
+            session.commit()
+
+        queue = JobQueue(workers=1, maxsize=10)
+        await queue.start()
+        await self.wait_until_done(queue)
+        await queue.stop()
+
+        self.assertEqual(queue.stats()["recovered"], 1)
+        self.assertEqual(database.get_job("crashed")["status"], database.JOB_SUCCEEDED)
+        self.assertEqual(database.get_job("live")["status"], database.JOB_QUEUED)
+
+    async def test_stopped_queue_hands_jobs_over(self):
+        first = JobQueue(workers=0, maxsize=10)
+        await first.start()
+        job_id = await first.submit("text", {"text": "a", "timestamp": 1})
+        await first.stop()
+
+        second = JobQueue(workers=1, maxsize=1)
+        await second.start()
+        await self.wait_until_done(second)
+        await second.stop()
+        self.assertEqual(second.stats()["recovered"], 1)
+        self.assertEqual(database.get_job(job_id)["status"], database.JOB_SUCCEEDED)
+
+    async def test_uploaded_audio_survives_a_restart(self):
+        with tempfile.TemporaryDirectory() as audio_dir, patch.object(jobs, "JOB_AUDIO_DIR", audio_dir):
+            first = JobQueue(workers=0, maxsize=10)
+            await first.start()
+            job_id = await first.submit("voice_file", {"timestamp": 1, "content_type": "audio/wav"}, spooled_from_bytes(AUDIO))
+            await first.stop()
+            self.assertEqual(os.listdir(audio_dir), [f"{job_id}.audio"])
+
+            second = JobQueue(workers=1, maxsize=10)
+            await second.start()
+            await self.wait_until_done(second)
+            await second.stop()
+            self.assertEqual(os.listdir(audio_dir), [])
+        self.assertEqual(self.calls[0][2], AUDIO)
+        self.assertEqual(database.get_job(job_id)["status"], database.JOB_SUCCEEDED)
+
+    async def test_audio_left_behind_is_pruned(self):
+        with tempfile.TemporaryDirectory() as audio_dir, patch.object(jobs, "JOB_AUDIO_DIR", audio_dir):
+            path = os.path.join(audio_dir, "abandoned.audio")
+            with open(path, "wb") as file:
+                file.write(AUDIO)
+            self.assertEqual(jobs.prune_audio(3600), 0)
+            os.utime(path, (time.time() - 7200, time.time() - 7200))
+            self.assertEqual(jobs.prune_audio(3600), 1)
+            self.assertFalse(os.path.exists(path))
+
+
+class TestJobEndpoints(unittest.TestCase):
+    def setUp(self):
+        use_sqlite(self)
+
+        async def fake_process_text(text, timestamp, session_id=None, router_mode=None, engine=None, job_id=None, device_id=None):
+            return {"feedback_id": 3, "final_answer": text.upper(), "sub_agent_reports": [], "total_score": 1.0}
+
+        self.patches = [
+            patch.object(main, "SECRET_KEY", "secret"),
+            patch.object(main.processors, "process_text", fake_process_text),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_upload_returns_job_with_result(self):
+        with TestClient(main.app) as client:
+            response = client.post("/upload/text", json={"text": "hello", "secret_key": "secret", "timestamp": 1})
+            self.assertEqual(response.status_code, 200)
+            job_id = response.json()["job_id"]
+            for _ in range(100):
+                job = client.get(f"/jobs/{job_id}").json()
+                if job["status"] == "succeeded":
+                    break
+                time.sleep(0.02)
+            self.assertEqual(job["status"], "succeeded")
+            self.assertEqual(job["feedback_id"], 3)
+            self.assertEqual(job["result"]["final_answer"], "HELLO")
+            self.assertEqual(client.get("/jobs/missing").status_code, 404)
+
+    def test_full_queue_returns_429(self):
+        async def full(*args, **kwargs):
+            raise QueueFull("Job queue is full")
+
+        with TestClient(main.app) as client, patch.object(main.job_queue, "submit", full):
+            response = client.post("/upload/text", json={"text": "hello", "secret_key": "secret", "timestamp": 1})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], str(jobs.JOB_RETRY_AFTER_SECONDS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from lexical_metrics import lexical_metrics, raw_scores
+
+
+class TestLexicalMetrics(unittest.TestCase):
+    def test_counts_fillers_and_hedges(self):
+        m = lexical_metrics("Uh, like, I guess, um, my experience is, like, in software, you know?")
+        self.assertEqual(m.filler_count, 5)  # uh, like, um, like, you know
+        self.assertEqual(m.hedge_count, 1)   # I guess
+        self.assertEqual(m.word_count, 13)
+        self.assertEqual(m.sentence_count, 1)
+
+    def test_like_as_verb_is_not_a_filler(self):
+        self.assertEqual(lexical_metrics("I like pizza and I like pasta.").filler_count, 0)
+
+    def test_run_on_sentences(self):
+        m = lexical_metrics("I have worked in multiple teams I have shipped products I am passionate about problem solving")
+        self.assertEqual(m.run_on_count, 1)
+        self.assertEqual(raw_scores("FLUENCY", m)["raw_run_ons"], 1.0)
+
+    def test_pauses_and_speakers(self):
+        m = lexical_metrics("Speaker 0: I... I think... maybe.\nSpeaker 1: Yeah, right.")
+        self.assertEqual(m.pause_count, 2)
+        self.assertEqual(m.speaker_count, 2)
+        self.assertEqual(m.acknowledgment_count, 2)
+        self.assertEqual(m.word_count, 6)  # speaker labels are not words
+        self.assertIn("raw_acknowledgment", raw_scores("CONSIDERATION", m))
+
+    def test_single_speaker_leaves_acknowledgment_to_model(self):
+        m = lexical_metrics("I am confident in my experience and can communicate clearly.")
+        self.assertEqual(raw_scores("CONSIDERATION", m), {"raw_hedging": 0.0})
+        self.assertEqual(raw_scores("PRAGMATICS", m), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import unittest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from backend import count_speakers, local_router
+
+
+class TestLocalRouter(unittest.TestCase):
+    def categories(self, text):
+        return [task.category for task in local_router(text).subagents_to_call]
+
+    def test_single_speaker_skips_time_balance(self):
+        self.assertEqual(
+            self.categories("Um, I think, like, the project went well."),
+            ["FLUENCY", "PROSODY", "PRAGMATICS", "CONSIDERATION"]
+        )
+
+    def test_multiple_speakers(self):
+        text = "Speaker 0: How was your weekend?\nSpeaker 1: Pretty good, thanks.\nSpeaker 0: Nice."
+        self.assertEqual(count_speakers(text), 2)
+        self.assertIn("TIME_BALANCE", self.categories(text))
+
+    def test_every_task_gets_full_text(self):
+        text = "Speaker 0: Hi.\nSpeaker 1: Hello."
+        for task in local_router(text).subagents_to_call:
+            self.assertEqual(task.text_to_analyze, text)
+
+    def test_placeholder_text(self):
+        self.assertEqual(self.categories("Transcribing..."), [])
+        self.assertEqual(self.categories("   "), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
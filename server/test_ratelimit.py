@@ -0,0 +1,137 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+import ratelimit
+from ratelimit import AdaptiveLimiter, GovernedLLM, TokenBucket, is_throttled
+
+
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class FakeStructured:
+    def __init__(self, llm):
+        self.llm = llm
+
+    async def ainvoke(self, messages):
+        return await self.llm.ainvoke(messages)
+
+
+class FakeLLM:
+    """Fails with 429 while more than `quota` calls are in flight"""
+
+    def __init__(self, quota=100, latency=0.01):
+        self.quota = quota
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+
+    def with_structured_output(self, schema):
+        return FakeStructured(self)
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.in_flight > self.quota:
+                raise ResourceExhausted("429 RESOURCE_EXHAUSTED")
+            await asyncio.sleep(self.latency)
+            return "ok"
+        finally:
+            self.in_flight -= 1
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_reserve_beyond_capacity_waits(self):
+        bucket = TokenBucket(rate_per_minute=60)
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1), 1.0, places=1)
+        self.assertAlmostEqual(bucket.reserve(1), 2.0, places=1)
+
+
+class TestAdaptiveLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrency_cap(self):
+        fake = FakeLLM()
+        llm = GovernedLLM(fake, AdaptiveLimiter("test", rpm=100000, tpm=10**9, max_concurrency=3))
+        results = await asyncio.gather(*(llm.with_structured_output(dict).ainvoke("hi") for _ in range(12)))
+        self.assertEqual(results, ["ok"] * 12)
+        self.assertLessEqual(fake.peak, 3)
+        self.assertEqual(llm.limiter.stats()["calls"], 12)
+        self.assertGreater(llm.limiter.stats()["queue_time_max"], 0.0)
+
+    async def test_rpm_budget_queues_instead_of_failing(self):
+        limiter = AdaptiveLimiter("test", rpm=600, tpm=10**9, max_concurrency=50)
+        limiter.requests.available = 0.0
+        fake = FakeLLM(latency=0)
+        started = time.monotonic()
+        # 10 requests per second
+        results = await asyncio.gather(*(limiter.call(lambda: fake.ainvoke("hi"), 1) for _ in range(3)))
+        self.assertEqual(results, ["ok"] * 3)
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+
+    async def test_backs_off_and_retries_on_429(self):
+        fake = FakeLLM(quota=2)
+        limiter = AdaptiveLimiter("test", rpm=100000, tpm=10**9, max_concurrency=8)
+        with patch.object(ratelimit, "RATE_LIMIT_BACKOFF_SECONDS", 0.01):
+            results = await asyncio.gather(*(limiter.call(lambda: fake.ainvoke("hi"), 10) for _ in range(8)))
+        self.assertEqual(results, ["ok"] * 8)
+        stats = limiter.stats()
+        self.assertGreater(stats["throttled"], 0)
+        self.assertEqual(stats["retries"], stats["throttled"])
+        self.assertLess(stats["concurrency_limit"], 8)
+
+    async def test_other_errors_are_not_retried(self):
+        limiter = AdaptiveLimiter("test", rpm=100000, tpm=10**9, max_concurrency=2)
+        calls = []
+
+        async def broken():
+            calls.append(1)
+            raise ValueError("bad schema")
+
+        with self.assertRaises(ValueError):
+            await limiter.call(broken, 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(limiter.stats()["errors"], 1)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_gives_up_after_max_retries(self):
+        limiter = AdaptiveLimiter("test", rpm=100000, tpm=10**9, max_concurrency=2)
+
+        async def exhausted():
+            raise ResourceExhausted("quota")
+
+        with patch.object(ratelimit, "RATE_LIMIT_BACKOFF_SECONDS", 0.001), patch.object(ratelimit, "RATE_LIMIT_MAX_RETRIES", 2):
+            with self.assertRaises(ResourceExhausted):
+                await limiter.call(exhausted, 10)
+        self.assertEqual(limiter.stats()["retries"], 2)
+
+
+class TestIsThrottled(unittest.TestCase):
+    def test_classification(self):
+        from google.api_core import exceptions
+        from google.genai import errors
+
+        self.assertTrue(is_throttled(ResourceExhausted("quota")))
+        self.assertTrue(is_throttled(exceptions.ServiceUnavailable("model overloaded")))
+        self.assertTrue(is_throttled(errors.APIError(429, {"error": {"status": "RESOURCE_EXHAUSTED"}})))
+        self.assertFalse(is_throttled(errors.APIError(400, {"error": {"status": "INVALID_ARGUMENT"}})))
+        self.assertFalse(is_throttled(ValueError("validation error")))
+        # The message does not matter, only the type and status code
+        self.assertFalse(is_throttled(ValueError("expected 429 items")))
+
+    def test_wrapped_errors(self):
+        try:
+            try:
+                raise ResourceExhausted("quota")
+            except ResourceExhausted as e:
+                raise RuntimeError("Error calling model") from e
+        except RuntimeError as wrapped:
+            self.assertTrue(is_throttled(wrapped))
+
+
+if __name__ == "__main__":
+    unittest.main()
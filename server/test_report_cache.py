@@ -0,0 +1,127 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import event
+
+import database
+from report_cache import MISS, LocalBackend, ReportCache, SharedMemoryBackend, make_backend
+from test_support import use_sqlite
+
+
+def report(timestamp, feedback_id, text="feedback"):
+    return {"id": feedback_id, "timestamp": timestamp, "feedback": text, "intermediate_feedbacks": "[]",
+            "time_taken": 1, "transcript": "hello"}
+
+
+class TestReportCache(unittest.TestCase):
+    def test_hit_after_publish(self):
+        cache = ReportCache(LocalBackend(), ttl_seconds=60)
+        self.assertIs(cache.get(), MISS)
+        cache.publish(report(100, 1))
+        self.assertEqual(cache.get()["id"], 1)
+        cache.publish(None)
+        # An empty table never hides an entry
+        self.assertEqual(cache.get()["id"], 1)
+
+    def test_older_version_does_not_replace_newer(self):
+        cache = ReportCache(LocalBackend(), ttl_seconds=60)
+        cache.publish(report(100, 2))
+        cache.publish(report(100, 1))
+        cache.publish(report(99, 5))
+        self.assertEqual(cache.get()["id"], 2)
+        cache.publish(report(101, 3))
+        self.assertEqual(cache.get()["id"], 3)
+
+    def test_expired_entry_is_a_miss_and_replaceable(self):
+        cache = ReportCache(LocalBackend(), ttl_seconds=0.05)
+        cache.publish(report(100, 2))
+        time.sleep(0.1)
+        self.assertIs(cache.get(), MISS)
+        # e.g. the database was restored from a backup
+        cache.publish(report(90, 1))
+        self.assertEqual(cache.get()["id"], 1)
+
+    def test_disabled(self):
+        cache = ReportCache(None)
+        cache.publish(report(100, 1))
+        self.assertIs(cache.get(), MISS)
+
+    def test_shared_memory_is_opt_in(self):
+        self.assertIsInstance(make_backend(), LocalBackend)
+        with patch.dict(os.environ, {"REPORT_CACHE_PATH": os.path.join(tempfile.gettempdir(), "latest.json")}):
+            self.assertIsInstance(make_backend("shm"), SharedMemoryBackend)
+        self.assertIsNone(make_backend("off"))
+
+
+class TestSharedMemoryBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "latest.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_shared_between_processes(self):
+        # Two caches over the same file stand in for two uvicorn workers
+        writer = ReportCache(SharedMemoryBackend(self.path), ttl_seconds=60)
+        reader = ReportCache(SharedMemoryBackend(self.path), ttl_seconds=60)
+        self.assertIs(reader.get(), MISS)
+        writer.publish(report(100, 1))
+        self.assertEqual(reader.get()["id"], 1)
+        reader.publish(report(100, 0))
+        writer.publish(report(101, 2, "newer"))
+        self.assertEqual(reader.get()["feedback"], "newer")
+
+    def test_invalidate_removes_file(self):
+        cache = ReportCache(SharedMemoryBackend(self.path), ttl_seconds=60)
+        cache.publish(report(100, 1))
+        cache.invalidate()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIs(cache.get(), MISS)
+
+
+class TestDatabaseIntegration(unittest.TestCase):
+    def setUp(self):
+        self.engine = use_sqlite(self)
+        self.cache = ReportCache(LocalBackend(), ttl_seconds=60)
+        self.patch = patch.object(database, "report_cache", self.cache)
+        self.patch.start()
+        self.queries = 0
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def count(*_):
+            self.queries += 1
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_writes_update_cache_and_reads_skip_database(self):
+        self.assertIsNone(database.get_most_recent_entry())
+        database.add_entry("first", "[]", 1, "hello")
+        self.queries = 0
+        self.assertEqual(database.get_most_recent_entry()[0], "first")
+        self.assertEqual(self.queries, 0)
+
+        database.add_entries([
+            {"feedback": f"batch {i}", "intermediate_feedbacks": "[]", "time_taken": 1,
+             "transcript": "hello", "timestamp": int(time.time()) + 1, "job_id": None}
+            for i in range(3)
+        ])
+        self.queries = 0
+        self.assertEqual(database.get_most_recent_entry()[0], "batch 2")
+        self.assertEqual(self.queries, 0)
+
+    def test_miss_loads_from_database(self):
+        database.add_entry("stored", "[]", 1, "hello")
+        self.cache.invalidate()
+        self.assertEqual(database.get_most_recent_entry()[0], "stored")
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(database.get_most_recent_entry()[0], "stored")
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import os
+import unittest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+
+import database
+import main
+import rollups
+from test_support import use_sqlite
+
+DAY = 86400
+HOUR = 3600
+
+
+def entry(timestamp: int, total_score: float, time_taken: int, fluency: float) -> dict:
+    reports = json.dumps([{"category": "FLUENCY", "score": fluency, "rubric_scores": {}}])
+    return {"feedback": "ok", "intermediate_feedbacks": reports, "time_taken": time_taken,
+            "transcript": "text", "timestamp": timestamp, "total_score": total_score}
+
+
+class TestRollupHelpers(unittest.TestCase):
+    def test_buckets_and_summary(self):
+        self.assertEqual(rollups.bucket_start(10 * DAY + 5 * HOUR + 7, "hour"), 10 * DAY + 5 * HOUR)
+        self.assertEqual(rollups.bucket_start(10 * DAY + 5 * HOUR + 7, "day"), 10 * DAY)
+        self.assertEqual(rollups.time_taken_bin(5), "le_5")
+        self.assertEqual(rollups.time_taken_bin(600), "gt_60")
+        summary = rollups.summarize(2, 1.0, 0.5 ** 2 + 0.5 ** 2)
+        self.assertEqual((summary["mean"], summary["stddev"]), (0.5, 0.0))
+
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        use_sqlite(self)
+        self.client = TestClient(main.app)
+        self.day = 100 * DAY
+
+    def store(self):
+        database.add_entries([
+            entry(self.day + 60, 0.4, 3, 0.2),
+            entry(self.day + 120, 0.8, 12, 0.6),
+            entry(self.day + HOUR + 5, 0.6, 90, 1.0),
+        ])
+
+    def rollup_table(self):
+        with database.get_db_connection() as session:
+            return sorted(
+                (row.granularity, row.bucket, row.metric, row.count, round(row.value_sum, 6), round(row.value_sum_sq, 6))
+                for row in session.query(database.FeedbackRollup)
+            )
+
+    def test_writes_update_hourly_and_daily_buckets(self):
+        self.store()
+        body = self.client.get("/analytics/trends", params={
+            "granularity": "hour", "since": self.day, "until": self.day + DAY
+        }).json()
+        self.assertEqual([bucket["start"] for bucket in body["buckets"]], [self.day, self.day + HOUR])
+        first = body["buckets"][0]
+        self.assertEqual(first["metrics"]["total_score"]["count"], 2)
+        self.assertAlmostEqual(first["metrics"]["total_score"]["mean"], 0.6)
+        self.assertAlmostEqual(first["metrics"]["total_score"]["stddev"], 0.2)
+        self.assertAlmostEqual(first["metrics"]["FLUENCY"]["mean"], 0.4)
+        self.assertEqual(first["time_taken_histogram"], {"le_5": 1, "le_20": 1})
+
+        database.add_entry("later", json.dumps([{"category": "FLUENCY", "score": 0.5, "rubric_scores": {}}]), 4, "t", total_score=0.9)
+        day = self.client.get("/analytics/trends", params={"granularity": "day", "metrics": "total_score,time_taken"}).json()
+        today = day["buckets"][-1]
+        self.assertEqual(set(today["metrics"]), {"total_score", "time_taken"})
+        self.assertEqual(today["metrics"]["total_score"]["mean"], 0.9)
+        self.assertEqual(today["time_taken_histogram"], {"le_5": 1})
+
+    def test_backfill_rebuilds_the_same_rollups(self):
+        self.store()
+        maintained = self.rollup_table()
+        with database.get_db_connection() as session:
+            session.query(database.FeedbackRollup).delete()
+            session.commit()
+        self.assertEqual(database.rebuild_rollups(0, self.day + DAY), len(maintained))
+        self.assertEqual(self.rollup_table(), maintained)
+        # Idempotent
+        database.rebuild_rollups(self.day, self.day + 1)
+        self.assertEqual(self.rollup_table(), maintained)
+
+    def test_rejects_bad_windows(self):
+        self.assertEqual(self.client.get("/analytics/trends", params={"since": 10, "until": 10}).status_code, 400)
+        self.assertEqual(self.client.get("/analytics/trends", params={"since": 0, "until": 2000 * HOUR}).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
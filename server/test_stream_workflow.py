@@ -0,0 +1,47 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import backend
+from backend import RouterContext, SubAgentTask, SubAgentReport, SynthesizerOutput
+
+DELAYS = {"FLUENCY": 0.05, "PRAGMATICS": 0.01}
+
+
+async def fake_route(text, router_mode=None, deadline=None):
+    return RouterContext(subagents_to_call=[
+        SubAgentTask(category=category, text_to_analyze=text) for category in DELAYS
+    ])
+
+
+async def fake_run_sub_agent(task, timing=None):
+    await asyncio.sleep(DELAYS[task.category])
+    return SubAgentReport(category=task.category, score=1.0, rubric_scores={"item": 1.0},
+                          what_went_right="", what_went_wrong="", how_to_improve="")
+
+
+async def fake_final_synthesizer(text, reports, deadline=None):
+    return SynthesizerOutput(summary="summary", total_score=backend.average_score(reports))
+
+
+class TestStreamWorkflow(unittest.IsolatedAsyncioTestCase):
+    async def test_reports_stream_in_completion_order(self):
+        with patch.object(backend, "route", fake_route), \
+                patch.object(backend, "run_sub_agent", fake_run_sub_agent), \
+                patch.object(backend, "final_synthesizer", fake_final_synthesizer), \
+                patch.object(backend.workflow_cache, "enabled", False):
+            events = [event async for event in backend.stream_workflow("hello there", engine="multi_agent")]
+
+        self.assertEqual([e["event"] for e in events], ["report", "report", "summary"])
+        self.assertEqual([e["data"]["category"] for e in events[:2]], ["PRAGMATICS", "FLUENCY"])
+        # The final result keeps the router order
+        summary = events[-1]["data"]
+        self.assertEqual([r["category"] for r in summary["sub_agent_reports"]], ["FLUENCY", "PRAGMATICS"])
+        self.assertEqual(summary["total_score"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
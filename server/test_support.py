@@ -0,0 +1,40 @@
+"""
+Shared helpers for the tests.
+
+`use_sqlite(test)` points `database.SessionLocal` at a fresh SQLite database, and
+`database.report_cache` at a fresh in-process cache, for the duration of one test and
+puts the previous ones back afterwards, so tests neither leak their database into each
+other nor into code importing `database` later on.
+"""
+import unittest
+from typing import Optional
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+
+import database
+from report_cache import LocalBackend, ReportCache
+
+
+def use_sqlite(test: unittest.TestCase, path: Optional[str] = None, report_cache: Optional[ReportCache] = None) -> Engine:
+    """
+    Bind `database.SessionLocal` to an in-memory SQLite database, or to the file `path`
+    when worker threads need their own connections, and create the tables. The latest
+    report is cached in `report_cache`, by default a local cache with the default TTL.
+    """
+    if path is None:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    previous = database.SessionLocal.kw.get("bind")
+    database.SessionLocal.configure(bind=engine)
+    # Cleanups run last in, first out: the bind is restored before the engine is disposed
+    test.addCleanup(engine.dispose)
+    test.addCleanup(database.SessionLocal.configure, bind=previous)
+    cache_patch = patch.object(database, "report_cache", report_cache or ReportCache(LocalBackend()))
+    cache_patch.start()
+    test.addCleanup(cache_patch.stop)
+    database.Base.metadata.create_all(engine)
+    return engine
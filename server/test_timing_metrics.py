@@ -0,0 +1,58 @@
+import unittest
+
+from timing_metrics import raw_scores, timing_metrics
+
+
+def word(text, start, end, speaker):
+    return {"word": text, "start": start, "end": end, "speaker": speaker}
+
+
+# Speaker 0 talks for 3 seconds with one long pause, speaker 1 cuts in before speaker 0 finished
+WORDS = [
+    word("so", 0.0, 0.3, 0),
+    word("i", 0.4, 0.5, 0),
+    word("think", 1.8, 2.1, 0),
+    word("we", 2.2, 3.0, 0),
+    word("yeah", 2.9, 3.2, 1),
+    word("right", 3.3, 3.6, 1),
+    word("okay", 4.0, 4.5, 0),
+]
+
+
+class TestTimingMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = timing_metrics(WORDS)
+
+    def test_turns_and_interruptions(self):
+        self.assertEqual(self.metrics.turn_count, 3)
+        self.assertEqual(self.metrics.overlap_count, 1)
+        self.assertEqual(self.metrics.interruption_count, 1)
+        self.assertEqual(self.metrics.speakers["1"].interruptions, 1)
+        self.assertEqual(self.metrics.speakers["0"].turns, 2)
+
+    def test_pauses(self):
+        self.assertEqual(self.metrics.pause_count, 1)
+        self.assertEqual(self.metrics.long_pause_count, 1)
+        self.assertAlmostEqual(self.metrics.pause_max, 1.3)
+
+    def test_speaking_share_and_wpm(self):
+        self.assertAlmostEqual(self.metrics.speakers["0"].speaking_time, 3.5)
+        self.assertAlmostEqual(self.metrics.speakers["1"].speaking_time, 0.7)
+        self.assertAlmostEqual(self.metrics.speakers["0"].wpm, round(5 / 3.5 * 60, 1))
+        self.assertAlmostEqual(
+            self.metrics.speakers["0"].share + self.metrics.speakers["1"].share, 1.0, places=2
+        )
+
+    def test_raw_scores(self):
+        balance = raw_scores("TIME_BALANCE", self.metrics)
+        self.assertAlmostEqual(balance["raw_interruption_ratio"], 0.5)
+        self.assertGreater(balance["raw_speaking_share"], 0.5)
+        self.assertEqual(set(raw_scores("PROSODY", self.metrics)), {"raw_pace", "raw_speed", "raw_pauses"})
+
+    def test_missing_timestamps(self):
+        self.assertIsNone(timing_metrics([]))
+        self.assertIsNone(timing_metrics([{"word": "hi"}]))
+
+
+if __name__ == "__main__":
+    unittest.main()
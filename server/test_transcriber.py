@@ -0,0 +1,62 @@
+import asyncio
+import base64
+import unittest
+
+import httpx
+
+from deepgram_stub import create_app
+from transcribe_deepgram import AsyncTranscriber, extract_words, transcribe_base64_audio_async
+import transcribe_deepgram
+
+
+class TestAsyncTranscriber(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # Serve the stub in-process instead of over the network
+        self.transcriber = AsyncTranscriber(
+            api_key="stub", base_url="http://stub", max_concurrency=2,
+            transport=httpx.ASGITransport(app=create_app(latency=0.05))
+        )
+
+    async def asyncTearDown(self):
+        await self.transcriber.aclose()
+
+    async def test_transcribes_against_stub(self):
+        response = await self.transcriber.transcribe(b"\x00" * 15000, content_type="audio/mpeg")
+        self.assertEqual(len(extract_words(response)), 10)
+        self.assertEqual(self.transcriber.stats()["requests"], 1)
+
+    async def test_streams_async_chunks(self):
+        async def chunks():
+            for _ in range(10):
+                yield b"\x00" * 1500
+
+        response = await self.transcriber.transcribe(chunks(), content_type="audio/wav", content_length=15000)
+        self.assertEqual(len(extract_words(response)), 10)
+
+    async def test_bounded_concurrency(self):
+        peak = 0
+
+        async def watch():
+            nonlocal peak
+            while True:
+                peak = max(peak, self.transcriber.in_flight)
+                await asyncio.sleep(0.005)
+
+        watcher = asyncio.create_task(watch())
+        await asyncio.gather(*(self.transcriber.transcribe(b"\x00" * 100) for _ in range(6)))
+        watcher.cancel()
+        self.assertEqual(peak, 2)
+
+    async def test_base64_helper_uses_shared_transcriber(self):
+        original = transcribe_deepgram.transcriber
+        transcribe_deepgram.transcriber = self.transcriber
+        try:
+            audio = "data:audio/mp3;base64," + base64.b64encode(b"\x00" * 100).decode()
+            response = await transcribe_base64_audio_async(audio)
+        finally:
+            transcribe_deepgram.transcriber = original
+        self.assertEqual(len(extract_words(response)), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
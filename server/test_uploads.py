@@ -0,0 +1,116 @@
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+
+import jobs
+import main
+from test_support import use_sqlite
+from uploads import UploadTooLarge, spool_stream
+
+AUDIO = os.urandom(200 * 1024)
+
+
+async def chunked(data, size=8192):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class TestSpoolStream(unittest.IsolatedAsyncioTestCase):
+    async def test_hashes_and_replays(self):
+        audio = await spool_stream(chunked(AUDIO), "audio/mpeg")
+        self.assertEqual(audio.size, len(AUDIO))
+        self.assertEqual(audio.sha256, hashlib.sha256(AUDIO).hexdigest())
+        self.assertEqual(b"".join([chunk async for chunk in audio.chunks()]), AUDIO)
+        audio.close()
+
+    async def test_size_limit(self):
+        with self.assertRaises(UploadTooLarge):
+            await spool_stream(chunked(AUDIO), max_bytes=1024)
+
+
+class TestBinaryUploadEndpoint(unittest.TestCase):
+    def setUp(self):
+        use_sqlite(self)
+        self.received = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        async def fake_process_voice_file(audio, timestamp, router_mode=None, engine=None, job_id=None, device_id=None):
+            self.received.append((audio.size, audio.sha256))
+            audio.close()
+            return {"feedback_id": 1}
+
+        self.patches = [
+            patch.object(main, "SECRET_KEY", "secret"),
+            patch.object(main.processors, "process_voice_file", fake_process_voice_file),
+            patch.object(jobs, "JOB_AUDIO_DIR", self.tmp.name),
+        ]
+        for p in self.patches:
+            p.start()
+        self.client = TestClient(main.app)
+        self.client.__enter__()
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        for p in self.patches:
+            p.stop()
+
+    def wait_for_job(self, job_id):
+        for _ in range(100):
+            job = self.client.get(f"/jobs/{job_id}").json()
+            if job["status"] in ("succeeded", "failed"):
+                return job
+            time.sleep(0.02)
+        self.fail("Job did not finish")
+
+    def test_raw_body(self):
+        response = self.client.post(
+            "/upload/voice/binary?secret_key=secret&timestamp=1",
+            content=AUDIO, headers={"Content-Type": "audio/mpeg"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["sha256"], hashlib.sha256(AUDIO).hexdigest())
+        self.assertEqual(self.wait_for_job(response.json()["job_id"])["status"], "succeeded")
+        self.assertEqual(self.received, [(len(AUDIO), hashlib.sha256(AUDIO).hexdigest())])
+
+    def test_multipart(self):
+        from starlette.datastructures import FormData
+
+        closed = []
+        close = FormData.close
+
+        async def tracking_close(form):
+            closed.append(form)
+            await close(form)
+
+        with patch.object(FormData, "close", tracking_close):
+            response = self.client.post(
+                "/upload/voice/binary?secret_key=secret&timestamp=1",
+                files={"audio": ("recording.mp3", AUDIO, "audio/mpeg")}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["size"], len(AUDIO))
+        self.assertEqual(len(closed), 1)
+
+    def test_too_large(self):
+        with patch.object(main, "MAX_AUDIO_UPLOAD_BYTES", 1024):
+            response = self.client.post(
+                "/upload/voice/binary?secret_key=secret&timestamp=1",
+                content=AUDIO, headers={"Content-Type": "audio/mpeg"}
+            )
+        self.assertEqual(response.status_code, 413)
+
+    def test_invalid_secret(self):
+        response = self.client.post("/upload/voice/binary?secret_key=wrong&timestamp=1", content=b"x")
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import database
+import jobs
+import worker
+from feedback_writer import FeedbackWriter
+from jobs import JobQueue, QueueFull
+from test_support import use_sqlite
+from worker import Worker
+
+
+class WorkerTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # A file database so that worker threads get their own connections
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        use_sqlite(self, f"{self.tmp.name}/jobs.db")
+        self.calls = []
+
+        async def fake_run_job(kind, payload, audio=None, job_id=None):
+            self.calls.append(payload["text"])
+            await asyncio.sleep(0.01)
+            if payload.get("fail"):
+                raise RuntimeError("model unavailable")
+            return {"feedback_id": len(self.calls), "final_answer": payload["text"]}
+
+        self.patch = patch.object(worker, "run_job", fake_run_job)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def add_jobs(self, n, **extra):
+        for i in range(n):
+            database.create_job(f"job{i}", "text", json.dumps({"text": f"text {i}", "timestamp": 1, **extra}))
+
+
+class TestWorker(WorkerTestCase):
+    async def test_workers_drain_backlog_without_duplicates(self):
+        self.add_jobs(12)
+        workers = [Worker(concurrency=3, poll_seconds=0.01, owner=f"w{i}") for i in range(2)]
+        await asyncio.gather(*(w.run(once=True) for w in workers))
+
+        self.assertEqual(sorted(self.calls), sorted(f"text {i}" for i in range(12)))
+        self.assertEqual(sum(w.succeeded for w in workers), 12)
+        for i in range(12):
+            job = database.get_job(f"job{i}")
+            self.assertEqual(job["status"], database.JOB_SUCCEEDED)
+            self.assertEqual(job["attempts"], 1)
+
+    async def test_failed_job_is_recorded(self):
+        self.add_jobs(1, fail=True)
+        await Worker(poll_seconds=0.01).run(once=True)
+        job = database.get_job("job0")
+        self.assertEqual(job["status"], database.JOB_FAILED)
+        self.assertEqual(job["error"], "model unavailable")
+
+    async def test_failed_job_discards_its_staged_row(self):
+        writer = FeedbackWriter()
+
+        async def stage_then_fail(kind, payload, audio=None, job_id=None):
+            writer.submit({"job_id": job_id, "feedback": "saved"}, stage=True)
+            raise RuntimeError("model unavailable")
+
+        self.add_jobs(1)
+        with patch.object(worker, "feedback_writer", writer), patch.object(worker, "run_job", stage_then_fail):
+            await Worker(poll_seconds=0.01).run(once=True)
+        self.assertEqual(database.get_job("job0")["status"], database.JOB_FAILED)
+        self.assertEqual(writer.staged, {})
+
+
+class TestLeases(WorkerTestCase):
+    def test_claim_is_exclusive(self):
+        self.add_jobs(1)
+        self.assertEqual(database.claim_job("a", 60)[0], "job0")
+        self.assertIsNone(database.claim_job("b", 60))
+        self.assertTrue(database.renew_lease("job0", "a", 60))
+        self.assertFalse(database.renew_lease("job0", "b", 60))
+
+    def test_expired_lease_is_requeued_then_failed(self):
+        self.add_jobs(1)
+        database.claim_job("dead", -1)
+        self.assertEqual(database.requeue_expired_jobs(max_attempts=2), (1, 0))
+        self.assertEqual(database.get_job("job0")["status"], database.JOB_QUEUED)
+
+        database.claim_job("dead again", -1)
+        self.assertEqual(database.requeue_expired_jobs(max_attempts=2), (0, 1))
+        self.assertEqual(database.get_job("job0")["status"], database.JOB_FAILED)
+
+    def test_stale_owner_cannot_finish(self):
+        self.add_jobs(1)
+        database.claim_job("slow", -1)
+        database.requeue_expired_jobs(max_attempts=3)
+        database.claim_job("fresh", 60)
+        self.assertFalse(database.finish_job("job0", database.JOB_SUCCEEDED, result="{}", owner="slow"))
+        self.assertTrue(database.finish_job("job0", database.JOB_SUCCEEDED, result="{}", owner="fresh"))
+
+    def test_release_returns_job_to_queue(self):
+        self.add_jobs(1)
+        database.claim_job("stopping", 60)
+        self.assertTrue(database.release_job("job0", "stopping"))
+        self.assertEqual(database.claim_job("next", 60)[0], "job0")
+
+
+class TestWorkerExecutionMode(WorkerTestCase):
+    async def test_api_only_persists_jobs(self):
+        queue = JobQueue(execution="worker")
+        await queue.start()
+        job_id = await queue.submit("text", {"text": "hello", "timestamp": 1})
+        self.assertEqual(database.get_job(job_id)["status"], database.JOB_QUEUED)
+        self.assertEqual(self.calls, [])
+
+        with patch.object(jobs, "JOB_BACKLOG_LIMIT", 1):
+            with self.assertRaises(QueueFull):
+                await queue.submit("text", {"text": "again", "timestamp": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
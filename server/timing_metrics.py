@@ -0,0 +1,176 @@
+"""
+Prosody and turn-taking metrics from Deepgram word timestamps.
+
+`parse_speaker_transcript` reduces the Deepgram response to text, which loses
+each word's `start`/`end`/`speaker`. This module keeps them as NumPy arrays and
+measures pace, pauses, speaking share, overlaps, interruptions and turns
+directly, instead of asking the LLM to infer timing from punctuation.
+"""
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+# Gaps between words shorter than this are normal articulation, not pauses
+PAUSE_THRESHOLD_SECONDS = float(os.getenv("PAUSE_THRESHOLD_SECONDS", "0.25"))
+LONG_PAUSE_SECONDS = float(os.getenv("LONG_PAUSE_SECONDS", "1.0"))
+# A speaker change with less silence than this counts as an interruption
+INTERRUPTION_GAP_SECONDS = float(os.getenv("INTERRUPTION_GAP_SECONDS", "0.2"))
+IDEAL_WPM_MIN = 120
+IDEAL_WPM_MAX = 160
+# WPM distance outside the ideal range at which pace is considered fully off
+WPM_TOLERANCE = 60
+# Long pauses per 100 words at which pausing is considered excessive
+LONG_PAUSES_SATURATION = 5
+
+
+class SpeakerTiming(BaseModel):
+    words: int
+    speaking_time: float
+    wpm: float
+    share: float
+    turns: int
+    interruptions: int
+
+
+class TimingMetrics(BaseModel):
+    duration: float
+    word_count: int
+    wpm: float
+    speakers: Dict[str, SpeakerTiming]
+    turn_count: int
+    pause_count: int
+    pause_mean: float
+    pause_p50: float
+    pause_p90: float
+    pause_max: float
+    long_pause_count: int
+    overlap_count: int
+    interruption_count: int
+
+    @property
+    def speaker_count(self) -> int:
+        return len(self.speakers)
+
+
+def _wpm(words: float, seconds: float) -> float:
+    return round(words / seconds * 60, 1) if seconds > 0 else 0.0
+
+
+def timing_metrics(words: List[dict]) -> Optional[TimingMetrics]:
+    """Compute timing metrics for a Deepgram `words` array, or None if there is no timing data"""
+    if not words:
+        return None
+    try:
+        start = np.fromiter((w["start"] for w in words), dtype=float, count=len(words))
+        end = np.fromiter((w["end"] for w in words), dtype=float, count=len(words))
+    except (KeyError, TypeError):
+        return None
+    speaker = np.fromiter((w.get("speaker", 0) or 0 for w in words), dtype=int, count=len(words))
+
+    # --- Turns: maximal runs of words by the same speaker ---
+    change = speaker[1:] != speaker[:-1]
+    turn_starts = np.concatenate(([0], np.flatnonzero(change) + 1))
+    turn_ends = np.concatenate((turn_starts[1:] - 1, [len(words) - 1]))
+    turn_time = np.maximum(end[turn_ends] - start[turn_starts], 0.0)
+
+    # --- Gaps between consecutive words ---
+    gaps = start[1:] - end[:-1]
+    within_turn = gaps[~change]
+    pauses = within_turn[within_turn >= PAUSE_THRESHOLD_SECONDS]
+    overlaps = change & (gaps < 0)
+    interruptions = change & (gaps < INTERRUPTION_GAP_SECONDS)
+
+    # --- Per-speaker totals ---
+    speaker_ids, speaker_index = np.unique(speaker, return_inverse=True)
+    n = len(speaker_ids)
+    turn_index = speaker_index[turn_starts]
+    time_by_speaker = np.bincount(turn_index, weights=turn_time, minlength=n)
+    words_by_speaker = np.bincount(speaker_index, minlength=n)
+    turns_by_speaker = np.bincount(turn_index, minlength=n)
+    # The speaker who starts talking is the one who interrupts
+    interruptions_by_speaker = np.bincount(speaker_index[1:][interruptions], minlength=n)
+    total_time = time_by_speaker.sum()
+
+    speakers = {}
+    for i, s in enumerate(speaker_ids):
+        speakers[str(s)] = SpeakerTiming(
+            words=int(words_by_speaker[i]),
+            speaking_time=round(float(time_by_speaker[i]), 2),
+            wpm=_wpm(words_by_speaker[i], time_by_speaker[i]),
+            share=round(float(time_by_speaker[i] / total_time), 3) if total_time > 0 else 0.0,
+            turns=int(turns_by_speaker[i]),
+            interruptions=int(interruptions_by_speaker[i]),
+        )
+
+    return TimingMetrics(
+        duration=round(float(end.max() - start.min()), 2),
+        word_count=len(words),
+        wpm=_wpm(len(words), total_time),
+        speakers=speakers,
+        turn_count=len(turn_starts),
+        pause_count=int(pauses.size),
+        pause_mean=round(float(pauses.mean()), 2) if pauses.size else 0.0,
+        pause_p50=round(float(np.percentile(pauses, 50)), 2) if pauses.size else 0.0,
+        pause_p90=round(float(np.percentile(pauses, 90)), 2) if pauses.size else 0.0,
+        pause_max=round(float(pauses.max()), 2) if pauses.size else 0.0,
+        long_pause_count=int((pauses >= LONG_PAUSE_SECONDS).sum()),
+        overlap_count=int(overlaps.sum()),
+        interruption_count=int(interruptions.sum()),
+    )
+
+
+def _pace_deviation(wpm: float) -> float:
+    if IDEAL_WPM_MIN <= wpm <= IDEAL_WPM_MAX:
+        return 0.0
+    distance = IDEAL_WPM_MIN - wpm if wpm < IDEAL_WPM_MIN else wpm - IDEAL_WPM_MAX
+    return min(distance / WPM_TOLERANCE, 1.0)
+
+
+def raw_scores(category: str, timing: TimingMetrics) -> Dict[str, float]:
+    """Raw rubric fields of the category output model that are measured from timestamps"""
+    if category == "PROSODY":
+        pace = _pace_deviation(timing.wpm)
+        long_pauses_per_100 = timing.long_pause_count / timing.word_count * 100
+        return {
+            "raw_pace": pace,
+            "raw_speed": pace,
+            "raw_pauses": min(long_pauses_per_100 / LONG_PAUSES_SATURATION, 1.0),
+        }
+    if category == "FLUENCY":
+        return {"raw_wpm": _pace_deviation(timing.wpm)}
+    if category == "TIME_BALANCE" and timing.speaker_count > 1:
+        n = timing.speaker_count
+        top_share = max(s.share for s in timing.speakers.values())
+        speaker_changes = max(timing.turn_count - 1, 1)
+        return {
+            # 0 when everyone talks equally, 1 when one speaker talks the whole time
+            "raw_speaking_share": min(max((top_share - 1 / n) / (1 - 1 / n), 0.0), 1.0),
+            "raw_interruption_ratio": timing.interruption_count / speaker_changes,
+        }
+    return {}
+
+
+def timing_prompt(category: str, timing: TimingMetrics) -> str:
+    """Measured timing handed to the sub-agent so it only has to explain it"""
+    if category in ("PROSODY", "FLUENCY"):
+        lines = [
+            f"- overall pace: {timing.wpm} words per minute (ideal {IDEAL_WPM_MIN}-{IDEAL_WPM_MAX})",
+            f"- pauses over {PAUSE_THRESHOLD_SECONDS}s: {timing.pause_count} "
+            f"(median {timing.pause_p50}s, p90 {timing.pause_p90}s, longest {timing.pause_max}s)",
+            f"- pauses over {LONG_PAUSE_SECONDS}s: {timing.long_pause_count}",
+        ]
+        lines += [f"- Speaker {s}: {t.wpm} words per minute" for s, t in timing.speakers.items()]
+    elif category == "TIME_BALANCE":
+        lines = [f"- turns: {timing.turn_count}, overlaps: {timing.overlap_count}, interruptions: {timing.interruption_count}"]
+        lines += [
+            f"- Speaker {s}: {round(t.share * 100)}% of speaking time, {t.turns} turns, {t.interruptions} interruptions"
+            for s, t in timing.speakers.items()
+        ]
+    else:
+        return ""
+    return (
+        "\nMEASURED TIMING (from audio timestamps, the matching scores are computed from them; "
+        "use them as given and focus on the written feedback):\n" + "\n".join(lines) + "\n"
+    )
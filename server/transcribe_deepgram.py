@@ -8,12 +8,36 @@ from deepgram import (
 import os
 import base64
 import json
+import time
+from typing import AsyncIterable, Optional, Union
+
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 
+# --- Async Client Config ---
+# Point this at `python deepgram_stub.py` to benchmark without spending quota
+DEEPGRAM_BASE_URL = os.getenv("DEEPGRAM_BASE_URL", "https://api.deepgram.com")
+DEEPGRAM_MAX_CONCURRENCY = int(os.getenv("DEEPGRAM_MAX_CONCURRENCY", "8"))
+DEEPGRAM_POOL_SIZE = int(os.getenv("DEEPGRAM_POOL_SIZE", "16"))
+DEEPGRAM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("DEEPGRAM_CONNECT_TIMEOUT_SECONDS", "5"))
+DEEPGRAM_TIMEOUT_SECONDS = float(os.getenv("DEEPGRAM_TIMEOUT_SECONDS", "60"))
+# Base64 payloads larger than this are decoded in a worker thread
+INLINE_DECODE_LIMIT = 256 * 1024
+
+def decode_base64_audio(base64_audio: str) -> bytes:
+    # Allow both raw base64 strings and data URLs like "data:audio/mp3;base64,..."
+    if "," in base64_audio and "base64" in base64_audio[:64].lower():
+        base64_audio = base64_audio.split(",", 1)[1]
+
+    try:
+        return base64.b64decode(base64_audio)
+    except Exception as exc:
+        raise ValueError("Invalid base64-encoded audio input.") from exc
+
 def transcribe_base64_audio(
     base64_audio: str,
     model: str = "nova-3",
@@ -23,14 +47,7 @@ def transcribe_base64_audio(
     if not DEEPGRAM_API_KEY:
         raise ValueError("DEEPGRAM_API_KEY is not set in the environment.")
 
-    # Allow both raw base64 strings and data URLs like "data:audio/mp3;base64,..."
-    if "," in base64_audio and "base64" in base64_audio[:64].lower():
-        base64_audio = base64_audio.split(",", 1)[1]
-
-    try:
-        audio_bytes = base64.b64decode(base64_audio)
-    except Exception as exc:
-        raise ValueError("Invalid base64-encoded audio input.") from exc
+    audio_bytes = decode_base64_audio(base64_audio)
 
     deepgram = DeepgramClient(DEEPGRAM_API_KEY)
 
@@ -49,6 +66,13 @@ def transcribe_base64_audio(
     return json.loads(response.to_json())
 
 
+def extract_words(deepgram_response: dict) -> list:
+    """Word list with `word`, `start`, `end` and `speaker` for each word (empty if missing)"""
+    try:
+        return deepgram_response["results"]["channels"][0]["alternatives"][0]["words"] or []
+    except (KeyError, IndexError, TypeError):
+        return []
+
 def parse_speaker_transcript(deepgram_response: dict) -> str:
     try:
         words = deepgram_response["results"]["channels"][0]["alternatives"][0]["words"]
@@ -81,8 +105,120 @@ def parse_speaker_transcript(deepgram_response: dict) -> str:
     except (KeyError, IndexError, TypeError) as e:
         return f"Error parsing transcript: {e}"
 
-async def transcribe_base64_audio_async(base64_audio: str):
-    return await asyncio.to_thread(transcribe_base64_audio, base64_audio)
+class AsyncTranscriber:
+    """
+    Deepgram pre-recorded transcription over a shared HTTP connection pool.
+
+    One client is reused for every request, at most `max_concurrency` uploads run at
+    once (the rest wait for a slot) and every request has connect and total timeouts,
+    so transcription never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = DEEPGRAM_API_KEY,
+        base_url: str = DEEPGRAM_BASE_URL,
+        max_concurrency: int = DEEPGRAM_MAX_CONCURRENCY,
+        pool_size: int = DEEPGRAM_POOL_SIZE,
+        timeout: float = DEEPGRAM_TIMEOUT_SECONDS,
+        connect_timeout: float = DEEPGRAM_CONNECT_TIMEOUT_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        # Custom transport, e.g. httpx.ASGITransport around the stub app for in-process tests
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Clients and semaphores are bound to the loop they were created on
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Token {self.api_key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    async def transcribe(
+        self,
+        audio: Union[bytes, AsyncIterable[bytes]],
+        content_type: str = "application/octet-stream",
+        model: str = "nova-3",
+        diarize: bool = True,
+        filler_words: bool = True,
+        content_length: Optional[int] = None,
+    ) -> dict:
+        """
+        Transcribe raw audio bytes (or an async byte stream) and return the Deepgram response.
+        Streams are sent chunked unless `content_length` is given.
+        """
+        if not self.api_key:
+            raise ValueError("DEEPGRAM_API_KEY is not set in the environment.")
+        client = self._ensure_client()
+        params = {
+            "model": model,
+            "diarize": str(diarize).lower(),
+            "filler_words": str(filler_words).lower(),
+        }
+        headers = {"Content-Type": content_type}
+        if content_length is not None:
+            headers["Content-Length"] = str(content_length)
+        async with self._semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post("/v1/listen", params=params, content=audio, headers=headers)
+                response.raise_for_status()
+                self.requests += 1
+                return response.json()
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self.total_seconds += time.perf_counter() - started
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        completed = self.requests + self.errors
+        return {
+            "base_url": self.base_url,
+            "max_concurrency": self.max_concurrency,
+            "pool_size": self.pool_size,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_seconds": round(self.total_seconds / completed, 3) if completed else 0.0,
+        }
+
+
+transcriber = AsyncTranscriber()
+
+async def transcribe_base64_audio_async(base64_audio: str, **options) -> dict:
+    if len(base64_audio) > INLINE_DECODE_LIMIT:
+        audio_bytes = await asyncio.to_thread(decode_base64_audio, base64_audio)
+    else:
+        audio_bytes = decode_base64_audio(base64_audio)
+    return await transcriber.transcribe(audio_bytes, **options)
 
 if __name__ == "__main__":
     with open("test.mp3", "rb") as file:
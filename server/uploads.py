@@ -0,0 +1,96 @@
+"""
+Streaming handling of binary audio uploads.
+
+Request bodies are copied chunk by chunk into a spooled temporary file (in memory
+up to SPOOL_MAX_MEMORY_BYTES, on disk beyond that) and hashed on the way, so an
+upload is never held in memory more than once and never base64 encoded. The
+spooled file is then streamed to the transcriber. File writes, reads and hashing
+run in worker threads, since a large upload rolls over to disk.
+"""
+import asyncio
+import hashlib
+import os
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterable, AsyncIterator
+
+MAX_AUDIO_UPLOAD_BYTES = int(os.getenv("MAX_AUDIO_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+SPOOL_MAX_MEMORY_BYTES = int(os.getenv("SPOOL_MAX_MEMORY_BYTES", str(1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds MAX_AUDIO_UPLOAD_BYTES"""
+
+
+class SpooledAudio:
+    """An uploaded audio body with its size and SHA-256, readable as a byte stream"""
+
+    def __init__(self, file: SpooledTemporaryFile, size: int, sha256: str, content_type: str):
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+        self.content_type = content_type
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        await asyncio.to_thread(self.file.seek, 0)
+        while True:
+            chunk = await asyncio.to_thread(self.file.read, UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+    def read_all(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def spooled_from_bytes(data: bytes, content_type: str = "application/octet-stream") -> SpooledAudio:
+    """Wrap bytes that are already in memory (e.g. restored from a job row)"""
+    file = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES)
+    file.write(data)
+    return SpooledAudio(file, len(data), hashlib.sha256(data).hexdigest(), content_type)
+
+
+async def spool_stream(
+    stream: AsyncIterable[bytes],
+    content_type: str = "application/octet-stream",
+    max_bytes: int = MAX_AUDIO_UPLOAD_BYTES,
+) -> SpooledAudio:
+    """Copy `stream` into a spooled temporary file, hashing it on the fly"""
+    file = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+
+    def append(data: bytes) -> None:
+        digest.update(data)
+        file.write(data)
+
+    # Small network chunks are collected, so each worker thread hop writes UPLOAD_CHUNK_BYTES
+    pending = bytearray()
+    try:
+        async for chunk in stream:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+            pending += chunk
+            if len(pending) >= UPLOAD_CHUNK_BYTES:
+                await asyncio.to_thread(append, bytes(pending))
+                pending.clear()
+        if pending:
+            await asyncio.to_thread(append, bytes(pending))
+    except BaseException:
+        file.close()
+        raise
+    return SpooledAudio(file, size, digest.hexdigest(), content_type)
+
+
+async def read_upload_file(upload) -> AsyncIterator[bytes]:
+    """Chunks of a multipart `UploadFile`"""
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        yield chunk
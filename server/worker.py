@@ -0,0 +1,177 @@
+"""
+Standalone analysis worker.
+
+Leases queued jobs from the database and runs them, so the API can run with
+JOB_EXECUTION=worker and only accept uploads. Any number of worker processes, on
+any number of machines, can drain the same backlog:
+
+    DATABASE_URL=sqlite:///feedback.db python worker.py --concurrency 8
+    docker run <image> python worker.py
+
+With workers on the API's host, REPORT_CACHE_BACKEND=shm lets the API serve their
+reports from the latest-report cache straight away instead of after its TTL.
+
+Each running job holds a lease that a heartbeat renews. If a worker dies, its lease
+expires and another worker puts the job back in the queue (or fails it after
+JOB_MAX_ATTEMPTS). On SIGTERM/SIGINT a worker stops claiming, gives running jobs
+WORKER_SHUTDOWN_GRACE_SECONDS to finish and hands the rest back to the queue.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+
+import dotenv
+
+dotenv.load_dotenv()
+
+import database
+from feedback_writer import feedback_writer
+from jobs import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, discard_audio, process_owner, restore_audio, run_job
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "8"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1.0"))
+WORKER_SHUTDOWN_GRACE_SECONDS = float(os.getenv("WORKER_SHUTDOWN_GRACE_SECONDS", "20"))
+# How often a worker looks for expired leases
+REQUEUE_INTERVAL_SECONDS = 15
+
+
+class Worker:
+    def __init__(
+        self,
+        concurrency: int = WORKER_CONCURRENCY,
+        lease_seconds: int = JOB_LEASE_SECONDS,
+        poll_seconds: float = WORKER_POLL_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        owner: str = None,
+    ):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.owner = owner or process_owner()
+        self.running = {}
+        self.stopping = asyncio.Event()
+        self.succeeded = 0
+        self.failed = 0
+        self.lost = 0
+
+    async def run(self, once: bool = False) -> None:
+        """Claim and run jobs until stopped. With `once`, return when the queue is drained."""
+        last_requeue = 0.0
+        loop = asyncio.get_running_loop()
+        while not self.stopping.is_set():
+            if loop.time() - last_requeue >= REQUEUE_INTERVAL_SECONDS:
+                last_requeue = loop.time()
+                requeued, failed = await database.arequeue_expired_jobs(self.max_attempts)
+                if requeued or failed:
+                    print(f"Requeued {requeued} and failed {failed} jobs with expired leases")
+
+            claimed = False
+            while len(self.running) < self.concurrency and not self.stopping.is_set():
+                job = await database.aclaim_job(self.owner, self.lease_seconds)
+                if job is None:
+                    break
+                claimed = True
+                job_id = job[0]
+                self.running[job_id] = asyncio.create_task(self._run(*job))
+
+            if once and not claimed and not self.running:
+                break
+            await self._wait_for_slot()
+
+        await self._drain()
+
+    async def _wait_for_slot(self) -> None:
+        waiters = [asyncio.create_task(self.stopping.wait())]
+        try:
+            if len(self.running) >= self.concurrency:
+                # Full: wake up as soon as any job finishes
+                await asyncio.wait(list(self.running.values()) + waiters, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.wait(waiters, timeout=self.poll_seconds)
+        finally:
+            waiters[0].cancel()
+
+    async def _run(self, job_id: str, kind: str, payload: str, audio_bytes) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        finished = False
+        try:
+            payload = json.loads(payload)
+            result = await run_job(kind, payload, restore_audio(kind, payload, audio_bytes), job_id)
+            finished = await database.afinish_job(
+                job_id,
+                database.JOB_SUCCEEDED,
+                json.dumps(result),
+                None,
+                result.get("feedback_id"),
+                self.owner,
+                feedback_writer.take_staged(job_id),
+            )
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            finished = await database.afinish_job(job_id, database.JOB_FAILED, None, str(e), None, self.owner)
+            self.failed += 1
+        finally:
+            heartbeat.cancel()
+            feedback_writer.discard_staged(job_id)
+            self.running.pop(job_id, None)
+        if not finished:
+            # The lease expired and another worker took over; its outcome wins
+            self.lost += 1
+            print(f"Lost the lease on job {job_id}")
+        elif isinstance(payload, dict):
+            # Audio an API process kept for the job before it was taken over
+            discard_audio(payload)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await database.arenew_lease(job_id, self.owner, self.lease_seconds):
+                    return
+            except Exception as e:
+                # Keep trying, the lease only lapses after lease_seconds
+                print(f"Heartbeat for job {job_id} failed: {e}")
+
+    async def _drain(self) -> None:
+        if not self.running:
+            return
+        _, pending = await asyncio.wait(list(self.running.values()), timeout=WORKER_SHUTDOWN_GRACE_SECONDS)
+        unfinished = [job_id for job_id, task in self.running.items() if task in pending]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for job_id in unfinished:
+            await database.arelease_job(job_id, self.owner)
+            print(f"Released job {job_id}")
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+
+async def main(args) -> None:
+    database.init_database()
+    worker = Worker(concurrency=args.concurrency, lease_seconds=args.lease, poll_seconds=args.poll)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    await feedback_writer.start()
+    print(f"Worker {worker.owner} started with concurrency {worker.concurrency}")
+    await worker.run(once=args.once)
+    await feedback_writer.stop()
+    database.shutdown_executor()
+    print(f"Worker {worker.owner} stopped: {worker.succeeded} succeeded, {worker.failed} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued analysis jobs")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="Jobs run at the same time")
+    parser.add_argument("--lease", type=int, default=JOB_LEASE_SECONDS, help="Lease duration in seconds")
+    parser.add_argument("--poll", type=float, default=WORKER_POLL_SECONDS, help="Seconds between polls of an empty queue")
+    parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+    asyncio.run(main(parser.parse_args()))
@@ -23,15 +23,22 @@ module.exports = pool;
 // --- Get past conversations ---
 app.get("/api/feedback", async (req, res) => {
   try {
+    // Only the columns the UI shows; transcripts stay in the database. Sub-agent reports
+    // live in feedback_details, or still on the feedback row for entries not moved yet.
     const [rows] = await pool.query(
-      "SELECT * FROM feedback ORDER BY timestamp DESC LIMIT 100"
+      "SELECT f.id, f.feedback, COALESCE(d.intermediate_feedbacks, f.intermediate_feedbacks) AS intermediate_feedbacks, " +
+      "f.timestamp, f.time_taken FROM feedback f LEFT JOIN feedback_details d ON d.id = f.details_id " +
+      "ORDER BY f.timestamp DESC, f.id DESC LIMIT 100"
     );
     
     // Map to UI-friendly format
     const conversations = rows.map(row => ({
       id: row.id,
       feedback: row.feedback,
-      intermediate_feedbacks: row.intermediate_feedbacks,
+      // The UI parses it, so JSON columns returned as objects are sent as text
+      intermediate_feedbacks: row.intermediate_feedbacks == null || typeof row.intermediate_feedbacks === "string"
+        ? row.intermediate_feedbacks
+        : JSON.stringify(row.intermediate_feedbacks),
       timestamp: row.timestamp,
       time_taken: row.time_taken
     }));